@@ -0,0 +1,125 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request is over a limit; retry_after is in seconds."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+    def retry_after_header(self):
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class TokenBucketLimiter:
+    """Per-key token buckets: `rate` tokens per second, up to `burst` saved.
+
+    Buckets are kept in an LRU bounded by `max_keys`; an evicted key simply
+    starts again with a full bucket.
+    """
+
+    def __init__(self, rate: float, burst: int, max_keys: int = 10000, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self.clock = clock
+        self.buckets = OrderedDict()  # key -> (tokens, updated_at)
+        self.allowed = 0
+        self.rejected = 0
+
+    def acquire(self, key: str):
+        # Takes one token for `key` or raises AdmissionRejected
+        now = self.clock()
+        tokens, updated_at = self.buckets.pop(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated_at) * self.rate)
+        if tokens < 1:
+            self.buckets[key] = (tokens, now)
+            self.rejected += 1
+            raise AdmissionRejected("rate limit exceeded", (1 - tokens) / self.rate)
+        self.buckets[key] = (tokens - 1, now)
+        if len(self.buckets) > self.max_keys:
+            self.buckets.popitem(last=False)
+        self.allowed += 1
+
+    def stats(self):
+        return {"keys": len(self.buckets), "allowed": self.allowed, "rejected": self.rejected}
+
+
+class ConcurrencyLimiter:
+    """Global cap on concurrent upstream calls with a bounded wait queue.
+
+    At most `max_concurrent` holders run at once and at most `max_queue`
+    callers wait for a slot; beyond that, or after waiting `queue_timeout`
+    seconds, callers are rejected instead of piling up in the event loop.
+    `on_wait(seconds)`, if given, is called with each admitted caller's wait.
+    """
+
+    def __init__(self, max_concurrent: int, max_queue: int, queue_timeout: float, retry_after: float = 1.0,
+                 on_wait=None):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.semaphore = asyncio.Semaphore(max_concurrent)
+        self.in_flight = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.wait_times = deque(maxlen=1000)
+        self.on_wait = on_wait
+
+    def check(self):
+        # Fast pre-check at request entry, before any work is done
+        if self.waiting >= self.max_queue:
+            self.rejected += 1
+            raise AdmissionRejected("server busy", self.retry_after)
+
+    @asynccontextmanager
+    async def slot(self):
+        start = time.perf_counter()
+        if not self.semaphore.locked():
+            # A permit is free, so this returns without suspending
+            await self.semaphore.acquire()
+        else:
+            self.check()
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self.semaphore.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                raise AdmissionRejected("timed out waiting for capacity", self.retry_after)
+            finally:
+                self.waiting -= 1
+        waited = time.perf_counter() - start
+        self.wait_times.append(waited)
+        if self.on_wait is not None:
+            self.on_wait(waited)
+        self.admitted += 1
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+            self.semaphore.release()
+
+    def stats(self):
+        waits = sorted(self.wait_times)
+        return {
+            "max_concurrent": self.max_concurrent,
+            "in_flight": self.in_flight,
+            "queue_depth": self.waiting,
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "wait_ms": {
+                "avg": round(sum(waits) / len(waits) * 1000, 2) if waits else 0.0,
+                "p95": round(waits[int((len(waits) - 1) * 0.95)] * 1000, 2) if waits else 0.0,
+                "max": round(waits[-1] * 1000, 2) if waits else 0.0,
+            },
+        }
@@ -0,0 +1,114 @@
+from datetime import date, timedelta
+
+from timestamps import MINUTES_PER_DAY, clock, minute_of_day
+
+# numpy is imported where it is used: it adds ~80ms to the app's import, and
+# the startup warmup imports it in the background before the first request
+
+# Longest range one find_available_times call may search
+MAX_RANGE_DAYS = 31
+
+
+def date_range(start_date: str, end_date: str):
+    # Inclusive list of YYYY-MM-DD strings; raises ValueError for a bad range
+    first, last = date.fromisoformat(start_date), date.fromisoformat(end_date)
+    if last < first:
+        raise ValueError("end_date is before start_date")
+    days = (last - first).days + 1
+    if days > MAX_RANGE_DAYS:
+        raise ValueError(f"date range is longer than {MAX_RANGE_DAYS} days")
+    return [(first + timedelta(days=i)).isoformat() for i in range(days)]
+
+
+def interval_mask(days: list, intervals: list):
+    """Minute bitmap of shape (len(days), 1440), True inside any interval.
+
+    `intervals` are (day, start minute, end minute) tuples; days outside
+    `days` are ignored. Built with a difference array and one cumulative sum,
+    so the cost does not depend on interval lengths.
+    """
+    import numpy as np
+
+    index = {day: i for i, day in enumerate(days)}
+    rows = [(index[day], start, end) for day, start, end in intervals if day in index and end > start]
+    diff = np.zeros((len(days), MINUTES_PER_DAY + 1), dtype=np.int32)
+    if rows:
+        row, start, end = np.array(rows, dtype=np.int64).T
+        np.add.at(diff, (row, np.clip(start, 0, MINUTES_PER_DAY)), 1)
+        np.add.at(diff, (row, np.clip(end, 0, MINUTES_PER_DAY)), -1)
+    return np.cumsum(diff, axis=1)[:, :MINUTES_PER_DAY] > 0
+
+
+def booking_intervals(bookings: list):
+    # (day, start, end) intervals of bookings; one running past midnight ends the day
+    intervals = []
+    for booking in bookings:
+        start, end = booking.get("start") or "", booking.get("end") or ""
+        if len(start) < 16:
+            continue
+        end_minute = minute_of_day(end) if end[:10] == start[:10] and len(end) >= 16 else MINUTES_PER_DAY
+        intervals.append((start[:10], minute_of_day(start), end_minute))
+    return intervals
+
+
+def slot_intervals(slots: list, slot_minutes: int = 30):
+    """(day, start, end) intervals covered by a list of free slots.
+
+    Each slot is a {"start", "end"} dict. A slot without an end time (start
+    == end) lasts `slot_minutes`; its length is never guessed from the gaps
+    between free slots, which would count busy time as free.
+    """
+    intervals = []
+    for slot in slots:
+        start, end = slot.get("start") or "", slot.get("end") or ""
+        if len(start) < 16:
+            continue
+        start_minute = minute_of_day(start)
+        if end[:10] == start[:10] and len(end) >= 16:
+            end_minute = minute_of_day(end)
+        else:
+            end_minute = MINUTES_PER_DAY if end > start else start_minute
+        if end_minute <= start_minute:
+            end_minute = min(MINUTES_PER_DAY, start_minute + slot_minutes)
+        intervals.append((start[:10], start_minute, end_minute))
+    return intervals
+
+
+def find_free_windows(days: list, available: list, busy: list, duration: int, step: int = 30,
+                      max_results: int = 5, max_per_day: int = 2):
+    """Best free windows of `duration` minutes across `days`.
+
+    `available` and `busy` are (day, start minute, end minute) intervals. A
+    window may start on any `step`-minute boundary and must lie entirely in
+    available time and outside busy time. Windows are ranked earliest first,
+    with at most `max_per_day` non-overlapping ones per day so the candidates
+    span the range.
+    """
+    import numpy as np
+
+    if duration <= 0 or duration > MINUTES_PER_DAY:
+        raise ValueError("duration_minutes must be between 1 and 1440")
+    free = interval_mask(days, available) & ~interval_mask(days, busy)
+
+    # Free minutes in [s, s + duration) for every candidate start s, per day
+    counts = np.zeros((len(days), MINUTES_PER_DAY + 1), dtype=np.int32)
+    np.cumsum(free, axis=1, out=counts[:, 1:])
+    starts = np.arange(0, MINUTES_PER_DAY - duration + 1, step)
+    fits = (counts[:, starts + duration] - counts[:, starts]) == duration
+
+    windows = []
+    taken = {}  # row -> starts picked on that day
+    for row, column in zip(*np.nonzero(fits)):
+        if len(windows) >= max_results:
+            break
+        start = int(starts[column])
+        picked = taken.setdefault(row, [])
+        # Candidates on the same day must not overlap each other
+        if len(picked) >= max_per_day or (picked and start < picked[-1] + duration):
+            continue
+        picked.append(start)
+        windows.append((row, start))
+    return [
+        {"date": days[row], "start": clock(start), "end": clock(start + duration)}
+        for row, start in windows
+    ]
@@ -0,0 +1,102 @@
+# Concurrent throughput of the Cal.com tool path, blocking vs async.
+#
+# Starts a local HTTP server that answers /slots after a fixed delay, then
+# fires N concurrent get_available_slots() calls from one event loop:
+#   - "blocking": the previous implementation, a synchronous requests.get
+#     inside an async handler (every call stalls the loop)
+#   - "async":    the current pooled CalcomClient implementation in main.py
+# Every call asks for a different date, so the slot cache and the coalescing
+# of identical Cal.com reads cannot answer one call from another's request.
+#
+# Usage (from the backend directory):
+#   python benchmarks/concurrency_bench.py --concurrency 100 --latency-ms 200
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def start_slots_server(latency_ms):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency_ms / 1000)
+            body = json.dumps({"slots": [{"time": "2025-01-01T09:00:00Z"}]}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    class Server(ThreadingHTTPServer):
+        daemon_threads = True
+        request_queue_size = 1024
+
+    server = Server(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def blocking_get_available_slots(base_url, date):
+    import requests
+
+    response = requests.get(
+        f"{base_url}/slots",
+        headers={"Authorization": "Bearer bench", "Content-Type": "application/json"},
+        params={"startTime": f"{date}T00:00:00Z", "endTime": f"{date}T23:59:59Z", "eventTypeId": 1},
+    )
+    return response.json()
+
+
+def distinct_dates(count):
+    first = date(2025, 1, 1)
+    return [(first + timedelta(days=i)).isoformat() for i in range(count)]
+
+
+async def measure(label, make_call, concurrency):
+    start = time.perf_counter()
+    await asyncio.gather(*(make_call(day) for day in distinct_dates(concurrency)))
+    elapsed = time.perf_counter() - start
+    print(f"{label:<10} {concurrency:>5} calls  {elapsed:8.3f}s  {concurrency / elapsed:10.1f} calls/s")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--latency-ms", type=int, default=200)
+    args = parser.parse_args()
+
+    server = start_slots_server(args.latency_ms)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    os.environ["CALCOM_API_KEY"] = "bench_key"
+    os.environ["CALCOM_API_URL"] = base_url
+    # Per-call logs are written by a background thread that would compete with
+    # the timed calls (and flood the output), so only warnings are logged
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    import main as app
+
+    app.calcom_client = app.CalcomClient.from_env()
+    # The lifespan hook does not run here; tools read queued writes from the outbox
+    app.calcom_outbox = app.Outbox(app.state_backend.outbox, app.send_calcom_write)
+    print(f"upstream latency {args.latency_ms} ms")
+    try:
+        await measure("blocking", lambda day: blocking_get_available_slots(base_url, day), args.concurrency)
+        await measure("async", app.get_available_slots, args.concurrency)
+    finally:
+        await app.calcom_client.aclose()
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,221 @@
+# End-to-end load test of /chat against local stand-ins, no network access needed.
+#
+# Starts the Cal.com and OpenAI stand-in servers and the app (uvicorn, as a
+# subprocess pointed at the stand-ins), then drives N concurrent scripted
+# conversations through /chat (or /chat/stream) and reports latency
+# percentiles, throughput and upstream call counts.
+#
+# Usage (from the backend directory):
+#   python benchmarks/load_test.py --conversations 50 --turns 3
+#   python benchmarks/load_test.py --conversations 200 --workers 4 --state-backend sqlite:///load.db
+#   python benchmarks/load_test.py --stream --openai-failure-rate 0.05 --json results.json
+#
+# Pass --app-url to drive an app that is already running (it must already be
+# pointed at the stand-ins or at real upstreams).
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def spawn(args, env=None):
+    return subprocess.Popen(
+        [sys.executable] + args,
+        cwd=BACKEND_DIR,
+        env={**os.environ, **(env or {})},
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+async def wait_until_up(url: str, timeout: float = 20.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(url)
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up within {timeout}s")
+
+
+def conversation_script(index: int, turns: int):
+    # Realistic mix: look up availability and bookings, book, then check again
+    email = f"load{index}@example.com"
+    day = f"2025-03-{3 + index % 5:02d}"
+    script = [
+        f'[script] get_available_slots {{"date": "{day}"}}; list_events {{"email": "{email}"}}',
+        f'[script] book_event {{"email": "{email}", "date": "{day}", "time": "{9 + index % 8:02d}:00", "reason": "Load test"}}',
+        f'[script] list_events {{"email": "{email}"}}',
+        "Thanks!",
+    ]
+    return email, [script[i % len(script)] for i in range(turns)]
+
+
+def percentile(values: list, p: float):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * p / 100
+    low, high = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (k - low)
+
+
+async def send_turn(client, url: str, body: dict, stream: bool):
+    # Returns (latency seconds, time to first event seconds, response payload)
+    start = time.perf_counter()
+    if not stream:
+        response = await client.post(f"{url}/chat", json=body)
+        response.raise_for_status()
+        elapsed = time.perf_counter() - start
+        return elapsed, elapsed, response.json()
+
+    first_event = None
+    payload = {}
+    async with client.stream("POST", f"{url}/chat/stream", json=body) as response:
+        response.raise_for_status()
+        event = None
+        async for line in response.aiter_lines():
+            if first_event is None and line:
+                first_event = time.perf_counter() - start
+            if line.startswith("event: "):
+                event = line[7:]
+            elif line.startswith("data: ") and event in ("done", "error"):
+                payload = json.loads(line[6:])
+    return time.perf_counter() - start, first_event or 0.0, payload
+
+
+async def run_conversation(client, url: str, index: int, turns: int, stream: bool, results: dict):
+    email, script = conversation_script(index, turns)
+    conversation_id = None
+    for message in script:
+        body = {"email": email, "message": message, "conversation_id": conversation_id}
+        try:
+            latency, first_event, payload = await send_turn(client, url, body, stream)
+        except (httpx.HTTPError, json.JSONDecodeError):
+            results["errors"] += 1
+            continue
+        results["latencies"].append(latency)
+        results["first_event"].append(first_event)
+        if str(payload.get("response", "")).startswith("An error occurred"):
+            results["errors"] += 1
+        conversation_id = payload.get("conversation_id", conversation_id)
+
+
+async def fetch_stats(client, url: str):
+    try:
+        return (await client.get(f"{url}/_stats")).json()
+    except (httpx.HTTPError, json.JSONDecodeError):
+        return None
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--conversations", type=int, default=50, help="concurrent conversations")
+    parser.add_argument("--turns", type=int, default=3, help="user messages per conversation")
+    parser.add_argument("--stream", action="store_true", help="use /chat/stream instead of /chat")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--state-backend", default="memory")
+    parser.add_argument("--openai-latency-ms", type=float, default=400)
+    parser.add_argument("--openai-failure-rate", type=float, default=0)
+    parser.add_argument("--calcom-latency-ms", type=float, default=120)
+    parser.add_argument("--calcom-failure-rate", type=float, default=0)
+    parser.add_argument("--app-url", help="drive an already running app instead of starting one")
+    parser.add_argument("--calcom-url", help="stats URL of an already running Cal.com stand-in")
+    parser.add_argument("--openai-url", help="stats URL of an already running OpenAI stand-in")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args()
+
+    processes = []
+    app_url, calcom_url, openai_url = args.app_url, args.calcom_url, args.openai_url
+    try:
+        if app_url is None:
+            calcom_port, openai_port, app_port = free_port(), free_port(), free_port()
+            calcom_url = f"http://127.0.0.1:{calcom_port}"
+            openai_url = f"http://127.0.0.1:{openai_port}"
+            app_url = f"http://127.0.0.1:{app_port}"
+            processes.append(spawn([
+                "standins/calcom_server.py", "--port", str(calcom_port),
+                "--latency-ms", str(args.calcom_latency_ms), "--failure-rate", str(args.calcom_failure_rate),
+            ]))
+            processes.append(spawn([
+                "standins/openai_server.py", "--port", str(openai_port),
+                "--latency-ms", str(args.openai_latency_ms), "--failure-rate", str(args.openai_failure_rate),
+            ]))
+            processes.append(spawn(
+                ["-m", "uvicorn", "main:app", "--port", str(app_port), "--workers", str(args.workers), "--log-level", "warning"],
+                env={
+                    "OPENAI_API_KEY": "standin",
+                    "OPENAI_BASE_URL": f"{openai_url}/v1",
+                    "CALCOM_API_KEY": "standin",
+                    "CALCOM_API_URL": f"{calcom_url}/v2",
+                    "STATE_BACKEND": args.state_backend,
+                },
+            ))
+            for url in (calcom_url, openai_url, app_url):
+                await wait_until_up(url)
+
+        limits = httpx.Limits(max_connections=args.conversations, max_keepalive_connections=args.conversations)
+        async with httpx.AsyncClient(timeout=120, limits=limits) as client:
+            results = {"latencies": [], "first_event": [], "errors": 0}
+            start = time.perf_counter()
+            await asyncio.gather(*(
+                run_conversation(client, app_url, i, args.turns, args.stream, results)
+                for i in range(args.conversations)
+            ))
+            elapsed = time.perf_counter() - start
+            upstream = {
+                "calcom": await fetch_stats(client, calcom_url) if calcom_url else None,
+                "openai": await fetch_stats(client, openai_url) if openai_url else None,
+            }
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+    latencies = results["latencies"]
+    summary = {
+        "conversations": args.conversations,
+        "turns": args.turns,
+        "stream": args.stream,
+        "workers": args.workers,
+        "requests": len(latencies),
+        "errors": results["errors"],
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0,
+        "latency_ms": {f"p{p}": round(percentile(latencies, p) * 1000, 1) for p in (50, 95, 99)},
+        "first_event_ms": {f"p{p}": round(percentile(results["first_event"], p) * 1000, 1) for p in (50, 95, 99)},
+        "upstream": upstream,
+    }
+
+    print(f"{summary['requests']} requests ({summary['errors']} errors) in {summary['elapsed_s']}s, {summary['throughput_rps']} req/s")
+    print("latency ms     " + "  ".join(f"{k}={v}" for k, v in summary["latency_ms"].items()))
+    if args.stream:
+        print("first event ms " + "  ".join(f"{k}={v}" for k, v in summary["first_event_ms"].items()))
+    for name, stats in upstream.items():
+        if stats:
+            print(f"{name:<7} upstream calls {stats['total']}  " + "  ".join(f"{k}={v}" for k, v in stats["calls"].items()))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(summary, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,131 @@
+# Mock Cal.com store operations at scale: the old list scans vs the indexed stores.
+#
+# Loads N non-overlapping bookings spread over many users and days, then
+# times lookups by email, conflicting bookings (which must be rejected),
+# cancels and reschedules against:
+#   - "list scan": the previous module-level list with linear scans (and a
+#                  scan for overlapping bookings as a conflict check)
+#   - "memory":    MemoryEventStore
+#   - "sqlite":    SQLiteEventStore (WAL) in a temporary file
+#
+# Usage (from the backend directory):
+#   python benchmarks/mock_store_bench.py --bookings 50000 --ops 2000
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from day_bitmap import BookingConflictError
+from mock_store import MemoryEventStore, SQLiteEventStore
+
+
+class ListScanStore:
+    # The previous implementation: one list, scanned for every lookup
+    def __init__(self):
+        self.events = []
+        self.next_id = 1
+        # Off while loading, which would otherwise be quadratic
+        self.check_conflicts = False
+
+    async def create(self, email, title, start, end):
+        if self.check_conflicts and any(e["start"] < end and start < e["end"] for e in self.events):
+            raise BookingConflictError(start)
+        event = {"id": f"mock_event_{self.next_id}", "email": email, "title": title, "start": start, "end": end, "status": "confirmed"}
+        self.next_id += 1
+        self.events.append(event)
+        return event
+
+    async def list_by_email(self, email):
+        return [event for event in self.events if event["email"] == email]
+
+    async def delete(self, event_id):
+        for i, event in enumerate(self.events):
+            if event["id"] == event_id:
+                self.events.pop(i)
+                return True
+        return False
+
+    async def update_time(self, event_id, start, end):
+        for event in self.events:
+            if event["id"] == event_id:
+                event["start"] = start
+                event["end"] = end
+                return event
+        return None
+
+
+def hour_slot(i):
+    # The i-th free working hour: eight a day, 09:00-17:00, from 2025-01-01
+    day = (date(2025, 1, 1) + timedelta(days=i // 8)).isoformat()
+    hour = 9 + i % 8
+    return f"{day}T{hour:02d}:00:00Z", f"{day}T{hour + 1:02d}:00:00Z"
+
+
+def booking(i, users):
+    return (f"user{i % users}@example.com", "Meeting", *hour_slot(i))
+
+
+async def measure(label, store, args):
+    rng = random.Random(42)
+    for i in range(args.bookings):
+        await store.create(*booking(i, args.users))
+
+    start = time.perf_counter()
+    for _ in range(args.ops):
+        await store.list_by_email(f"user{rng.randrange(args.users)}@example.com")
+    list_ms = (time.perf_counter() - start) * 1000 / args.ops
+
+    if isinstance(store, ListScanStore):
+        store.check_conflicts = True
+    start = time.perf_counter()
+    for _ in range(args.ops):
+        try:
+            await store.create("late@example.com", "Clash", *hour_slot(rng.randrange(args.bookings)))
+            raise AssertionError("overlapping booking was accepted")
+        except BookingConflictError:
+            pass
+    conflict_ms = (time.perf_counter() - start) * 1000 / args.ops
+
+    ids = rng.sample(range(1, args.bookings + 1), args.ops * 2)
+    start = time.perf_counter()
+    for i, event_id in enumerate(ids[:args.ops]):
+        # Move each booking to its own free hour after the loaded ones
+        await store.update_time(f"mock_event_{event_id}", *hour_slot(args.bookings + i))
+    reschedule_ms = (time.perf_counter() - start) * 1000 / args.ops
+
+    start = time.perf_counter()
+    for event_id in ids[args.ops:]:
+        await store.delete(f"mock_event_{event_id}")
+    cancel_ms = (time.perf_counter() - start) * 1000 / args.ops
+
+    print(
+        f"{label:<10} list_by_email {list_ms:8.3f} ms   conflict {conflict_ms:8.3f} ms   "
+        f"reschedule {reschedule_ms:8.3f} ms   cancel {cancel_ms:8.3f} ms"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bookings", type=int, default=50000)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--ops", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{args.bookings} bookings, {args.users} users, mean time per operation")
+    await measure("list scan", ListScanStore(), args)
+    await measure("memory", MemoryEventStore(), args)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = SQLiteEventStore(os.path.join(tmp, "mock_events.db"))
+        await measure("sqlite", store, args)
+        store.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
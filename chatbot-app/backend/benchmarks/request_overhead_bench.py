@@ -0,0 +1,188 @@
+# Per-request serialization and tool dispatch overhead, before vs after the
+# tool registry and the fast JSON codec.
+#
+# Times each step of a /chat request that does not depend on OpenAI or
+# Cal.com latency, in microseconds per operation:
+#   - parsing and validating the request body (untyped list vs typed models)
+#   - dispatching a tool call (json.loads + the old if/elif lookup vs the
+#     registry's one-pass parse and validation); tools are no-op stubs so
+#     only the dispatch itself is measured
+#   - encoding tool results, rendering the JSON response and SSE events
+# The "after" column uses orjson when it is installed (see json_codec.py).
+#
+# Usage (from the backend directory):
+#   python benchmarks/request_overhead_bench.py --iterations 20000 --history 10
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from typing import Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+from json_codec import BACKEND, ResponseClass, dumps, loads
+from main import ChatRequest, generate_mock_slots
+from tool_registry import ToolRegistry
+
+EMAIL = "bench@example.com"
+
+
+class UntypedChatRequest(BaseModel):
+    # ChatRequest as it was before the typed message models
+    email: str
+    messages: Optional[list] = None
+    conversation_id: Optional[str] = None
+    message: Optional[str] = None
+
+
+registry = ToolRegistry()
+
+
+@registry.tool("Get available time slots for a date", date="Date in YYYY-MM-DD")
+async def get_available_slots(date: str):
+    return None
+
+
+@registry.tool("Find free times", start_date="First date", end_date="Last date",
+               duration_minutes="Meeting length", email="User's email", max_results="Results")
+async def find_available_times(start_date: str, end_date: str, duration_minutes: int = 60, email: str = None, max_results: int = 5):
+    return None
+
+
+@registry.tool("Book a new event", email="User's email", date="Date", time="Time", reason="Reason")
+async def book_event(email: str, date: str, time: str, reason: str):
+    return None
+
+
+@registry.tool("List user's scheduled events", email="User's email")
+async def list_events(email: str):
+    return None
+
+
+@registry.tool("Cancel an event", event_id="Event ID")
+async def cancel_event(event_id: str):
+    return None
+
+
+@registry.tool("Reschedule an event", event_id="Event ID", new_date="New date", new_time="New time")
+async def reschedule_event(event_id: str, new_date: str, new_time: str):
+    return None
+
+
+async def execute_function(func_name: str, args: dict):
+    # The previous hand-written dispatch
+    if func_name == "get_available_slots":
+        return await get_available_slots(args["date"])
+    elif func_name == "find_available_times":
+        return await find_available_times(
+            args["start_date"],
+            args["end_date"],
+            args.get("duration_minutes", 60),
+            args.get("email"),
+            args.get("max_results", 5)
+        )
+    elif func_name == "book_event":
+        return await book_event(args["email"], args["date"], args["time"], args["reason"])
+    elif func_name == "list_events":
+        return await list_events(args["email"])
+    elif func_name == "cancel_event":
+        return await cancel_event(args["event_id"])
+    elif func_name == "reschedule_event":
+        return await reschedule_event(args["event_id"], args["new_date"], args["new_time"])
+    return {"error": f"Unknown function: {func_name}"}
+
+
+TOOL_CALLS = [
+    ("get_available_slots", '{"date": "2025-03-03"}'),
+    ("find_available_times", '{"start_date": "2025-03-03", "end_date": "2025-03-07", "duration_minutes": 45}'),
+    ("book_event", f'{{"email": "{EMAIL}", "date": "2025-03-03", "time": "09:00", "reason": "Project sync"}}'),
+    ("reschedule_event", '{"event_id": "cal_123", "new_date": "2025-03-04", "new_time": "10:00"}'),
+]
+
+
+def request_body(history: int):
+    messages = []
+    for i in range(history):
+        messages.append({"role": "user", "content": f"Can I book a meeting on day {i}?"})
+        messages.append({"role": "assistant", "content": None, "tool_calls": [
+            {"id": f"call_{i}", "type": "function",
+             "function": {"name": "get_available_slots", "arguments": '{"date": "2025-03-03"}'}}
+        ]})
+        messages.append({"role": "tool", "tool_call_id": f"call_{i}", "name": "get_available_slots",
+                         "content": '{"free":{"2025-03-03":["09:00-17:00"]},"slot_minutes":30}'})
+        messages.append({"role": "assistant", "content": "You are free from 9 to 5."})
+    return json.dumps({"email": EMAIL, "messages": messages}).encode()
+
+
+def per_op(function, iterations: int):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        function()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+async def per_op_async(function, iterations: int):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await function()
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+async def dispatch_old():
+    for name, arguments in TOOL_CALLS:
+        await execute_function(name, json.loads(arguments or "{}"))
+
+
+async def dispatch_registry():
+    for name, arguments in TOOL_CALLS:
+        await registry.get(name).call(arguments)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--history", type=int, default=10, help="conversation turns in the stateless request body")
+    args = parser.parse_args()
+
+    body = request_body(args.history)
+    slots = generate_mock_slots("2025-03-03")
+    reply = {"response": "You are free from 9 to 5 on Monday.", "conversation_id": "0" * 32}
+    n = args.iterations
+
+    rows = [
+        (f"parse request ({len(body) // 1024} KB)",
+         per_op(lambda: UntypedChatRequest(**json.loads(body)), n),
+         per_op(lambda: ChatRequest.model_validate(loads(body)), n)),
+        (f"dispatch {len(TOOL_CALLS)} tool calls",
+         asyncio.run(per_op_async(dispatch_old, n)),
+         asyncio.run(per_op_async(dispatch_registry, n))),
+        ("encode tool result (slots)",
+         per_op(lambda: json.dumps(slots), n),
+         per_op(lambda: dumps(slots), n)),
+        ("render /chat response",
+         per_op(lambda: JSONResponse(reply).body, n),
+         per_op(lambda: ResponseClass(reply).body, n)),
+        ("SSE event",
+         per_op(lambda: f"event: done\ndata: {json.dumps(reply)}\n\n", n),
+         per_op(lambda: f"event: done\ndata: {dumps(reply)}\n\n", n)),
+    ]
+
+    print(f"Microseconds per operation, {n} iterations, fast JSON backend: {BACKEND}")
+    print(f"{'step':<32}{'before':>9}{'after':>9}{'speedup':>9}")
+    for name, before, after in rows:
+        print(f"{name:<32}{before:>9.1f}{after:>9.1f}{before / after:>8.1f}x")
+    total_before = sum(row[1] for row in rows)
+    total_after = sum(row[2] for row in rows)
+    print(f"{'total':<32}{total_before:>9.1f}{total_after:>9.1f}{total_before / total_after:>8.1f}x")
+    print("\nThe typed request and the registry also validate what the untyped versions passed through "
+          "unchecked (message roles, tool argument types).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# Model round-trips per user request, sequential vs parallel tool calls.
+#
+# Drives the /chat handler with a scripted model for a request that needs
+# three independent tools ("what's free Monday and Tuesday and what do I
+# already have booked"). With parallel tool calls disabled the model can
+# only ask for one tool per turn (like the old functions API); enabled, it
+# asks for all three at once and they run concurrently.
+#
+# Usage (from the backend directory):
+#   python benchmarks/roundtrip_bench.py --model-latency-ms 400 --calcom-latency-ms 150
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+EMAIL = "bench@example.com"
+SCRIPTED_CALLS = [
+    ("get_available_slots", {"date": "2025-03-03"}),
+    ("get_available_slots", {"date": "2025-03-04"}),
+    ("list_events", {"email": EMAIL}),
+]
+
+
+def completion(message):
+    return {
+        "id": "chatcmpl-bench",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "bench",
+        "choices": [{"index": 0, "message": message, "finish_reason": "stop"}],
+    }
+
+
+def scripted_model(latency_ms, counter):
+    async def handler(request):
+        counter["round_trips"] += 1
+        await asyncio.sleep(latency_ms / 1000)
+        body = json.loads(request.content)
+        answered = sum(1 for m in body["messages"] if m["role"] == "tool")
+        pending = SCRIPTED_CALLS[answered:]
+        if not pending:
+            return httpx.Response(200, json=completion({"role": "assistant", "content": "Here you go."}))
+        if body.get("parallel_tool_calls") is False:
+            pending = pending[:1]
+        tool_calls = [
+            {"id": f"call_{answered + i}", "type": "function", "function": {"name": name, "arguments": json.dumps(args)}}
+            for i, (name, args) in enumerate(pending)
+        ]
+        return httpx.Response(200, json=completion({"role": "assistant", "content": None, "tool_calls": tool_calls}))
+
+    return handler
+
+
+def scripted_calcom(latency_ms):
+    async def handler(request):
+        await asyncio.sleep(latency_ms / 1000)
+        if request.url.path.endswith("/slots"):
+            return httpx.Response(200, json={"slots": [{"time": "2025-03-03T09:00:00Z"}]})
+        return httpx.Response(200, json={"bookings": []})
+
+    return handler
+
+
+async def measure(app, label, parallel, args):
+    from openai import AsyncOpenAI
+
+    counter = {"round_trips": 0}
+    app.parallel_tool_calls = parallel
+    await app.slot_cache.clear()
+    app.openai_client = AsyncOpenAI(
+        api_key="bench",
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(scripted_model(args.model_latency_ms, counter))),
+    )
+    app.calcom_client = app.CalcomClient("bench", "http://calcom.bench", transport=httpx.MockTransport(scripted_calcom(args.calcom_latency_ms)))
+
+    request = app.ChatRequest(email=EMAIL, messages=[{"role": "user", "content": "What's free Monday and Tuesday, and what do I have booked?"}])
+    start = time.perf_counter()
+    await app.chat(request)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<12} {counter['round_trips']:>3} model round-trips  {elapsed * 1000:8.1f} ms")
+    await app.calcom_client.aclose()
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--model-latency-ms", type=int, default=400)
+    parser.add_argument("--calcom-latency-ms", type=int, default=150)
+    args = parser.parse_args()
+
+    os.environ["CALCOM_API_KEY"] = "bench_key"
+    # Per-call logs are written by a background thread that would compete with
+    # the timed calls (and flood the output), so only warnings are logged
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    import main as app
+    # The lifespan hook does not run here; tools read queued writes from the outbox
+    app.calcom_outbox = app.Outbox(app.state_backend.outbox, app.send_calcom_write)
+
+    print(f"model latency {args.model_latency_ms} ms, Cal.com latency {args.calcom_latency_ms} ms")
+    await measure(app, "sequential", False, args)
+    await measure(app, "parallel", True, args)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
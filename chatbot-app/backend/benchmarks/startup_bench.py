@@ -0,0 +1,136 @@
+# Worker cold start: import time, warmup time and the first request's latency.
+#
+# Measures, in fresh processes:
+#   - how long `import main` takes, and how long the lazily imported modules
+#     (openai, numpy) would add if they were imported with the app
+#   - for an app started with WARMUP=false and WARMUP=true (uvicorn, pointed
+#     at the local stand-ins): time until it answers requests, until
+#     /health/ready reports ready, and the latency of the first and second
+#     /chat requests (one tool call, so both OpenAI and Cal.com are used)
+# The stand-ins are plain HTTP on localhost, so the first-request difference
+# here is mostly imports and client setup; against the real APIs each
+# upstream's TLS handshake (typically 50-300ms) comes on top when cold.
+#
+# Usage (from the backend directory):
+#   python benchmarks/startup_bench.py --runs 5
+
+import argparse
+import asyncio
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+from load_test import BACKEND_DIR, free_port, spawn, wait_until_up
+
+IMPORT_SCRIPT = """
+import time
+start = time.perf_counter()
+import main
+app_ms = (time.perf_counter() - start) * 1000
+start = time.perf_counter()
+import openai, numpy
+lazy_ms = (time.perf_counter() - start) * 1000
+print(f"{app_ms:.1f} {lazy_ms:.1f}")
+"""
+
+
+def import_times(runs: int):
+    app, lazy = [], []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_SCRIPT], cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+        ).stdout.split()
+        app.append(float(output[-2]))
+        lazy.append(float(output[-1]))
+    return statistics.median(app), statistics.median(lazy)
+
+
+async def wait_until_ready(client, url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get(f"{url}/health/ready")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.01)
+    raise RuntimeError(f"{url} was not ready within {timeout}s")
+
+
+async def chat_latency(client, url: str, index: int):
+    body = {"email": f"startup{index}@example.com", "message": '[script] get_available_slots {"date": "2025-03-03"}'}
+    start = time.perf_counter()
+    response = await client.post(f"{url}/chat", json=body)
+    response.raise_for_status()
+    return (time.perf_counter() - start) * 1000
+
+
+async def cold_start(warmup: bool, calcom_url: str, openai_url: str):
+    port = free_port()
+    url = f"http://127.0.0.1:{port}"
+    started = time.perf_counter()
+    process = spawn(
+        ["-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        env={
+            "OPENAI_API_KEY": "standin",
+            "OPENAI_BASE_URL": f"{openai_url}/v1",
+            "CALCOM_API_KEY": "standin",
+            "CALCOM_API_URL": f"{calcom_url}/v2",
+            "WARMUP": "true" if warmup else "false",
+        },
+    )
+    try:
+        async with httpx.AsyncClient(timeout=30) as client:
+            while True:
+                try:
+                    await client.get(url)
+                    break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.01)
+            live_ms = (time.perf_counter() - started) * 1000
+            await wait_until_ready(client, url)
+            ready_ms = (time.perf_counter() - started) * 1000
+            first_ms = await chat_latency(client, url, 0)
+            second_ms = await chat_latency(client, url, 1)
+    finally:
+        process.terminate()
+        process.wait()
+    return live_ms, ready_ms, first_ms, second_ms
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5, help="fresh processes per measurement (medians are reported)")
+    args = parser.parse_args()
+
+    app_ms, lazy_ms = import_times(args.runs)
+    print(f"import main: {app_ms:.0f}ms (openai + numpy, imported later by the warmup: {lazy_ms:.0f}ms more)")
+
+    calcom_port, openai_port = free_port(), free_port()
+    calcom_url = f"http://127.0.0.1:{calcom_port}"
+    openai_url = f"http://127.0.0.1:{openai_port}"
+    standins = [
+        spawn(["standins/calcom_server.py", "--port", str(calcom_port), "--latency-ms", "0"]),
+        spawn(["standins/openai_server.py", "--port", str(openai_port), "--latency-ms", "0"]),
+    ]
+    try:
+        for url in (calcom_url, openai_url):
+            await wait_until_up(url)
+        print(f"\nMedian of {args.runs} cold starts, ms since the worker process was spawned")
+        print(f"{'warmup':<10}{'serving':>9}{'ready':>9}{'1st chat':>10}{'2nd chat':>10}")
+        for warmup in (False, True):
+            runs = [await cold_start(warmup, calcom_url, openai_url) for _ in range(args.runs)]
+            live, ready, first, second = (statistics.median(column) for column in zip(*runs))
+            print(f"{'on' if warmup else 'off':<10}{live:>9.0f}{ready:>9.0f}{first:>10.1f}{second:>10.1f}")
+    finally:
+        for process in standins:
+            process.terminate()
+        for process in standins:
+            process.wait()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
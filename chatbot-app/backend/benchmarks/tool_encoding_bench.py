@@ -0,0 +1,94 @@
+# Prompt tokens for tool results, plain json.dumps vs the compact encoding.
+#
+# Encodes representative tool results both ways and counts their tokens,
+# then totals the tool-result tokens re-sent to the model over a multi-turn
+# conversation (every earlier result is part of every later prompt).
+# Tokens are counted with tiktoken when it is installed, otherwise estimated
+# at 4 characters per token.
+#
+# Usage (from the backend directory):
+#   python benchmarks/tool_encoding_bench.py --bookings 50 --turns 6
+
+import argparse
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import generate_mock_slots
+from tool_encoding import encode_tool_result
+
+EMAIL = "bench@example.com"
+
+
+def token_counter():
+    try:
+        import tiktoken
+    except ImportError:
+        return "estimated (chars/4)", lambda text: len(text) // 4
+    encoding = tiktoken.get_encoding("cl100k_base")
+    return "tiktoken cl100k_base", lambda text: len(encoding.encode(text))
+
+
+def calcom_slots(date: str):
+    # Shape produced by get_available_slots for the Cal.com API, lunch booked
+    return {"slots": [
+        {"start": f"{date}T{h:02d}:{m:02d}:00.000Z", "end": f"{date}T{h:02d}:{m:02d}:00.000Z", "available": True}
+        for h in range(9, 17) for m in (0, 30) if h != 12
+    ]}
+
+
+def bookings(count: int):
+    return {"bookings": [
+        {
+            "id": f"mock_event_{i}",
+            "email": EMAIL,
+            "title": f"Project sync {i}",
+            "start": f"2025-03-{3 + i % 20:02d}T{9 + i % 8:02d}:00:00Z",
+            "end": f"2025-03-{3 + i % 20:02d}T{10 + i % 8:02d}:00:00Z",
+            "status": "confirmed",
+        }
+        for i in range(count)
+    ]}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bookings", type=int, default=50, help="bookings in the long list_events result")
+    parser.add_argument("--turns", type=int, default=6, help="model round-trips in the conversation")
+    parser.add_argument("--max-items", type=int, default=20)
+    args = parser.parse_args()
+
+    method, count = token_counter()
+    cases = [
+        ("get_available_slots (mock)", generate_mock_slots("2025-03-03")),
+        ("get_available_slots (Cal.com)", calcom_slots("2025-03-03")),
+        ("list_events (5)", bookings(5)),
+        (f"list_events ({args.bookings})", bookings(args.bookings)),
+        ("book_event", {"booking": bookings(1)["bookings"][0], "message": "Booking successful"}),
+    ]
+
+    print(f"Tokens per tool result, {method}")
+    print(f"{'result':<32}{'json':>8}{'compact':>9}{'saved':>8}")
+    for name, result in cases:
+        plain = count(json.dumps(result))
+        compact = count(encode_tool_result(result, args.max_items))
+        print(f"{name:<32}{plain:>8}{compact:>9}{1 - compact / plain:>8.0%}")
+
+    # Each round-trip adds two slot lookups and a booking list; all earlier
+    # results are re-sent with every later prompt
+    turn_results = [generate_mock_slots("2025-03-03"), calcom_slots("2025-03-04"), bookings(5)]
+    totals = {}
+    for label, encode in (("json", json.dumps), ("compact", lambda r: encode_tool_result(r, args.max_items))):
+        per_turn = sum(count(encode(r)) for r in turn_results)
+        totals[label] = sum(per_turn * turn for turn in range(1, args.turns + 1))
+    print(
+        f"\nTool-result prompt tokens over a {args.turns}-round conversation: "
+        f"json {totals['json']}, compact {totals['compact']} "
+        f"({1 - totals['compact'] / totals['json']:.0%} fewer)"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,471 @@
+# Local index of Cal.com bookings, kept fresh by Cal.com webhooks.
+#
+# Without it, every list_events call fetches /v2/bookings and filters the
+# attendees in Python, which gets slower as the whole account's bookings
+# grow. With CALCOM_WEBHOOK_SECRET set, Cal.com's BOOKING_CREATED,
+# BOOKING_CANCELLED and BOOKING_RESCHEDULED webhooks update an index of
+# bookings by attendee email, so list_events reads one user's bookings
+# locally. The app's own writes are recorded as soon as Cal.com accepts
+# them. A periodic reconciliation against the bookings API repairs anything
+# a missed webhook left behind. The index is only used while the last
+# reconciliation is recent.
+#
+# The index lives in the state backend, like the outbox: in memory, or in
+# SQLite or Redis shared by every worker.
+
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import os
+import random
+import sqlite3
+import time
+from datetime import datetime
+
+from metrics import CALCOM_WEBHOOKS
+from sqlite_db import on_db_thread
+
+logger = logging.getLogger("livex.booking_index")
+
+BOOKING_CREATED = "BOOKING_CREATED"
+BOOKING_CANCELLED = "BOOKING_CANCELLED"
+BOOKING_RESCHEDULED = "BOOKING_RESCHEDULED"
+CANCELLED = "cancelled"
+
+
+def verify_signature(secret: str, body: bytes, signature: str):
+    # Cal.com signs the raw body with HMAC-SHA256 in the X-Cal-Signature-256 header
+    if not secret or not signature:
+        return False
+    expected = hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature.strip().lower())
+
+
+def booking_id(booking: dict, numeric_id_field: str = "id"):
+    # The id list_events reports and cancel/reschedule accept: the uid when present
+    return booking.get("uid") or f"cal_{booking.get(numeric_id_field, 'unknown')}"
+
+
+def new_record(booking_id: str, emails: list, title: str, start: str, end: str, status: str, now: float):
+    return {
+        "id": booking_id,
+        "emails": sorted({email for email in emails if email}),
+        "title": title or "Meeting",
+        "start": start,
+        "end": end,
+        "status": (status or "confirmed").lower(),
+        "updated_at": now,
+    }
+
+
+def record_from_api(booking: dict, now: float):
+    # A booking as returned by GET /v2/bookings
+    emails = [attendee.get("email") for attendee in booking.get("attendees") or []]
+    return new_record(booking_id(booking), emails, booking.get("title"), booking.get("startTime"),
+                      booking.get("endTime"), booking.get("status", "confirmed"), now)
+
+
+def record_from_webhook(payload: dict, now: float):
+    # The "payload" of a booking webhook, which names the numeric id bookingId
+    emails = [attendee.get("email") for attendee in payload.get("attendees") or []]
+    return new_record(booking_id(payload, "bookingId"), emails, payload.get("title"), payload.get("startTime"),
+                      payload.get("endTime"), payload.get("status", "confirmed"), now)
+
+
+def same_booking(a: dict, b: dict):
+    return all(a.get(field) == b.get(field) for field in ("emails", "title", "start", "end", "status"))
+
+
+def start_score(record: dict):
+    # Sort key for a user's bookings; unknown starts sort first
+    try:
+        return datetime.fromisoformat((record.get("start") or "").replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return 0.0
+
+
+class MemoryBookingStore:
+    """Process-local booking index."""
+
+    def __init__(self):
+        self.bookings = {}
+        # email -> ids of the bookings that email attends
+        self.by_email = {}
+        self.synced_at = None
+
+    async def get(self, booking_id: str):
+        record = self.bookings.get(booking_id)
+        return dict(record) if record is not None else None
+
+    async def put(self, record: dict):
+        await self.delete(record["id"])
+        self.bookings[record["id"]] = dict(record)
+        for email in record["emails"]:
+            self.by_email.setdefault(email, set()).add(record["id"])
+
+    async def delete(self, booking_id: str):
+        record = self.bookings.pop(booking_id, None)
+        if record is None:
+            return
+        for email in record["emails"]:
+            ids = self.by_email.get(email)
+            if ids is not None:
+                ids.discard(booking_id)
+                if not ids:
+                    del self.by_email[email]
+
+    async def for_email(self, email: str):
+        records = [dict(self.bookings[booking_id]) for booking_id in self.by_email.get(email, ())]
+        return sorted(records, key=start_score)
+
+    async def all(self):
+        return {booking_id: dict(record) for booking_id, record in self.bookings.items()}
+
+    async def count(self):
+        return len(self.bookings)
+
+    async def get_synced_at(self):
+        return self.synced_at
+
+    async def set_synced_at(self, synced_at: float):
+        self.synced_at = synced_at
+
+
+class SQLiteBookingStore:
+    """Booking index tables in the state database, shared by every worker on a host."""
+
+    def __init__(self, db: sqlite3.Connection):
+        self.db = db
+        self.db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS calcom_bookings (
+                id TEXT PRIMARY KEY,
+                record TEXT NOT NULL,
+                start TEXT,
+                updated_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS calcom_booking_attendees (
+                email TEXT NOT NULL,
+                booking_id TEXT NOT NULL,
+                PRIMARY KEY (email, booking_id)
+            );
+            CREATE INDEX IF NOT EXISTS calcom_booking_attendees_booking ON calcom_booking_attendees (booking_id);
+            CREATE TABLE IF NOT EXISTS calcom_booking_sync (
+                name TEXT PRIMARY KEY,
+                value REAL NOT NULL
+            );
+            """
+        )
+
+    @on_db_thread
+    def get(self, booking_id: str):
+        row = self.db.execute("SELECT record FROM calcom_bookings WHERE id = ?", (booking_id,)).fetchone()
+        return json.loads(row["record"]) if row is not None else None
+
+    @on_db_thread
+    def put(self, record: dict):
+        with self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO calcom_bookings (id, record, start, updated_at) VALUES (?, ?, ?, ?)",
+                (record["id"], json.dumps(record), record["start"], record["updated_at"])
+            )
+            self.db.execute("DELETE FROM calcom_booking_attendees WHERE booking_id = ?", (record["id"],))
+            self.db.executemany(
+                "INSERT INTO calcom_booking_attendees (email, booking_id) VALUES (?, ?)",
+                [(email, record["id"]) for email in record["emails"]]
+            )
+
+    @on_db_thread
+    def delete(self, booking_id: str):
+        with self.db:
+            self.db.execute("DELETE FROM calcom_bookings WHERE id = ?", (booking_id,))
+            self.db.execute("DELETE FROM calcom_booking_attendees WHERE booking_id = ?", (booking_id,))
+
+    @on_db_thread
+    def for_email(self, email: str):
+        rows = self.db.execute(
+            "SELECT b.record FROM calcom_booking_attendees a JOIN calcom_bookings b ON b.id = a.booking_id "
+            "WHERE a.email = ?",
+            (email,)
+        ).fetchall()
+        return sorted((json.loads(row["record"]) for row in rows), key=start_score)
+
+    @on_db_thread
+    def all(self):
+        rows = self.db.execute("SELECT id, record FROM calcom_bookings").fetchall()
+        return {row["id"]: json.loads(row["record"]) for row in rows}
+
+    @on_db_thread
+    def count(self):
+        return self.db.execute("SELECT COUNT(*) FROM calcom_bookings").fetchone()[0]
+
+    @on_db_thread
+    def get_synced_at(self):
+        row = self.db.execute("SELECT value FROM calcom_booking_sync WHERE name = 'synced_at'").fetchone()
+        return row["value"] if row is not None else None
+
+    @on_db_thread
+    def set_synced_at(self, synced_at: float):
+        with self.db:
+            self.db.execute(
+                "INSERT INTO calcom_booking_sync (name, value) VALUES ('synced_at', ?) "
+                "ON CONFLICT(name) DO UPDATE SET value = excluded.value",
+                (synced_at,)
+            )
+
+
+class RedisBookingStore:
+    """Booking index on a Redis-protocol server, shared by every worker and node.
+
+    Each booking is a JSON string key; a sorted set per email, scored by
+    start time, lists the bookings that email attends, and one more sorted
+    set holds every booking id for reconciliation. A booking and its email
+    sets are updated in one WATCH/MULTI/EXEC transaction.
+    """
+
+    def __init__(self, redis, prefix: str = "bookings:"):
+        self.redis = redis
+        self.prefix = prefix
+
+    def _booking_key(self, booking_id: str):
+        return f"{self.prefix}booking:{booking_id}"
+
+    def _email_key(self, email: str):
+        return f"{self.prefix}email:{email}"
+
+    @property
+    def _all_key(self):
+        return f"{self.prefix}all"
+
+    async def get(self, booking_id: str):
+        value = await self.redis.execute("GET", self._booking_key(booking_id))
+        return json.loads(value) if value is not None else None
+
+    async def _replace(self, booking_id: str, record: dict = None):
+        # Stores `record` (or deletes the booking when it is None) and moves it
+        # between email sets, based on the emails of the stored version
+        def build(replies):
+            old_emails = json.loads(replies[0])["emails"] if replies[0] is not None else []
+            new_emails = record["emails"] if record is not None else []
+            commands = [("ZREM", self._email_key(email), booking_id) for email in old_emails if email not in new_emails]
+            if record is None:
+                commands.append(("DEL", self._booking_key(booking_id)))
+                commands.append(("ZREM", self._all_key, booking_id))
+            else:
+                commands.append(("SET", self._booking_key(booking_id), json.dumps(record)))
+                commands.append(("ZADD", self._all_key, record["updated_at"], booking_id))
+                score = start_score(record)
+                commands.extend(("ZADD", self._email_key(email), score, booking_id) for email in new_emails)
+            return commands, None
+
+        key = self._booking_key(booking_id)
+        await self.redis.watch([key], [("GET", key)], build)
+
+    async def put(self, record: dict):
+        await self._replace(record["id"], record)
+
+    async def delete(self, booking_id: str):
+        await self._replace(booking_id)
+
+    async def _load_many(self, booking_ids: list):
+        if not booking_ids:
+            return []
+        values = await self.redis.pipeline([("GET", self._booking_key(booking_id)) for booking_id in booking_ids])
+        return [json.loads(value) for value in values if isinstance(value, str)]
+
+    async def for_email(self, email: str):
+        # Already ordered by start time
+        return await self._load_many(await self.redis.execute("ZRANGE", self._email_key(email), 0, -1))
+
+    async def all(self):
+        records = await self._load_many(await self.redis.execute("ZRANGE", self._all_key, 0, -1))
+        return {record["id"]: record for record in records}
+
+    async def count(self):
+        return await self.redis.execute("ZCARD", self._all_key)
+
+    async def get_synced_at(self):
+        value = await self.redis.execute("GET", f"{self.prefix}synced_at")
+        return float(value) if value is not None else None
+
+    async def set_synced_at(self, synced_at: float):
+        await self.redis.execute("SET", f"{self.prefix}synced_at", str(synced_at))
+
+
+class BookingIndex:
+    """Applies webhooks and reconciliations to a booking store and answers lookups.
+
+    `fetch()` returns every booking on the Cal.com account in the bookings
+    API's shape; `on_change(days)` is told which days' availability a change
+    touched (to invalidate cached slots). Lookups return None, meaning "ask
+    the API", while the index is disabled or its last successful
+    reconciliation is older than `stale_after` seconds.
+    """
+
+    def __init__(self, store, fetch, on_change=None, secret: str = None, reconcile_interval: float = 300.0,
+                 stale_after: float = None):
+        self.store = store
+        self.fetch = fetch
+        self.on_change = on_change
+        self.secret = secret
+        self.reconcile_interval = reconcile_interval
+        self.stale_after = stale_after if stale_after is not None else 3 * reconcile_interval
+        self.task = None
+        self.counts = {"webhooks": 0, "ignored": 0, "reconciliations": 0, "repaired": 0, "local_reads": 0}
+
+    @classmethod
+    def from_env(cls, store, fetch, on_change=None):
+        return cls(
+            store,
+            fetch,
+            on_change,
+            secret=os.getenv("CALCOM_WEBHOOK_SECRET") or None,
+            reconcile_interval=float(os.getenv("CALCOM_RECONCILE_INTERVAL", "300")),
+        )
+
+    @property
+    def enabled(self):
+        # Without webhooks the index would only be as fresh as the last reconciliation
+        return self.secret is not None
+
+    def verify(self, body: bytes, signature: str):
+        return verify_signature(self.secret, body, signature)
+
+    async def _changed(self, *records):
+        days = sorted({record["start"][:10] for record in records if record and record.get("start")})
+        if days and self.on_change is not None:
+            await self.on_change(days)
+
+    async def apply_webhook(self, event: dict):
+        """Applies one Cal.com webhook event; returns what was done with it."""
+        trigger = event.get("triggerEvent")
+        payload = event.get("payload") or {}
+        if trigger not in (BOOKING_CREATED, BOOKING_CANCELLED, BOOKING_RESCHEDULED) or not isinstance(payload, dict):
+            # PING (sent when the webhook is set up) and events we do not index
+            self.counts["ignored"] += 1
+            CALCOM_WEBHOOKS.inc(trigger or "unknown", "ignored")
+            return {"applied": False}
+
+        record = record_from_webhook(payload, time.time())
+        existing = await self.store.get(record["id"])
+        if trigger == BOOKING_CREATED and existing is not None and existing["status"] == CANCELLED:
+            # Delivered after the cancellation; a cancelled uid is never reused
+            self.counts["ignored"] += 1
+            CALCOM_WEBHOOKS.inc(trigger, "ignored")
+            return {"applied": False}
+        if trigger == BOOKING_CANCELLED:
+            record["status"] = CANCELLED
+        changed = [existing, record]
+
+        if trigger == BOOKING_RESCHEDULED:
+            # Cal.com gives the new booking a new uid and names the old one
+            previous_id = payload.get("rescheduleUid") or payload.get("fromReschedule")
+            if previous_id and previous_id != record["id"]:
+                previous = await self.store.get(previous_id)
+                if previous is not None:
+                    previous["status"] = CANCELLED
+                    previous["updated_at"] = record["updated_at"]
+                    await self.store.put(previous)
+                    changed.append(previous)
+                elif payload.get("rescheduleStartTime"):
+                    changed.append({"start": payload["rescheduleStartTime"]})
+
+        await self.store.put(record)
+        await self._changed(*changed)
+        self.counts["webhooks"] += 1
+        CALCOM_WEBHOOKS.inc(trigger, "applied")
+        return {"applied": True, "id": record["id"]}
+
+    async def record(self, booking_id: str, email: str, title: str, start: str, end: str, status: str = "confirmed"):
+        # A write of ours Cal.com has accepted, before (or instead of) its webhook
+        if not self.enabled:
+            return
+        existing = await self.store.get(booking_id)
+        emails = sorted(set(existing["emails"]) | {email}) if existing is not None else [email]
+        await self.store.put(new_record(booking_id, emails, title, start, end, status, time.time()))
+
+    async def update(self, booking_id: str, **fields):
+        # Applies an accepted cancel (status) or reschedule (start, end) of ours
+        if not self.enabled:
+            return
+        existing = await self.store.get(booking_id)
+        if existing is not None:
+            existing.update(fields, updated_at=time.time())
+            await self.store.put(existing)
+
+    async def bookings_for(self, email: str):
+        """`email`'s bookings ordered by start time, or None if the API has to be asked."""
+        if not self.enabled:
+            return None
+        synced_at = await self.store.get_synced_at()
+        if synced_at is None or time.time() - synced_at > self.stale_after:
+            return None
+        self.counts["local_reads"] += 1
+        return await self.store.for_email(email)
+
+    async def reconcile(self):
+        """Makes the index match the bookings API; returns how many bookings were repaired."""
+        started = time.time()
+        remote = {}
+        for booking in await self.fetch():
+            record = record_from_api(booking, started)
+            remote[record["id"]] = record
+        local = await self.store.all()
+
+        repaired = []
+        for booking_id, record in remote.items():
+            current = local.get(booking_id)
+            # Entries updated while the API was being read are newer than its answer
+            if current is None or (not same_booking(current, record) and current["updated_at"] < started):
+                await self.store.put(record)
+                repaired.extend([current, record])
+        for booking_id, current in local.items():
+            if booking_id not in remote and current["updated_at"] < started:
+                await self.store.delete(booking_id)
+                repaired.append(current)
+
+        await self.store.set_synced_at(started)
+        await self._changed(*repaired)
+        count = len({record["id"] for record in repaired if record})
+        self.counts["reconciliations"] += 1
+        self.counts["repaired"] += count
+        logger.info("Booking index reconciled", extra={"bookings": len(remote), "repaired": count,
+                                                        "duration_ms": round((time.time() - started) * 1000, 1)})
+        return count
+
+    def start(self):
+        if self.enabled and self.task is None:
+            self.task = asyncio.get_running_loop().create_task(self._run(), name="booking-reconciler")
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def _run(self):
+        while True:
+            try:
+                # With a shared backend another worker may have just done it
+                synced_at = await self.store.get_synced_at()
+                if synced_at is None or time.time() - synced_at >= self.reconcile_interval:
+                    await self.reconcile()
+            except Exception:
+                logger.exception("Booking index reconciliation failed")
+            # Jittered, so workers started together do not reconcile together
+            await asyncio.sleep(self.reconcile_interval * random.uniform(0.5, 1.0))
+
+    async def stats(self):
+        synced_at = await self.store.get_synced_at() if self.enabled else None
+        return {
+            "enabled": self.enabled,
+            "bookings": await self.store.count() if self.enabled else 0,
+            "synced_seconds_ago": round(time.time() - synced_at, 1) if synced_at is not None else None,
+            "fresh": synced_at is not None and time.time() - synced_at <= self.stale_after,
+            **self.counts,
+        }
@@ -0,0 +1,194 @@
+import asyncio
+import os
+import random
+
+import httpx
+
+from circuit_breaker import CircuitBreaker
+from deadline import DeadlineExceeded, current_deadline, remaining, within_deadline
+from metrics import CALCOM_COALESCED_READS, UPSTREAM_RESPONSES
+from single_flight import SingleFlight
+from tracing import span
+
+# Status codes worth retrying: rate limiting and transient server errors
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+# Methods that are safe to resend after the server may already have acted on them
+IDEMPOTENT_METHODS = {"GET", "DELETE", "PATCH"}
+
+
+class CalcomClient:
+    """Application-scoped Cal.com API client.
+
+    Wraps one pooled httpx.AsyncClient so connections are kept alive across
+    tool calls, auth headers are built once, every request has a timeout and
+    transient failures are retried with jittered exponential backoff. Each
+    attempt is reported to an optional circuit breaker, and concurrent
+    identical GETs share one upstream call.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = "https://api.cal.com/v2",
+        connect_timeout: float = 3.0,
+        read_timeout: float = 10.0,
+        max_retries: int = 2,
+        backoff_base: float = 0.2,
+        backoff_max: float = 2.0,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        transport: httpx.AsyncBaseTransport = None,
+        breaker: CircuitBreaker = None,
+        coalesce_reads: bool = True,
+    ):
+        self.api_key = api_key
+        # Optional; once open, requests raise CircuitOpenError without reaching Cal.com
+        self.breaker = breaker
+        self.single_flight = SingleFlight(on_collapse=CALCOM_COALESCED_READS.inc) if coalesce_reads else None
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.http = httpx.AsyncClient(
+            base_url=base_url,
+            headers={
+                "Authorization": f"Bearer {api_key}",
+                "Content-Type": "application/json",
+            },
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                # Longer than httpx's 5s default, so connections opened by the
+                # startup warmup are still there for the first requests
+                keepalive_expiry=keepalive_expiry,
+            ),
+            transport=transport,
+        )
+
+    @classmethod
+    def from_env(cls, breaker: CircuitBreaker = None):
+        return cls(
+            api_key=os.getenv("CALCOM_API_KEY", ""),
+            base_url=os.getenv("CALCOM_API_URL", "https://api.cal.com/v2"),
+            connect_timeout=float(os.getenv("CALCOM_CONNECT_TIMEOUT", "3")),
+            read_timeout=float(os.getenv("CALCOM_READ_TIMEOUT", "10")),
+            max_retries=int(os.getenv("CALCOM_MAX_RETRIES", "2")),
+            max_connections=int(os.getenv("CALCOM_MAX_CONNECTIONS", "100")),
+            keepalive_expiry=float(os.getenv("CALCOM_KEEPALIVE_EXPIRY", "30")),
+            breaker=breaker,
+            coalesce_reads=os.getenv("CALCOM_COALESCE_READS", "true").lower() != "false",
+        )
+
+    def backoff_delay(self, attempt: int, retry_after: str = None):
+        # Honour Retry-After from a 429 when it is a plain number of seconds
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        # Full jitter: a random delay up to the capped exponential backoff
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _timeout(self):
+        # Per-attempt timeout, shortened to fit the current request deadline
+        left = remaining()
+        if left is None:
+            return None
+        if left <= 0:
+            raise DeadlineExceeded("request deadline exceeded")
+        return httpx.Timeout(min(self.read_timeout, left), connect=min(self.connect_timeout, left))
+
+    async def _sleep_before_retry(self, delay: float):
+        # Retrying is pointless when the backoff alone would outlast the deadline
+        left = remaining()
+        if left is not None and delay >= left:
+            return False
+        await asyncio.sleep(delay)
+        return True
+
+    async def _send(self, method: str, path: str, **kwargs):
+        # One attempt, with its outcome reported to the circuit breaker
+        timeout = self._timeout()
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        if self.breaker is not None:
+            self.breaker.before_request()
+        try:
+            with span(f"calcom {method} {path}", "calcom"):
+                response = await self.http.request(method, path, **kwargs)
+        except httpx.TransportError:
+            UPSTREAM_RESPONSES.inc("calcom", "error")
+            if self.breaker is not None:
+                self.breaker.record_failure()
+            raise
+        except BaseException:
+            if self.breaker is not None:
+                self.breaker.record_cancelled()
+            raise
+        UPSTREAM_RESPONSES.inc("calcom", response.status_code)
+        if self.breaker is None:
+            return response
+        if response.status_code in RETRY_STATUS_CODES:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return response
+
+    async def request(self, method: str, path: str, **kwargs):
+        method = method.upper()
+        attempt = 0
+        while True:
+            try:
+                response = await self._send(method, path, **kwargs)
+            except (httpx.ConnectError, httpx.ConnectTimeout):
+                # The request never reached the server, so any method can be resent
+                if attempt >= self.max_retries or not await self._sleep_before_retry(self.backoff_delay(attempt)):
+                    raise
+                attempt += 1
+                continue
+            except httpx.TransportError:
+                if method not in IDEMPOTENT_METHODS or attempt >= self.max_retries:
+                    raise
+                if not await self._sleep_before_retry(self.backoff_delay(attempt)):
+                    raise
+                attempt += 1
+                continue
+
+            retryable = response.status_code == 429 or (
+                response.status_code in RETRY_STATUS_CODES and method in IDEMPOTENT_METHODS
+            )
+            if not retryable or attempt >= self.max_retries:
+                return response
+            if not await self._sleep_before_retry(self.backoff_delay(attempt, response.headers.get("Retry-After"))):
+                return response
+            attempt += 1
+
+    async def get(self, path: str, **kwargs):
+        if self.single_flight is None:
+            return await self.request("GET", path, **kwargs)
+        # Responses are fully read, so one Response object can be shared by every waiter
+        params = kwargs.get("params") or {}
+        key = (path, tuple(sorted((str(k), str(v)) for k, v in dict(params).items())), repr(kwargs.get("headers")))
+        # Each waiter gives up at its own deadline; the shared call keeps going for the others
+        return await within_deadline(self.single_flight.do(key, lambda: self._shared_get(path, **kwargs)))
+
+    async def _shared_get(self, path: str, **kwargs):
+        # Runs as the single-flight task, whose context is a copy of the first
+        # caller's; waiters have different deadlines, so it drops that caller's
+        current_deadline.set(None)
+        return await self.request("GET", path, **kwargs)
+
+    async def post(self, path: str, **kwargs):
+        return await self.request("POST", path, **kwargs)
+
+    async def patch(self, path: str, **kwargs):
+        return await self.request("PATCH", path, **kwargs)
+
+    async def delete(self, path: str, **kwargs):
+        return await self.request("DELETE", path, **kwargs)
+
+    async def aclose(self):
+        await self.http.aclose()
@@ -0,0 +1,121 @@
+import logging
+import time
+from collections import deque
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+logger = logging.getLogger("livex.circuit_breaker")
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling an upstream whose circuit is open."""
+
+
+class CircuitBreaker:
+    """Circuit breaker for one upstream service.
+
+    Closed: requests flow, outcomes are tracked. The circuit opens after
+    `failure_threshold` consecutive failures, or when the error rate over the
+    last `window_size` outcomes reaches `error_rate_threshold` (once at least
+    `min_requests` have been seen).
+    Open: requests fail fast with CircuitOpenError for `recovery_time` seconds.
+    Half-open: up to `half_open_max_calls` probe requests are let through;
+    a successful probe closes the circuit, a failed one reopens it.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        error_rate_threshold: float = 0.5,
+        window_size: int = 20,
+        min_requests: int = 10,
+        recovery_time: float = 30.0,
+        half_open_max_calls: int = 1,
+        clock=time.monotonic,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.error_rate_threshold = error_rate_threshold
+        self.min_requests = min_requests
+        self.recovery_time = recovery_time
+        self.half_open_max_calls = half_open_max_calls
+        self.clock = clock
+        self.state = CLOSED
+        self.outcomes = deque(maxlen=window_size)
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.half_open_calls = 0
+        self.rejected = 0
+        self.transitions = deque(maxlen=20)
+
+    def _transition(self, state: str, reason: str):
+        logger.warning("Circuit breaker state change", extra={"breaker": self.name, "from": self.state, "to": state, "reason": reason})
+        self.transitions.append({"from": self.state, "to": state, "reason": reason, "at": time.time()})
+        self.state = state
+        if state == OPEN:
+            self.opened_at = self.clock()
+        elif state == CLOSED:
+            self.outcomes.clear()
+            self.consecutive_failures = 0
+        self.half_open_calls = 0
+
+    def error_rate(self):
+        if not self.outcomes:
+            return 0.0
+        return self.outcomes.count(False) / len(self.outcomes)
+
+    def before_request(self):
+        # Raises CircuitOpenError when the request must not reach the upstream
+        if self.state == OPEN:
+            if self.clock() - self.opened_at < self.recovery_time:
+                self.rejected += 1
+                raise CircuitOpenError(f"{self.name} circuit is open")
+            self._transition(HALF_OPEN, "recovery time elapsed")
+        if self.state == HALF_OPEN:
+            if self.half_open_calls >= self.half_open_max_calls:
+                self.rejected += 1
+                raise CircuitOpenError(f"{self.name} circuit is half-open and a probe is in flight")
+            self.half_open_calls += 1
+
+    def record_success(self):
+        if self.state == HALF_OPEN:
+            self._transition(CLOSED, "probe succeeded")
+            return
+        self.consecutive_failures = 0
+        self.outcomes.append(True)
+
+    def record_failure(self):
+        if self.state == HALF_OPEN:
+            self._transition(OPEN, "probe failed")
+            return
+        if self.state == OPEN:
+            return
+        self.consecutive_failures += 1
+        self.outcomes.append(False)
+        if self.consecutive_failures >= self.failure_threshold:
+            self._transition(OPEN, f"{self.consecutive_failures} consecutive failures")
+        elif len(self.outcomes) >= self.min_requests and self.error_rate() >= self.error_rate_threshold:
+            self._transition(OPEN, f"error rate {self.error_rate():.0%} over last {len(self.outcomes)} requests")
+
+    def record_cancelled(self):
+        # A cancelled request says nothing about upstream health, but frees its probe slot
+        if self.state == HALF_OPEN and self.half_open_calls > 0:
+            self.half_open_calls -= 1
+
+    def snapshot(self):
+        retry_in = None
+        if self.state == OPEN:
+            retry_in = max(0.0, self.recovery_time - (self.clock() - self.opened_at))
+        return {
+            "name": self.name,
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "error_rate": round(self.error_rate(), 3),
+            "window": len(self.outcomes),
+            "rejected": self.rejected,
+            "retry_in": retry_in,
+            "transitions": list(self.transitions),
+        }
@@ -0,0 +1,57 @@
+# Busy-time bitmaps for the mock calendar.
+#
+# A day is divided into 15-minute cells and its bookings are kept as one
+# Python int with a bit set for every busy cell (96 bits per day). Checking
+# a new booking for conflicts is a single AND, booking or cancelling is a
+# single OR / AND NOT, and free slots are found without looking at the
+# bookings themselves.
+
+from timestamps import MINUTES_PER_DAY, minute_of_day
+
+CELL_MINUTES = 15
+CELLS_PER_DAY = MINUTES_PER_DAY // CELL_MINUTES
+# The mock host's working hours and slot length
+OPEN_MINUTE = 9 * 60
+CLOSE_MINUTE = 17 * 60
+SLOT_MINUTES = 30
+
+
+class BookingConflictError(Exception):
+    """Raised when a booking would overlap an existing one."""
+
+
+def span_mask(start_minute: int, end_minute: int):
+    # Cells touched by [start_minute, end_minute), rounded outwards
+    first = max(0, start_minute) // CELL_MINUTES
+    last = min(CELLS_PER_DAY, -(-end_minute // CELL_MINUTES))
+    if last <= first:
+        return 0
+    return ((1 << (last - first)) - 1) << first
+
+
+def booking_mask(start: str, end: str):
+    # Busy cells of a booking on its start day; one ending on a later day runs to midnight
+    end_minute = minute_of_day(end) if end[:10] == start[:10] else MINUTES_PER_DAY
+    return span_mask(minute_of_day(start), end_minute)
+
+
+def is_free(busy: int, mask: int):
+    return busy & mask == 0
+
+
+def free_starts(busy: int, duration: int = SLOT_MINUTES, step: int = SLOT_MINUTES,
+                open_minute: int = OPEN_MINUTE, close_minute: int = CLOSE_MINUTE):
+    # Start minutes within working hours where `duration` minutes are free
+    return [
+        start
+        for start in range(open_minute, close_minute - duration + 1, step)
+        if is_free(busy, span_mask(start, start + duration))
+    ]
+
+
+def to_bytes(busy: int):
+    return busy.to_bytes(CELLS_PER_DAY // 8, "big")
+
+
+def from_bytes(data: bytes):
+    return int.from_bytes(data, "big") if data else 0
@@ -0,0 +1,46 @@
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# Absolute time.monotonic() deadline of the request being handled, if any.
+# Context variables are copied into tasks, so tool calls started with
+# gather/ensure_future see the deadline of the request that started them.
+current_deadline = ContextVar("current_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    """Raised when the current request has run out of time."""
+
+
+@contextmanager
+def request_deadline(seconds: float):
+    token = current_deadline.set(time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        current_deadline.reset(token)
+
+
+def remaining():
+    # Seconds left before the current deadline, or None without one
+    deadline = current_deadline.get()
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+
+async def within_deadline(awaitable):
+    # Awaits `awaitable`, cancelling it and raising DeadlineExceeded once the
+    # current deadline passes
+    left = remaining()
+    if left is None:
+        return await awaitable
+    if left <= 0:
+        if asyncio.iscoroutine(awaitable):
+            awaitable.close()
+        raise DeadlineExceeded("request deadline exceeded")
+    try:
+        return await asyncio.wait_for(awaitable, left)
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded("request deadline exceeded") from None
@@ -0,0 +1,55 @@
+# JSON encoding for request bodies, tool results, SSE events and responses.
+#
+# Uses orjson when it is installed (several times faster than the json
+# module for both directions, and FastAPI has a response class for it) and
+# falls back to the standard library otherwise. Both produce compact output.
+
+import json
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    from fastapi.responses import ORJSONResponse as ResponseClass
+
+    BACKEND = "orjson"
+    # Like json.dumps: int keys become strings, unknown types their str()
+    DUMPS_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumps(value) -> str:
+        return orjson.dumps(value, default=str, option=DUMPS_OPTIONS).decode()
+
+    loads = orjson.loads
+else:
+    ResponseClass = JSONResponse
+    BACKEND = "json"
+
+    def dumps(value) -> str:
+        return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str)
+
+    loads = json.loads
+
+
+class FastJSONRequest(Request):
+    async def json(self):
+        if not hasattr(self, "_json"):
+            self._json = loads(await self.body())
+        return self._json
+
+
+class FastJSONRoute(APIRoute):
+    """Route class parsing JSON request bodies with the fast decoder."""
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def fast_json_handler(request: Request):
+            return await handler(FastJSONRequest(request.scope, request.receive))
+
+        return fast_json_handler
@@ -1,18 +1,230 @@
-from fastapi import FastAPI
+import asyncio
+import importlib
+import logging
+import time
+from contextlib import asynccontextmanager, contextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-import openai
+from pydantic import BaseModel, model_validator
+from typing import List, Literal, Optional
+from typing_extensions import NotRequired, TypedDict
+import httpx
 import os
-import json
 from dotenv import load_dotenv
-import requests
-from datetime import datetime
+from datetime import datetime, timedelta
+from availability import booking_intervals, date_range, find_free_windows, slot_intervals
+from booking_index import BookingIndex
+from admission import AdmissionRejected, ConcurrencyLimiter, TokenBucketLimiter
+from calcom_client import RETRY_STATUS_CODES, CalcomClient
+from circuit_breaker import CLOSED, HALF_OPEN, CircuitBreaker, CircuitOpenError
+from day_bitmap import BookingConflictError, free_starts, span_mask
+from deadline import DeadlineExceeded, remaining, request_deadline, within_deadline
+from json_codec import FastJSONRoute, ResponseClass, dumps, loads
+from logging_setup import setup_logging
+from metrics import (
+    CALCOM_WEBHOOKS, CHAT_REQUEST_SECONDS, CHAT_ROUNDS, MOCK_FALLBACKS, OPENAI_REQUEST_SECONDS, OPENAI_SLOT_WAIT_SECONDS, TOOL_SECONDS,
+    UPSTREAM_RESPONSES, CallbackGauge, registry
+)
+from outbox import FAILED, SENT, Outbox, SQLiteOutboxStore, WriteRejected, chat_turn, request_key
+from slot_cache import SlotCache, SharedSlotCache
+from sessions import SessionStore, BackendSessionStore, compact_history
+from sqlite_db import connect
+from state_backend import create_state_backend
+from timestamps import add_minutes, clock
+from tool_encoding import encode_tool_result
+from tool_registry import ToolRegistry
+from tracing import LoopStallMonitor, Tracer, TracingMiddleware, span
+from warmup import Warmup, open_connections
 
 load_dotenv()
-openai.api_key = os.getenv("OPENAI_API_KEY")
+# Structured JSON logs written by a background thread (LOG_LEVEL, default INFO)
+log_handler = setup_logging()
+logger = logging.getLogger("livex.app")
 calcom_api_key = os.getenv("CALCOM_API_KEY")
+calcom_event_type_id = int(os.getenv("CALCOM_EVENT_TYPE_ID", "1"))
+# Length of the event type's slots; the slots API only returns start times
+calcom_slot_minutes = int(os.getenv("CALCOM_SLOT_MINUTES", "30"))
+openai_model = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
+parallel_tool_calls = os.getenv("OPENAI_PARALLEL_TOOL_CALLS", "true").lower() != "false"
+# Tool results are re-sent to the model on every later round-trip, so by
+# default they are compacted (slot ranges, no constant fields, capped lists)
+compact_tool_results = os.getenv("TOOL_RESULT_ENCODING", "compact").lower() != "json"
+tool_result_max_items = int(os.getenv("TOOL_RESULT_MAX_ITEMS", "20"))
+
+# Async clients so a slow OpenAI or Cal.com round-trip only suspends the
+# current request instead of blocking the whole event loop.
+# The Cal.com client is created once per application in the lifespan hook.
+calcom_client = None
+openai_client = None
+openai_http_client = None
+# Idle pooled connections are kept this long, so the ones opened by the
+# startup warmup are still open when the first requests come in
+openai_keepalive_expiry = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "30"))
+# Cal.com writes (book, cancel, reschedule) are queued in the state backend
+# (or, with the in-memory one, in OUTBOX_PATH) and sent by a background
+# worker, so users do not wait on them. Created in the lifespan hook
+calcom_outbox = None
+
+# Fails Cal.com calls fast during an outage so tools fall back to mock data
+# immediately instead of waiting on timeouts and retries
+calcom_breaker = CircuitBreaker(
+    "calcom",
+    failure_threshold=int(os.getenv("CALCOM_BREAKER_FAILURE_THRESHOLD", "5")),
+    error_rate_threshold=float(os.getenv("CALCOM_BREAKER_ERROR_RATE", "0.5")),
+    recovery_time=float(os.getenv("CALCOM_BREAKER_RECOVERY_TIME", "30")),
+)
+
+# Admission control: a global cap on chat requests talking to OpenAI at once
+# (each holds one slot for all of its rounds) with a bounded wait queue, and a
+# per-email token bucket so one user cannot starve the rest.
+# Requests over either limit get a fast 429 with Retry-After.
+openai_limiter = ConcurrencyLimiter(
+    max_concurrent=int(os.getenv("OPENAI_MAX_CONCURRENCY", "32")),
+    max_queue=int(os.getenv("OPENAI_MAX_QUEUE", "64")),
+    queue_timeout=float(os.getenv("OPENAI_QUEUE_TIMEOUT", "10")),
+    on_wait=OPENAI_SLOT_WAIT_SECONDS.observe,
+)
+email_rate_limiter = TokenBucketLimiter(
+    rate=float(os.getenv("CHAT_RATE_PER_EMAIL", "1")),
+    burst=int(os.getenv("CHAT_BURST_PER_EMAIL", "5")),
+)
+
+# Per-request execution budget: at most this many model round-trips and this
+# many seconds of wall-clock time, after which outstanding OpenAI and Cal.com
+# work is cancelled and a partial answer is returned
+chat_max_rounds = int(os.getenv("CHAT_MAX_ROUNDS", "6"))
+chat_deadline = float(os.getenv("CHAT_DEADLINE", "45"))
+
+# Opt-in tracing of chat requests ("X-Trace: 1" header or TRACE_SAMPLE_RATE),
+# written as Chrome trace-event files to TRACE_DIR, and a watchdog that
+# reports event loop stalls longer than LOOP_STALL_THRESHOLD seconds
+tracer = Tracer.from_env()
+loop_monitor = LoopStallMonitor(threshold=float(os.getenv("LOOP_STALL_THRESHOLD", "0.1")))
+
+# State shared by all conversations: mock bookings, id counters and caches.
+# The default in-memory backend is only correct with a single worker; use
+# STATE_BACKEND=sqlite:///state.db (one host) or redis://host:6379/0 (many
+# hosts) when running uvicorn with --workers N.
+mock_store_path = os.getenv("MOCK_STORE_PATH")
+state_backend = create_state_backend(os.getenv("STATE_BACKEND") or (f"sqlite:///{mock_store_path}" if mock_store_path else None))
+
+# Mock data for Cal.com API, indexed by id, email and day
+mock_store = state_backend.events
+
+slot_cache_ttl = float(os.getenv("SLOT_CACHE_TTL", "60"))
+session_ttl = float(os.getenv("SESSION_TTL", "3600"))
+if state_backend.shared:
+    # Available slots from the Cal.com API and conversation sessions, visible to every worker
+    slot_cache = SharedSlotCache(state_backend, ttl=slot_cache_ttl)
+    session_store = BackendSessionStore(state_backend, ttl=session_ttl)
+else:
+    # Available slots from the Cal.com API, shared by all conversations in this process
+    slot_cache = SlotCache(ttl=slot_cache_ttl, max_entries=int(os.getenv("SLOT_CACHE_SIZE", "512")))
+    # Server-side conversation history, so clients only send the new user message
+    session_store = SessionStore(ttl=session_ttl, max_sessions=int(os.getenv("SESSION_MAX", "10000")))
+
+# Gauges read at scrape time; the counters and histograms live in metrics.py
+registry.register(CallbackGauge(
+    "livex_openai_in_flight", "Chat requests holding an OpenAI slot", lambda: openai_limiter.in_flight))
+registry.register(CallbackGauge(
+    "livex_openai_queue_depth", "Requests waiting for an OpenAI slot", lambda: openai_limiter.waiting))
+registry.register(CallbackGauge(
+    "livex_calcom_circuit_state", "Cal.com circuit breaker state (0 closed, 1 half open, 2 open)",
+    lambda: 0 if calcom_breaker.state == CLOSED else 1 if calcom_breaker.state == HALF_OPEN else 2))
+registry.register(CallbackGauge(
+    "livex_log_records_dropped", "Log records dropped because the log queue was full", lambda: log_handler.dropped))
+
+def get_openai_client():
+    # Created lazily so the app can start without OPENAI_API_KEY set. The
+    # openai package takes about half a second to import, so it is imported
+    # here (normally by the startup warmup) rather than with the app
+    global openai_client, openai_http_client
+    if openai_client is None:
+        from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+        openai_http_client = DefaultAsyncHttpxClient(
+            limits=httpx.Limits(max_connections=1000, max_keepalive_connections=100, keepalive_expiry=openai_keepalive_expiry)
+        )
+        openai_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), http_client=openai_http_client)
+    return openai_client
+
+def calcom_enabled():
+    # Use the real Cal.com API only with a real (non-placeholder, non-test) key
+    return bool(calcom_api_key) and calcom_api_key != "your_calcom_api_key" and not calcom_api_key.startswith("cal_test_")
+
+def durable_outbox_store():
+    # Writes the user was told were received must survive a restart, so with
+    # the in-memory backend they are queued in their own SQLite file
+    if state_backend.shared or not calcom_enabled():
+        return state_backend.outbox
+    return SQLiteOutboxStore(connect(os.getenv("OUTBOX_PATH", "outbox.db")))
+
+# Startup warmup (WARMUP=false disables it): open pooled connections to
+# OpenAI and Cal.com and import the slow modules before the first request,
+# optionally prefetching today's and tomorrow's availability. GET
+# /health/ready reports when it is done
+warmup_connections = int(os.getenv("WARMUP_CONNECTIONS", "2"))
+warmup_availability = os.getenv("WARMUP_AVAILABILITY", "false").lower() == "true"
+
+async def warm_openai():
+    # Imported off the event loop, which keeps serving requests meanwhile
+    await asyncio.to_thread(importlib.import_module, "openai")
+    if openai_client is None and not os.getenv("OPENAI_API_KEY"):
+        return None
+    client = get_openai_client()
+    if openai_http_client is None:
+        # A client set from outside (e.g. in tests) is left alone
+        return None
+    return {"connections": await open_connections(openai_http_client, str(client.base_url), warmup_connections)}
+
+async def warm_calcom():
+    if not calcom_enabled():
+        return None
+    result = {"connections": await open_connections(calcom_client.http, "", warmup_connections)}
+    if warmup_availability:
+        today = datetime.now().date()
+        days = [today.isoformat(), (today + timedelta(days=1)).isoformat()]
+        # One Cal.com request that fills the slot cache for both days
+        await get_slot_range(days)
+        result["prefetched"] = days
+    return result
+
+async def warm_modules():
+    # Imported lazily by availability.py
+    await asyncio.to_thread(importlib.import_module, "numpy")
+    return {"imported": ["numpy"]}
+
+warmup = Warmup.from_env({"openai": warm_openai, "calcom": warm_calcom, "modules": warm_modules})
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global calcom_client, calcom_outbox
+    calcom_client = CalcomClient.from_env(breaker=calcom_breaker)
+    outbox_store = durable_outbox_store()
+    calcom_outbox = Outbox.from_env(outbox_store, send_calcom_write)
+    calcom_outbox.start()
+    if calcom_enabled():
+        booking_index.start()
+    loop_monitor.start()
+    # In the background, so the worker starts serving (and answering health checks) at once
+    warmup.start()
+    try:
+        yield
+    finally:
+        await warmup.stop()
+        await loop_monitor.stop()
+        await booking_index.stop()
+        await calcom_outbox.stop()
+        if outbox_store is not state_backend.outbox:
+            # The outbox's own SQLite file (see durable_outbox_store)
+            outbox_store.db.close()
+        await calcom_client.aclose()
+        calcom_client = None
+        await state_backend.close()
 
-app = FastAPI()
+# Responses are rendered, and JSON request bodies parsed, with orjson when it is installed
+app = FastAPI(lifespan=lifespan, default_response_class=ResponseClass)
+app.router.route_class = FastJSONRoute
 
 app.add_middleware(
     CORSMiddleware,
@@ -20,83 +232,90 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Trace-Id"],
 )
+app.add_middleware(TracingMiddleware, tracer=tracer, paths=("/chat", "/chat/stream"))
+
+session_token_budget = int(os.getenv("SESSION_TOKEN_BUDGET", "3000"))
+session_keep_recent_turns = int(os.getenv("SESSION_KEEP_RECENT_TURNS", "4"))
+
+# Message shapes accepted in ChatRequest.messages. TypedDicts validate into
+# plain dicts, which are passed on to OpenAI as they are
+class ToolCallFunction(TypedDict):
+    name: str
+    arguments: str
+
+class ToolCall(TypedDict):
+    id: str
+    type: Literal["function"]
+    function: ToolCallFunction
+
+class ChatMessage(TypedDict):
+    role: Literal["system", "user", "assistant", "tool"]
+    content: NotRequired[Optional[str]]
+    name: NotRequired[str]
+    tool_call_id: NotRequired[str]
+    tool_calls: NotRequired[List[ToolCall]]
 
 class ChatRequest(BaseModel):
     email: str
-    messages: list
+    # Either the full history (stateless clients) or a conversation id plus the new message
+    messages: Optional[List[ChatMessage]] = None
+    conversation_id: Optional[str] = None
+    message: Optional[str] = None
+
+    @model_validator(mode="after")
+    def check_messages(self):
+        if self.messages is None and self.message is None:
+            raise ValueError("Either 'messages' or 'message' is required")
+        return self
 
-# Mock data for Cal.com API
-mock_events = []
-mock_event_id_counter = 1
+# Cal.com API Functions (with mock implementation). The functions decorated
+# with @tool_registry.tool are the model's tools: their OpenAI schemas and
+# argument validation are derived from the signatures
+tool_registry = ToolRegistry()
 
-# Cal.com API Functions (with mock implementation)
-def get_available_slots(date: str):
-    print(f"Getting available slots for date: {date}")
-    print(f"Using Cal.com API key: {calcom_api_key}")
+@tool_registry.tool("Get available time slots for a date", date="Date in YYYY-MM-DD")
+async def get_available_slots(date: str):
+    logger.info("Getting available slots", extra={"date": date})
     
     try:
         # Try to use the real Cal.com API if we have a valid API key
-        if calcom_api_key and calcom_api_key != "your_calcom_api_key" and not calcom_api_key.startswith("cal_test_"):
+        if calcom_enabled():
+            cached = await slot_cache.get(calcom_event_type_id, date)
+            if cached is not None:
+                logger.debug("Slot cache hit", extra={"date": date})
+                return {"slots": await without_queued_bookings(cached["slots"])}
+            
             # Parse the date and create dateFrom and dateTo parameters
             # dateFrom should be the start of the day, dateTo should be the end of the day
             try:
                 parsed_date = datetime.strptime(date, "%Y-%m-%d")
                 date_from = parsed_date.strftime("%Y-%m-%dT00:00:00Z")
                 date_to = parsed_date.strftime("%Y-%m-%dT23:59:59Z")
-                
-                print(f"Using dateFrom: {date_from}, dateTo: {date_to}")
-                
-                # Using the Cal.com V2 API endpoint for available slots
-                api_url = "https://api.cal.com/v2/slots"
-                print(f"Using API URL: {api_url}")
-                
-                # V2 API uses Authorization header with Bearer token
-                response = requests.get(
-                    api_url,
-                    headers={
-                        "Authorization": f"Bearer {calcom_api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    params={
-                        "startTime": date_from,
-                        "endTime": date_to,
-                        "eventTypeId": 1  # Default event type ID, you may need to adjust this
-                    }
-                )
             except ValueError as e:
-                print(f"Error parsing date: {date}. Error: {str(e)}")
+                logger.warning("Could not parse date", extra={"date": date, "error": str(e)})
                 # If date parsing fails, try using the date as is with time boundaries
                 date_from = f"{date}T00:00:00Z"
                 date_to = f"{date}T23:59:59Z"
-                
-                print(f"Using dateFrom: {date_from}, dateTo: {date_to}")
-                
-                # Using the Cal.com V2 API endpoint for available slots
-                api_url = "https://api.cal.com/v2/slots"
-                print(f"Using API URL: {api_url}")
-                
-                # V2 API uses Authorization header with Bearer token
-                response = requests.get(
-                    api_url,
-                    headers={
-                        "Authorization": f"Bearer {calcom_api_key}",
-                        "Content-Type": "application/json"
-                    },
-                    params={
-                        "startTime": date_from,
-                        "endTime": date_to,
-                        "eventTypeId": 1  # Default event type ID, you may need to adjust this
-                    }
-                )
             
-            print(f"Response status code: {response.status_code}")
-            print(f"Response content: {response.text}")
+            logger.debug("Requesting Cal.com slots", extra={"date_from": date_from, "date_to": date_to})
+            
+            # Using the Cal.com V2 API endpoint for available slots
+            response = await calcom_client.get(
+                "/slots",
+                params={
+                    "startTime": date_from,
+                    "endTime": date_to,
+                    "eventTypeId": calcom_event_type_id
+                }
+            )
+            
+            logger.debug("Cal.com response", extra={"tool": "get_available_slots", "status": response.status_code})
             
             if response.status_code == 200:
                 # Process the response to match our expected format
                 api_response = response.json()
-                print(f"API response: {api_response}")
                 
                 # Transform the Cal.com API V2 response to our expected format
                 slots = []
@@ -104,186 +323,257 @@ def get_available_slots(date: str):
                     for slot in api_response["slots"]:
                         slots.append({
                             "start": slot["time"],
-                            "end": slot["time"],  # V2 API might not provide end time, so we use the same time
+                            "end": add_minutes(slot["time"], calcom_slot_minutes),
                             "available": True
                         })
                 
-                return {"slots": slots}
+                # Cached as Cal.com sent them; queued bookings may still fail
+                await slot_cache.set(calcom_event_type_id, date, {"slots": slots})
+                return {"slots": await without_queued_bookings(slots)}
             else:
-                print(f"Falling back to mock implementation due to API error")
+                mock_fallback("get_available_slots", "api_error", status=response.status_code)
                 # Fall back to mock implementation if API call fails
-                return generate_mock_slots(date)
+                return generate_mock_slots(date, await mock_store.busy_mask(date))
         else:
             # Mock implementation
-            print("Using mock implementation for get_available_slots")
-            return generate_mock_slots(date)
+            mock_fallback("get_available_slots", "not_configured")
+            return generate_mock_slots(date, await mock_store.busy_mask(date))
+    except DeadlineExceeded:
+        # Out of time: the turn stops here rather than answering from mock data
+        raise
     except Exception as e:
-        print(f"Exception in get_available_slots: {str(e)}")
-        print("Falling back to mock implementation due to exception")
+        mock_fallback("get_available_slots", "exception", error=e)
         # Fall back to mock implementation if there's an exception
-        return generate_mock_slots(date)
+        return generate_mock_slots(date, await mock_store.busy_mask(date))
+
+def mock_fallback(tool: str, reason: str, error: Exception = None, status: int = None):
+    # Counts and logs a tool call answered from mock data instead of Cal.com
+    if isinstance(error, CircuitOpenError):
+        reason = "circuit_open"
+    MOCK_FALLBACKS.inc(tool, reason)
+    if reason == "not_configured":
+        logger.debug("Using mock implementation", extra={"tool": tool})
+    else:
+        logger.warning("Falling back to mock implementation", extra={"tool": tool, "reason": reason, "status": status, "error": str(error) if error else None})
 
 # Helper function to generate mock time slots
-def generate_mock_slots(date: str):
-    # Generate mock time slots for the given date
+def generate_mock_slots(date: str, busy: int = 0):
+    # Generate mock time slots for the given date; `busy` is the day's
+    # busy-time bitmap from the mock store, so booked slots are unavailable
     slots = []
     start_hour = 9  # 9 AM
     end_hour = 17   # 5 PM
     
     for hour in range(start_hour, end_hour):
         for minute in [0, 30]:
-            slot_time = f"{hour:02d}:{minute:02d}"
+            end = hour * 60 + minute + 30
             slots.append({
-                "start": f"{date}T{slot_time}:00Z",
-                "end": f"{date}T{hour:02d}:{minute+30 if minute == 0 else (hour+1):02d}:00Z",
-                "available": True
+                "start": f"{date}T{hour:02d}:{minute:02d}:00Z",
+                "end": f"{date}T{clock(end)}:00Z",
+                "available": busy & span_mask(hour * 60 + minute, end) == 0
             })
     
     return {"slots": slots}
 
-def book_event(email: str, date: str, time: str, reason: str):
-    print(f"Booking event for email: {email}, date: {date}, time: {time}, reason: {reason}")
+async def mock_alternatives(date: str, duration: int = 60):
+    # Free start times on `date` to suggest after a booking conflict
+    starts = free_starts(await mock_store.busy_mask(date), duration)
+    return [clock(start) for start in starts]
+
+@tool_registry.tool(
+    "Find the best free times of a given length across a date range in one call. Prefer this over several get_available_slots calls when the user asks about more than one day (e.g. 'this week')",
+    start_date="First date in YYYY-MM-DD",
+    end_date="Last date in YYYY-MM-DD (inclusive, at most 31 days after start_date)",
+    duration_minutes="Length of the meeting in minutes (default 60)",
+    email="User's email, to avoid their existing bookings",
+    max_results="Number of candidate times to return (default 5)",
+)
+async def find_available_times(start_date: str, end_date: str, duration_minutes: int = 60, email: str = None, max_results: int = 5):
+    logger.info("Finding available times", extra={"start_date": start_date, "end_date": end_date, "duration_minutes": duration_minutes})
+    
+    # Raises ValueError for a bad or too long range, reported back to the model
+    days = date_range(start_date, end_date)
+    free_slots = await get_slot_range(days)
     
+    # Avoid the user's own bookings as well as the host's
+    busy = []
+    if email:
+        busy = booking_intervals((await list_events(email)).get("bookings", []))
+    
+    available = slot_intervals(free_slots, calcom_slot_minutes)
+    windows = find_free_windows(days, available, busy, duration_minutes, max_results=max_results)
+    return {"windows": windows, "duration_minutes": duration_minutes, "days_searched": len(days)}
+
+async def get_slot_range(days: list):
+    # Free slots ({"start", "end"}) for every day in `days`, from one Cal.com
+    # request unless every day is already cached
     try:
-        # Try to use the real Cal.com API if we have a valid API key
-        if calcom_api_key and calcom_api_key != "your_calcom_api_key" and not calcom_api_key.startswith("cal_test_"):
-            # Parse the time to calculate end time (assuming 1 hour duration)
-            try:
-                # Parse the time string (assuming format like "14:30")
-                hour, minute = map(int, time.split(':'))
-                
-                # Calculate end time (1 hour later)
-                end_hour = hour + 1
-                end_minute = minute
-                
-                # Format start and end times
-                start_time = f"{hour:02d}:{minute:02d}"
-                end_time = f"{end_hour:02d}:{end_minute:02d}"
-                
-                print(f"Calculated start time: {start_time}, end time: {end_time}")
-            except Exception as e:
-                print(f"Error parsing time: {str(e)}. Using original time.")
-                start_time = time
-                end_time = time  # You may want to set a default duration
-            
-            # Using the Cal.com V2 API endpoint for booking events
-            api_url = "https://api.cal.com/v2/bookings"
-            print(f"Using API URL: {api_url}")
+        if calcom_enabled():
+            cached = [await slot_cache.get(calcom_event_type_id, day) for day in days]
+            if all(entry is not None for entry in cached):
+                return await without_queued_bookings([slot for entry in cached for slot in entry["slots"] if slot.get("available", True)])
             
-            response = requests.post(
-                api_url,
-                headers={
-                    "Authorization": f"Bearer {calcom_api_key}",
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "eventTypeId": 1,  # Default event type ID, you may need to adjust this
-                    "start": f"{date}T{start_time}:00Z",
-                    "end": f"{date}T{end_time}:00Z",
-                    "name": "Meeting",
-                    "email": email,
-                    "title": reason,
-                    "notes": reason,
-                    "language": "en",
-                    "timeZone": "UTC",
-                    "metadata": {}
+            response = await calcom_client.get(
+                "/slots",
+                params={
+                    "startTime": f"{days[0]}T00:00:00Z",
+                    "endTime": f"{days[-1]}T23:59:59Z",
+                    "eventTypeId": calcom_event_type_id
                 }
             )
             
-            print(f"Response status code: {response.status_code}")
-            print(f"Response content: {response.text}")
+            logger.debug("Cal.com response", extra={"tool": "find_available_times", "status": response.status_code})
             
-            if response.status_code in [200, 201]:
-                # Process the response to match our expected format
+            if response.status_code == 200:
                 api_response = response.json()
-                print(f"API response: {api_response}")
-                
-                # Transform the Cal.com API response to our expected format
-                booking = {
-                    "id": api_response.get("uid", f"cal_{api_response.get('id', 'unknown')}"),
-                    "email": email,
-                    "title": reason,
-                    "start": f"{date}T{start_time}:00Z",
-                    "end": f"{date}T{end_time}:00Z",
-                    "status": "confirmed"
-                }
+                api_response = api_response.get("data", api_response)
+                slots = api_response.get("slots", [])
+                # Slots come either as one list or grouped by day
+                if isinstance(slots, dict):
+                    slots = [slot for day_slots in slots.values() for slot in day_slots]
+                free_slots = [
+                    {"start": slot["time"], "end": add_minutes(slot["time"], calcom_slot_minutes), "available": True}
+                    for slot in slots if slot.get("time")
+                ]
                 
-                return {
-                    "booking": booking,
-                    "message": "Booking successful"
-                }
+                # Fill the per-day cache so follow-up single-day lookups are free
+                by_day = {day: [] for day in days}
+                for slot in free_slots:
+                    if slot["start"][:10] in by_day:
+                        by_day[slot["start"][:10]].append(slot)
+                for day, day_slots in by_day.items():
+                    await slot_cache.set(calcom_event_type_id, day, {"slots": day_slots})
+                return await without_queued_bookings(free_slots)
             else:
-                print(f"Falling back to mock implementation due to API error")
-                # Fall back to mock implementation if API call fails
-                return generate_mock_booking(email, date, time, reason)
+                mock_fallback("find_available_times", "api_error", status=response.status_code)
         else:
-            # Mock implementation
-            print("Using mock implementation for book_event")
-            return generate_mock_booking(email, date, time, reason)
+            mock_fallback("find_available_times", "not_configured")
+    except DeadlineExceeded:
+        raise
     except Exception as e:
-        print(f"Exception in book_event: {str(e)}")
-        print("Falling back to mock implementation due to exception")
-        # Fall back to mock implementation if there's an exception
-        return generate_mock_booking(email, date, time, reason)
+        mock_fallback("find_available_times", "exception", error=e)
+    
+    return [
+        slot
+        for day in days
+        for slot in generate_mock_slots(day, await mock_store.busy_mask(day))["slots"]
+        if slot["available"]
+    ]
 
-# Helper function to generate a mock booking
-def generate_mock_booking(email: str, date: str, time: str, reason: str):
-    global mock_event_id_counter
-    event_id = f"mock_event_{mock_event_id_counter}"
-    mock_event_id_counter += 1
+@tool_registry.tool(
+    "Book a new event",
+    email="User's email", date="Date in YYYY-MM-DD", time="Time in HH:MM", reason="Reason for the event",
+)
+async def book_event(email: str, date: str, time: str, reason: str):
+    logger.info("Booking event", extra={"email": email, "date": date, "time": time})
+    
+    if not calcom_enabled():
+        # Mock implementation
+        mock_fallback("book_event", "not_configured")
+        return await generate_mock_booking(email, date, time, reason)
+    
+    # Parse the time to calculate end time (assuming 1 hour duration)
+    try:
+        # Parse the time string (assuming format like "14:30")
+        hour, minute = map(int, time.split(':'))
+        
+        # Calculate end time (1 hour later)
+        end_hour = hour + 1
+        end_minute = minute
+        
+        # Format start and end times
+        start_time = f"{hour:02d}:{minute:02d}"
+        end_time = f"{end_hour:02d}:{end_minute:02d}"
+        
+        logger.debug("Calculated booking times", extra={"start_time": start_time, "end_time": end_time})
+    except Exception as e:
+        logger.warning("Could not parse time, using it as given", extra={"error": str(e)})
+        start_time = time
+        end_time = time  # You may want to set a default duration
     
+    # Queued for Cal.com; the user gets a pending booking right away
+    try:
+        entry, _ = await calcom_outbox.submit("book", email, {
+            "email": email,
+            "title": reason,
+            "start": f"{date}T{start_time}:00Z",
+            "end": f"{date}T{end_time}:00Z"
+        })
+    except Exception:
+        logger.exception("Could not queue booking")
+        return {"error": "The booking could not be saved, please try again"}
+    # The slot is taken from now on, not only once Cal.com has accepted it
+    await slot_cache.invalidate(calcom_event_type_id, date)
+    return write_acknowledgment(entry)
+
+# Helper function to generate a mock booking
+async def generate_mock_booking(email: str, date: str, time: str, reason: str):
     # Calculate end time (1 hour after start)
     hour, minute = map(int, time.split(':'))
     end_hour = hour + 1
     end_time = f"{end_hour:02d}:{minute:02d}"
     
-    new_event = {
-        "id": event_id,
-        "email": email,
-        "title": reason,
-        "start": f"{date}T{time}:00Z",
-        "end": f"{date}T{end_time}:00Z",
-        "status": "confirmed"
-    }
-    
-    mock_events.append(new_event)
+    try:
+        new_event = await mock_store.create(
+            email=email,
+            title=reason,
+            start=f"{date}T{time}:00Z",
+            end=f"{date}T{end_time}:00Z"
+        )
+    except BookingConflictError:
+        return {
+            "error": "That time overlaps an existing booking",
+            "available_times": await mock_alternatives(date)
+        }
     
     return {
         "booking": new_event,
         "message": "Booking successful"
     }
 
-def list_events(email: str):
-    print(f"Listing events for email: {email}")
+@tool_registry.tool("List user's scheduled events", email="User's email")
+async def list_events(email: str):
+    logger.info("Listing events", extra={"email": email})
     
     try:
         # Try to use the real Cal.com API if we have a valid API key
-        if calcom_api_key and calcom_api_key != "your_calcom_api_key" and not calcom_api_key.startswith("cal_test_"):
-            # Using the Cal.com V2 API endpoint for listing events
-            api_url = "https://api.cal.com/v2/bookings"
-            print(f"Using API URL: {api_url}")
+        if calcom_enabled():
+            # Served from the webhook-fed booking index while it is fresh
+            indexed = await booking_index.bookings_for(email)
+            if indexed is not None:
+                bookings = []
+                dates = {}
+                for record in indexed:
+                    bookings.append({
+                        "id": record["id"],
+                        "email": email,
+                        "title": record["title"],
+                        "start": record["start"],
+                        "end": record["end"],
+                        "status": record["status"]
+                    })
+                    if record["start"]:
+                        dates[record["id"]] = record["start"][:10]
+                await slot_cache.remember_bookings(calcom_event_type_id, dates)
+                return {"bookings": bookings + await queued_bookings(email)}
             
-            response = requests.get(
-                api_url,
-                headers={
-                    "Authorization": f"Bearer {calcom_api_key}",
-                    "Content-Type": "application/json"
-                },
+            # Using the Cal.com V2 API endpoint for listing events
+            response = await calcom_client.get(
+                "/bookings",
                 params={
                     "email": email  # Filter by email if possible
                 }
             )
             
-            print(f"Response status code: {response.status_code}")
-            print(f"Response content: {response.text}")
+            logger.debug("Cal.com response", extra={"tool": "list_events", "status": response.status_code})
             
             if response.status_code == 200:
                 # Process the response to match our expected format
                 api_response = response.json()
-                print(f"API response: {api_response}")
                 
                 # Transform the Cal.com API response to our expected format
                 bookings = []
+                dates = {}
                 if "bookings" in api_response:
                     for booking in api_response["bookings"]:
                         if booking.get("attendees") and any(attendee.get("email") == email for attendee in booking.get("attendees", [])):
@@ -295,264 +585,647 @@ def list_events(email: str):
                                 "end": booking.get("endTime"),
                                 "status": booking.get("status", "confirmed")
                             })
+                            if booking.get("startTime"):
+                                dates[bookings[-1]["id"]] = booking["startTime"][:10]
+                # One write for all of them rather than one per booking
+                await slot_cache.remember_bookings(calcom_event_type_id, dates)
                 
-                return {"bookings": bookings}
+                return {"bookings": bookings + await queued_bookings(email)}
             else:
-                print(f"Falling back to mock implementation due to API error")
+                mock_fallback("list_events", "api_error", status=response.status_code)
                 # Fall back to mock implementation if API call fails
-                return generate_mock_event_list(email)
+                return await generate_mock_event_list(email)
         else:
             # Mock implementation
-            print("Using mock implementation for list_events")
-            return generate_mock_event_list(email)
+            mock_fallback("list_events", "not_configured")
+            return await generate_mock_event_list(email)
+    except DeadlineExceeded:
+        raise
     except Exception as e:
-        print(f"Exception in list_events: {str(e)}")
-        print("Falling back to mock implementation due to exception")
+        mock_fallback("list_events", "exception", error=e)
         # Fall back to mock implementation if there's an exception
-        return generate_mock_event_list(email)
+        return await generate_mock_event_list(email)
 
 # Helper function to generate a mock event list
-def generate_mock_event_list(email: str):
-    # Filter events by email
-    user_events = [event for event in mock_events if event["email"] == email]
+async def generate_mock_event_list(email: str):
+    # Look up events by email through the email index
+    user_events = await mock_store.list_by_email(email)
     
     return {"bookings": user_events}
 
-def cancel_event(event_id: str):
-    print(f"Canceling event with ID: {event_id}")
+@tool_registry.tool("Cancel an event", event_id="Event ID")
+async def cancel_event(event_id: str):
+    logger.info("Canceling event", extra={"event_id": event_id})
+    
+    if not calcom_enabled() or event_id.startswith("mock_"):
+        # Mock implementation
+        mock_fallback("cancel_event", "not_configured")
+        return await generate_mock_cancel(event_id)
+    
+    event_id, error = await resolve_booking(event_id)
+    if error:
+        return error
+    
+    # Extract the actual ID if it's a Cal.com ID
+    cal_id = event_id
+    if event_id.startswith("cal_"):
+        cal_id = event_id[4:]  # Remove the "cal_" prefix
     
     try:
-        # Try to use the real Cal.com API if we have a valid API key
-        if calcom_api_key and calcom_api_key != "your_calcom_api_key" and not calcom_api_key.startswith("cal_test_") and not event_id.startswith("mock_"):
-            # Using the Cal.com V2 API endpoint for canceling events
-            # Extract the actual ID if it's a Cal.com ID
-            cal_id = event_id
-            if event_id.startswith("cal_"):
-                cal_id = event_id[4:]  # Remove the "cal_" prefix
-            
-            api_url = f"https://api.cal.com/v2/bookings/{cal_id}"
-            print(f"Using API URL: {api_url}")
-            
-            response = requests.delete(
-                api_url,
-                headers={
-                    "Authorization": f"Bearer {calcom_api_key}",
-                    "Content-Type": "application/json"
-                }
-            )
-            
-            print(f"Response status code: {response.status_code}")
-            print(f"Response content: {response.text}")
-            
-            if response.status_code in [200, 204]:
-                return {"success": True, "message": "Event canceled successfully"}
-            else:
-                print(f"Falling back to mock implementation due to API error")
-                # Fall back to mock implementation if API call fails
-                return generate_mock_cancel(event_id)
-        else:
-            # Mock implementation
-            print("Using mock implementation for cancel_event")
-            return generate_mock_cancel(event_id)
-    except Exception as e:
-        print(f"Exception in cancel_event: {str(e)}")
-        print("Falling back to mock implementation due to exception")
-        # Fall back to mock implementation if there's an exception
-        return generate_mock_cancel(event_id)
+        entry, _ = await calcom_outbox.submit("cancel", None, {"event_id": event_id, "booking_id": cal_id})
+    except Exception:
+        logger.exception("Could not queue cancellation")
+        return {"error": "The cancellation could not be saved, please try again"}
+    return write_acknowledgment(entry)
 
 # Helper function to generate a mock cancel response
-def generate_mock_cancel(event_id: str):
-    global mock_events
-    # Find the event by ID
-    for i, event in enumerate(mock_events):
-        if event["id"] == event_id:
-            # Remove the event
-            mock_events.pop(i)
-            return {"success": True, "message": "Event canceled successfully"}
+async def generate_mock_cancel(event_id: str):
+    # Remove the event by ID
+    if await mock_store.delete(event_id):
+        return {"success": True, "message": "Event canceled successfully"}
     
     return {"error": "Event not found"}
 
-def reschedule_event(event_id: str, new_date: str, new_time: str):
-    print(f"Rescheduling event with ID: {event_id} to date: {new_date}, time: {new_time}")
+@tool_registry.tool(
+    "Reschedule an event",
+    event_id="Event ID", new_date="New date in YYYY-MM-DD", new_time="New time in HH:MM",
+)
+async def reschedule_event(event_id: str, new_date: str, new_time: str):
+    logger.info("Rescheduling event", extra={"event_id": event_id, "date": new_date, "time": new_time})
+    
+    if not calcom_enabled() or event_id.startswith("mock_"):
+        # Mock implementation
+        mock_fallback("reschedule_event", "not_configured")
+        return await generate_mock_reschedule(event_id, new_date, new_time)
     
+    event_id, error = await resolve_booking(event_id)
+    if error:
+        return error
+    
+    # Parse the time to calculate end time (assuming 1 hour duration)
     try:
-        # Try to use the real Cal.com API if we have a valid API key
-        if calcom_api_key and calcom_api_key != "your_calcom_api_key" and not calcom_api_key.startswith("cal_test_") and not event_id.startswith("mock_"):
-            # Parse the time to calculate end time (assuming 1 hour duration)
-            try:
-                # Parse the time string (assuming format like "14:30")
-                hour, minute = map(int, new_time.split(':'))
-                
-                # Calculate end time (1 hour later)
-                end_hour = hour + 1
-                end_minute = minute
-                
-                # Format start and end times
-                start_time = f"{hour:02d}:{minute:02d}"
-                end_time = f"{end_hour:02d}:{end_minute:02d}"
-                
-                print(f"Calculated start time: {start_time}, end time: {end_time}")
-            except Exception as e:
-                print(f"Error parsing time: {str(e)}. Using original time.")
-                start_time = new_time
-                end_time = new_time  # You may want to set a default duration
-            
-            # Extract the actual ID if it's a Cal.com ID
-            cal_id = event_id
-            if event_id.startswith("cal_"):
-                cal_id = event_id[4:]  # Remove the "cal_" prefix
-            
-            # Using the Cal.com V2 API endpoint for rescheduling events
-            api_url = f"https://api.cal.com/v2/bookings/{cal_id}/reschedule"
-            print(f"Using API URL: {api_url}")
-            
-            response = requests.patch(
-                api_url,
-                headers={
-                    "Authorization": f"Bearer {calcom_api_key}",
-                    "Content-Type": "application/json"
-                },
-                json={
-                    "rescheduleReason": "Rescheduled via chatbot",
-                    "start": f"{new_date}T{start_time}:00Z",
-                    "end": f"{new_date}T{end_time}:00Z"
-                }
-            )
-            
-            print(f"Response status code: {response.status_code}")
-            print(f"Response content: {response.text}")
-            
-            if response.status_code in [200, 201, 204]:
-                return {"success": True, "message": "Event rescheduled successfully"}
-            else:
-                print(f"Falling back to mock implementation due to API error")
-                # Fall back to mock implementation if API call fails
-                return generate_mock_reschedule(event_id, new_date, new_time)
-        else:
-            # Mock implementation
-            print("Using mock implementation for reschedule_event")
-            return generate_mock_reschedule(event_id, new_date, new_time)
+        # Parse the time string (assuming format like "14:30")
+        hour, minute = map(int, new_time.split(':'))
+        
+        # Calculate end time (1 hour later)
+        end_hour = hour + 1
+        end_minute = minute
+        
+        # Format start and end times
+        start_time = f"{hour:02d}:{minute:02d}"
+        end_time = f"{end_hour:02d}:{end_minute:02d}"
+        
+        logger.debug("Calculated booking times", extra={"start_time": start_time, "end_time": end_time})
     except Exception as e:
-        print(f"Exception in reschedule_event: {str(e)}")
-        print("Falling back to mock implementation due to exception")
-        # Fall back to mock implementation if there's an exception
-        return generate_mock_reschedule(event_id, new_date, new_time)
+        logger.warning("Could not parse time, using it as given", extra={"error": str(e)})
+        start_time = new_time
+        end_time = new_time  # You may want to set a default duration
+    
+    # Extract the actual ID if it's a Cal.com ID
+    cal_id = event_id
+    if event_id.startswith("cal_"):
+        cal_id = event_id[4:]  # Remove the "cal_" prefix
+    
+    try:
+        entry, _ = await calcom_outbox.submit("reschedule", None, {
+            "event_id": event_id,
+            "booking_id": cal_id,
+            "start": f"{new_date}T{start_time}:00Z",
+            "end": f"{new_date}T{end_time}:00Z"
+        })
+    except Exception:
+        logger.exception("Could not queue reschedule")
+        return {"error": "The reschedule could not be saved, please try again"}
+    await slot_cache.invalidate(calcom_event_type_id, new_date)
+    return write_acknowledgment(entry)
 
 # Helper function to generate a mock reschedule response
-def generate_mock_reschedule(event_id: str, new_date: str, new_time: str):
+async def generate_mock_reschedule(event_id: str, new_date: str, new_time: str):
     # Calculate new end time (1 hour after start)
     hour, minute = map(int, new_time.split(':'))
     end_hour = hour + 1
     end_time = f"{end_hour:02d}:{minute:02d}"
     
-    # Find the event by ID
-    for event in mock_events:
-        if event["id"] == event_id:
-            # Update the event
-            event["start"] = f"{new_date}T{new_time}:00Z"
-            event["end"] = f"{new_date}T{end_time}:00Z"
-            return {"success": True, "message": "Event rescheduled successfully"}
+    # Update the event by ID
+    try:
+        updated = await mock_store.update_time(event_id, f"{new_date}T{new_time}:00Z", f"{new_date}T{end_time}:00Z")
+    except BookingConflictError:
+        return {
+            "error": "That time overlaps an existing booking",
+            "available_times": await mock_alternatives(new_date)
+        }
+    if updated is not None:
+        return {"success": True, "message": "Event rescheduled successfully"}
     
     return {"error": "Event not found"}
 
-# OpenAI Function Schemas
-functions = [
-    {
-        "name": "get_available_slots",
-        "description": "Get available time slots for a date",
-        "parameters": {
-            "type": "object",
-            "properties": {"date": {"type": "string", "description": "Date in YYYY-MM-DD"}},
-            "required": ["date"]
-        }
-    },
-    {
-        "name": "book_event",
-        "description": "Book a new event",
-        "parameters": {
-            "type": "object",
-            "properties": {
-                "email": {"type": "string", "description": "User's email"},
-                "date": {"type": "string", "description": "Date in YYYY-MM-DD"},
-                "time": {"type": "string", "description": "Time in HH:MM"},
-                "reason": {"type": "string", "description": "Reason for the event"}
+# Queued Cal.com writes
+def queued_booking(entry: dict):
+    # A booking as known before (or without) Cal.com's answer
+    payload = entry["payload"]
+    return {
+        "id": f"pending_{entry['key']}",
+        "email": payload["email"],
+        "title": payload["title"],
+        "start": payload["start"],
+        "end": payload["end"],
+        "status": "failed" if entry["status"] == FAILED else "pending"
+    }
+
+async def queued_bookings(email: str):
+    # Bookings not yet (or never) accepted by Cal.com
+    return [queued_booking(entry) for entry in await calcom_outbox.open_for(email) if entry["op"] == "book"]
+
+async def without_queued_bookings(slots: list):
+    # Drops free slots overlapping a booking (or a reschedule's new time) that
+    # is still waiting in the outbox, so it is not offered to anyone else.
+    # Compared to the minute, as Cal.com's times may carry milliseconds
+    taken = [
+        (entry["payload"]["start"][:16], entry["payload"]["end"][:16])
+        for entry in await calcom_outbox.unsent() if entry["op"] in ("book", "reschedule")
+    ]
+    if not taken:
+        return slots
+    return [
+        slot for slot in slots
+        if not any(slot["start"][:16] < end and start < slot["end"][:16] for start, end in taken)
+    ]
+
+def write_acknowledgment(entry: dict):
+    # Tool result for a queued write: done if Cal.com already accepted it, else pending
+    op, status = entry["op"], entry["status"]
+    noun = {"book": "booking", "cancel": "cancellation", "reschedule": "reschedule"}[op]
+    if status == FAILED:
+        return {"error": f"Cal.com did not accept the {noun}: {entry['error']}"}
+    if op == "book":
+        if status == SENT:
+            return {"booking": entry["result"], "message": "Booking successful"}
+        return {"booking": queued_booking(entry), "message": "Booking received; it is being confirmed with Cal.com"}
+    if status == SENT:
+        done = {"cancel": "Event canceled successfully", "reschedule": "Event rescheduled successfully"}[op]
+        return {"success": True, "message": done}
+    return {"success": True, "status": "pending", "message": f"{noun.capitalize()} received; it is being sent to Cal.com"}
+
+async def resolve_booking(event_id: str):
+    # Maps the id of a queued booking to its Cal.com id; returns (event id, error result)
+    if not event_id.startswith("pending_"):
+        return event_id, None
+    entry = await calcom_outbox.get(event_id[len("pending_"):])
+    if entry is None or entry["op"] != "book":
+        return event_id, {"error": "Event not found"}
+    if entry["status"] == FAILED:
+        return event_id, {"error": f"That booking was never created: {entry['error']}"}
+    if entry["status"] != SENT:
+        return event_id, {"error": "That booking is still being confirmed with Cal.com, please try again in a moment"}
+    return entry["result"]["id"], None
+
+async def send_calcom_write(entry: dict):
+    # Sends one queued write to Cal.com; called by the outbox worker. The
+    # idempotency key goes along so a resent request is not applied twice
+    op, payload = entry["op"], entry["payload"]
+    headers = {"Idempotency-Key": request_key(entry)}
+    if op == "book":
+        response = await calcom_client.post(
+            "/bookings",
+            json={
+                "eventTypeId": calcom_event_type_id,
+                "start": payload["start"],
+                "end": payload["end"],
+                "name": "Meeting",
+                "email": payload["email"],
+                "title": payload["title"],
+                "notes": payload["title"],
+                "language": "en",
+                "timeZone": "UTC",
+                "metadata": {}
             },
-            "required": ["email", "date", "time", "reason"]
-        }
-    },
-    {
-        "name": "list_events",
-        "description": "List user's scheduled events",
-        "parameters": {
-            "type": "object",
-            "properties": {"email": {"type": "string", "description": "User's email"}},
-            "required": ["email"]
-        }
-    },
-    {
-        "name": "cancel_event",
-        "description": "Cancel an event",
-        "parameters": {
-            "type": "object",
-            "properties": {"event_id": {"type": "string", "description": "Event ID"}},
-            "required": ["event_id"]
-        }
-    },
-    {
-        "name": "reschedule_event",
-        "description": "Reschedule an event",
-        "parameters": {
-            "type": "object",
-            "properties": {
-                "event_id": {"type": "string", "description": "Event ID"},
-                "new_date": {"type": "string", "description": "New date in YYYY-MM-DD"},
-                "new_time": {"type": "string", "description": "New time in HH:MM"}
+            headers=headers
+        )
+    elif op == "cancel":
+        response = await calcom_client.delete(f"/bookings/{payload['booking_id']}", headers=headers)
+    elif op == "reschedule":
+        response = await calcom_client.patch(
+            f"/bookings/{payload['booking_id']}/reschedule",
+            json={
+                "rescheduleReason": "Rescheduled via chatbot",
+                "start": payload["start"],
+                "end": payload["end"]
             },
-            "required": ["event_id", "new_date", "new_time"]
+            headers=headers
+        )
+    else:
+        raise WriteRejected(f"Unknown write: {op}")
+    
+    logger.debug("Cal.com response", extra={"op": op, "status": response.status_code})
+    if response.status_code in RETRY_STATUS_CODES or response.status_code == 408:
+        # Raises; the outbox retries transient errors
+        response.raise_for_status()
+    if response.status_code >= 400:
+        raise WriteRejected(f"Cal.com returned {response.status_code}")
+    
+    if op == "book":
+        api_response = response.json()
+        # Transform the Cal.com API response to our expected format
+        booking = {
+            "id": api_response.get("uid", f"cal_{api_response.get('id', 'unknown')}"),
+            "email": payload["email"],
+            "title": payload["title"],
+            "start": payload["start"],
+            "end": payload["end"],
+            "status": "confirmed"
         }
+        await slot_cache.invalidate(calcom_event_type_id, payload["start"][:10])
+        await slot_cache.remember_booking(booking["id"], calcom_event_type_id, payload["start"][:10])
+        await booking_index.record(booking["id"], payload["email"], payload["title"], payload["start"], payload["end"])
+        return booking
+    if op == "cancel":
+        await slot_cache.invalidate_booking(payload["event_id"], calcom_event_type_id)
+        await booking_index.update(payload["event_id"], status="cancelled")
+    else:
+        await slot_cache.invalidate_booking(payload["event_id"], calcom_event_type_id, payload["start"][:10])
+        await booking_index.update(payload["event_id"], start=payload["start"], end=payload["end"])
+    return {"id": payload["event_id"]}
+
+async def fetch_calcom_bookings():
+    # Every booking on the account, a page at a time, for reconciling the booking index
+    bookings = {}
+    page_size = 100
+    while True:
+        response = await calcom_client.get("/bookings", params={"take": page_size, "skip": len(bookings)})
+        response.raise_for_status()
+        api_response = response.json()
+        data = api_response.get("data", api_response)
+        page = data.get("bookings", []) if isinstance(data, dict) else data
+        before = len(bookings)
+        for booking in page:
+            bookings[booking.get("uid") or booking.get("id")] = booking
+        # Stop on a short page, or one with nothing new (an API ignoring skip)
+        if len(page) < page_size or len(bookings) == before:
+            return list(bookings.values())
+
+async def invalidate_slot_days(days: list):
+    # A booking changed on these days, possibly outside the app
+    for day in days:
+        await slot_cache.invalidate(calcom_event_type_id, day)
+
+# Bookings by attendee email, kept fresh by Cal.com webhooks (when
+# CALCOM_WEBHOOK_SECRET is set) so list_events does not have to fetch every
+# booking on the account; reconciled in the background from the lifespan hook
+booking_index = BookingIndex.from_env(state_backend.bookings, fetch_calcom_bookings, invalidate_slot_days)
+
+# OpenAI Function Schemas, derived from the registered tools
+functions = tool_registry.schemas()
+
+# Tools API wrapper around the function schemas; lets the model request
+# several independent calls in a single turn
+tools = [{"type": "function", "function": function} for function in functions]
+
+def build_messages(email: str, history: list, summary: list = None):
+    messages = [{"role": "system", "content": f"You are a chatbot assisting {email} with Cal.com events"}]
+    if summary:
+        messages.append({"role": "system", "content": "Summary of earlier conversation:\n" + "\n".join(summary)})
+    return messages + history
+
+async def start_conversation(request: ChatRequest):
+    # Returns the session (None for requests carrying their full history),
+    # the messages to send to the model and where the stored history starts in them
+    if request.message is None:
+        messages = build_messages(request.email, request.messages)
+        return None, messages, 1
+    
+    session = None
+    if request.conversation_id:
+        with span("load session", "state"):
+            session = await session_store.get(request.conversation_id)
+        if session is not None and session.email != request.email:
+            session = None
+    if session is None:
+        session = session_store.new_session(request.email)
+    
+    history = session.messages + [{"role": "user", "content": request.message}]
+    messages = build_messages(request.email, history, session.summary)
+    return session, messages, len(messages) - len(history)
+
+async def finish_conversation(session, messages: list, history_start: int, reply: str):
+    if session is None:
+        return {"response": reply}
+    session.messages = messages[history_start:] + [{"role": "assistant", "content": reply}]
+    compact_history(session, session_token_budget, session_keep_recent_turns)
+    with span("save session", "state"):
+        await session_store.save(session)
+    return {"response": reply, "conversation_id": session.conversation_id}
+
+def tool_calls_message(tool_calls: list):
+    # The assistant's tool calls have to precede their results in the history
+    return {
+        "role": "assistant",
+        "content": None,
+        "tool_calls": [
+            {"id": call["id"], "type": "function", "function": {"name": call["name"], "arguments": call["arguments"]}}
+            for call in tool_calls
+        ]
     }
-]
+
+async def execute_tool_call(call: dict):
+    # A bad call is reported back to the model instead of failing the whole turn
+    # (tool names come from the model, so unknown ones share one metric label)
+    tool = tool_registry.get(call["name"])
+    with TOOL_SECONDS.time(tool.name if tool else "unknown"), span(call["name"], "tool"):
+        try:
+            if tool is None:
+                result = {"error": f"Unknown function: {call['name']}"}
+            else:
+                # Parses and validates the JSON arguments against the function's signature
+                result = await tool.call(call["arguments"])
+        except (ValueError, KeyError, TypeError) as e:
+            # Includes ToolArgumentError for arguments that do not match the signature
+            result = {"error": f"Invalid arguments for {call['name']}: {str(e)}"}
+    with span("encode tool result", "serialize", tool=call["name"]):
+        content = encode_tool_result(result, tool_result_max_items) if compact_tool_results else dumps(result)
+    return {"role": "tool", "tool_call_id": call["id"], "name": call["name"], "content": content}
+
+async def execute_tool_calls(tool_calls: list):
+    # Tool calls from one model turn are independent, so run them concurrently
+    return await asyncio.gather(*(execute_tool_call(call) for call in tool_calls))
+
+def admit(request: ChatRequest):
+    # Raises AdmissionRejected before any work is done for this request
+    email_rate_limiter.acquire(request.email.strip().lower())
+    openai_limiter.check()
+
+def rejection_body(error: AdmissionRejected):
+    retry_after = error.retry_after_header()
+    return {"response": f"Too many requests ({error.reason}), please try again in {retry_after} seconds.", "retry_after": int(retry_after)}
+
+def rejection_response(error: AdmissionRejected):
+    return JSONResponse(rejection_body(error), status_code=429, headers={"Retry-After": error.retry_after_header()})
+
+def create_completion(messages: list, stream: bool = False):
+    options = {}
+    # Never let the OpenAI client wait past the request deadline
+    left = remaining()
+    if left is not None:
+        options["timeout"] = left
+    return get_openai_client().chat.completions.create(
+        model=openai_model,
+        messages=messages,
+        tools=tools,
+        tool_choice="auto",
+        parallel_tool_calls=parallel_tool_calls,
+        stream=stream,
+        **options
+    )
+
+@contextmanager
+def openai_round_trip(messages: list, stream: bool):
+    # Times one OpenAI call (including reading a stream) and counts its status
+    started = time.perf_counter()
+    status = "200"
+    try:
+        with span("openai", "model", stream=stream, messages=len(messages)):
+            yield
+    except (asyncio.CancelledError, GeneratorExit, DeadlineExceeded):
+        status = "cancelled"
+        raise
+    except Exception as e:
+        # openai's APIStatusError carries the HTTP status
+        status_code = getattr(e, "status_code", None)
+        status = str(status_code) if isinstance(status_code, int) else "error"
+        raise
+    finally:
+        OPENAI_REQUEST_SECONDS.observe(time.perf_counter() - started, "true" if stream else "false")
+        UPSTREAM_RESPONSES.inc("openai", status)
+
+def partial_reply(messages: list, history_start: int, reason: str):
+    # Answer for a request that ran out of budget: say what was done so far
+    # Each tool once, in the order it first ran
+    done = list(dict.fromkeys(m["name"] for m in messages[history_start:] if m.get("role") == "tool"))
+    reply = f"Sorry, I had to stop before finishing your request ({reason})."
+    if done:
+        reply += f" I had already completed: {', '.join(done)}."
+    return reply + " Please try again, or ask for one thing at a time."
 
 @app.post("/chat")
 async def chat(request: ChatRequest):
-    messages = [{"role": "system", "content": f"You are a chatbot assisting {request.email} with Cal.com events"}] + request.messages
+    started = time.perf_counter()
+    outcome = "ok"
+    try:
+        try:
+            admit(request)
+        except AdmissionRejected as e:
+            outcome = "rejected"
+            return rejection_response(e)
+        
+        session, messages, history_start = await start_conversation(request)
+        
+        try:
+            with request_deadline(chat_deadline), chat_turn():
+                return await run_chat(session, messages, history_start)
+        except DeadlineExceeded:
+            outcome = "deadline"
+            return await finish_conversation(session, messages, history_start, partial_reply(messages, history_start, "time limit reached"))
+        except AdmissionRejected as e:
+            outcome = "rejected"
+            return rejection_response(e)
+        except Exception as e:
+            outcome = "error"
+            logger.exception("Chat request failed")
+            return {"response": f"An error occurred: {str(e)}"}
+    finally:
+        CHAT_REQUEST_SECONDS.observe(time.perf_counter() - started, "chat", outcome)
+
+async def run_chat(session, messages: list, history_start: int):
+    # One OpenAI slot for every round, so a request whose tools have already
+    # run is never turned away between rounds
+    async with openai_limiter.slot():
+        for round_number in range(1, chat_max_rounds + 1):
+            CHAT_ROUNDS.inc("chat")
+            with span(f"round {round_number}", "loop"):
+                with openai_round_trip(messages, stream=False):
+                    response = await within_deadline(create_completion(messages))
+                message = response.choices[0].message
+                
+                # If no tool calls, return the message content
+                if not message.tool_calls:
+                    return await finish_conversation(session, messages, history_start, message.content)
+                
+                tool_calls = [
+                    {"id": call.id, "name": call.function.name, "arguments": call.function.arguments}
+                    for call in message.tool_calls
+                ]
+                
+                # Add the tool calls and all of their results to messages; when the
+                # deadline passes the pending calls are cancelled and nothing is added
+                results = await within_deadline(execute_tool_calls(tool_calls))
+                messages.append(tool_calls_message(tool_calls))
+                messages.extend(results)
+    
+    return await finish_conversation(session, messages, history_start, partial_reply(messages, history_start, "too many steps"))
+
+def sse_event(event: str, data: dict):
+    return f"event: {event}\ndata: {dumps(data)}\n\n"
+
+async def chat_event_stream(request: ChatRequest, http_request: Request):
+    started = time.perf_counter()
+    outcome = "ok"
+    session, messages, history_start = await start_conversation(request)
     
     try:
-        while True:
-            response = openai.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=messages,
-                functions=functions,
-                function_call="auto"
-            )
-            
-            message = response.choices[0].message
-            
-            # If no function call, return the message content
-            if not hasattr(message, 'function_call') or message.function_call is None:
-                return {"response": message.content}
-            
-            # Process function call
-            func_name = message.function_call.name
-            args = json.loads(message.function_call.arguments)
-            
-            # Execute the appropriate function
-            if func_name == "get_available_slots":
-                result = get_available_slots(args["date"])
-            elif func_name == "book_event":
-                result = book_event(args["email"], args["date"], args["time"], args["reason"])
-            elif func_name == "list_events":
-                result = list_events(args["email"])
-            elif func_name == "cancel_event":
-                result = cancel_event(args["event_id"])
-            elif func_name == "reschedule_event":
-                result = reschedule_event(args["event_id"], args["new_date"], args["new_time"])
+        with request_deadline(chat_deadline), chat_turn():
+            # One OpenAI slot for every round (see run_chat); it is held until
+            # the last stream has been fully read
+            async with openai_limiter.slot():
+                for round_number in range(1, chat_max_rounds + 1):
+                    CHAT_ROUNDS.inc("stream")
+                    with span(f"round {round_number}", "loop"):
+                        with openai_round_trip(messages, stream=True):
+                            stream = await within_deadline(create_completion(messages, stream=True))
+                        
+                            content = []
+                            # Tool calls arrive as fragments keyed by their index in the turn
+                            tool_calls = {}
+                            chunks = stream.__aiter__()
+                            try:
+                                while True:
+                                    try:
+                                        chunk = await within_deadline(chunks.__anext__())
+                                    except StopAsyncIteration:
+                                        break
+                                    if not chunk.choices:
+                                        continue
+                                    delta = chunk.choices[0].delta
+                                    if delta.content:
+                                        content.append(delta.content)
+                                        yield sse_event("token", {"content": delta.content})
+                                    for fragment in delta.tool_calls or []:
+                                        call = tool_calls.setdefault(fragment.index, {"id": None, "name": None, "arguments": ""})
+                                        if fragment.id:
+                                            call["id"] = fragment.id
+                                        if fragment.function and fragment.function.name:
+                                            call["name"] = fragment.function.name
+                                        if fragment.function and fragment.function.arguments:
+                                            call["arguments"] += fragment.function.arguments
+                            finally:
+                                # Releases the upstream connection, including when the client went away mid-stream
+                                await stream.close()
+                
+                        # If no tool calls, the streamed content is the final answer
+                        if not tool_calls:
+                            yield sse_event("done", await finish_conversation(session, messages, history_start, "".join(content)))
+                            return
+                    
+                        if await http_request.is_disconnected():
+                            logger.info("Client disconnected, stopping chat stream")
+                            outcome = "disconnected"
+                            return
+                    
+                        tool_calls = [tool_calls[index] for index in sorted(tool_calls)]
+                        for call in tool_calls:
+                            yield sse_event("tool", {"name": call["name"], "status": "calling"})
+                    
+                        # Run the calls concurrently and report each one as soon as it finishes
+                        tasks = [asyncio.ensure_future(execute_tool_call(call)) for call in tool_calls]
+                        try:
+                            for next_done in asyncio.as_completed(tasks):
+                                result = await within_deadline(next_done)
+                                yield sse_event("tool", {"name": result["name"], "status": "done"})
+                        finally:
+                            for task in tasks:
+                                task.cancel()
+                    
+                        # Add the tool calls and all of their results to messages
+                        messages.append(tool_calls_message(tool_calls))
+                        messages.extend(task.result() for task in tasks)
             
-            # Add the function result to messages
-            messages.append({"role": "function", "name": func_name, "content": json.dumps(result)})
+                reply = partial_reply(messages, history_start, "too many steps")
+        yield sse_event("done", await finish_conversation(session, messages, history_start, reply))
     
+    except DeadlineExceeded:
+        outcome = "deadline"
+        reply = partial_reply(messages, history_start, "time limit reached")
+        yield sse_event("done", await finish_conversation(session, messages, history_start, reply))
+    except AdmissionRejected as e:
+        # No OpenAI slot came free in time. It is taken before the first round,
+        # so no tool has run and the client can simply send the message again
+        outcome = "rejected"
+        yield sse_event("rejected", rejection_body(e))
+    except (asyncio.CancelledError, GeneratorExit):
+        # Starlette cancels the response task when the client disconnects;
+        # the in-flight OpenAI or Cal.com requests are cancelled along with it
+        logger.info("Chat stream cancelled")
+        outcome = "disconnected"
+        raise
     except Exception as e:
-        return {"response": f"An error occurred: {str(e)}"}
+        outcome = "error"
+        logger.exception("Chat stream failed")
+        yield sse_event("error", {"response": f"An error occurred: {str(e)}"})
+        return
+    finally:
+        CHAT_REQUEST_SECONDS.observe(time.perf_counter() - started, "stream", outcome)
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest, http_request: Request):
+    try:
+        admit(request)
+    except AdmissionRejected as e:
+        CHAT_REQUEST_SECONDS.observe(0.0, "stream", "rejected")
+        return rejection_response(e)
+    return StreamingResponse(
+        chat_event_stream(request, http_request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/health/calcom")
+async def calcom_health():
+    single_flight = calcom_client.single_flight if calcom_client else None
+    return {
+        "calcom_enabled": calcom_enabled(),
+        "circuit_breaker": calcom_breaker.snapshot(),
+        "coalesced_reads": single_flight.stats() if single_flight else None,
+        "slot_cache": slot_cache.stats(),
+    }
+
+@app.get("/health/admission")
+async def admission_health():
+    return {"openai": openai_limiter.stats(), "email_rate_limit": email_rate_limiter.stats()}
+
+@app.get("/health/ready")
+async def readiness():
+    # 503 until the startup warmup has finished, for load balancer readiness checks
+    return JSONResponse(warmup.stats(), status_code=200 if warmup.finished else 503)
+
+@app.post("/webhooks/calcom")
+async def calcom_webhook(request: Request):
+    # Booking webhooks from Cal.com, signed with CALCOM_WEBHOOK_SECRET
+    if not booking_index.enabled:
+        return JSONResponse({"error": "Cal.com webhooks are not configured"}, status_code=404)
+    body = await request.body()
+    if not booking_index.verify(body, request.headers.get("X-Cal-Signature-256")):
+        CALCOM_WEBHOOKS.inc("unknown", "rejected")
+        return JSONResponse({"error": "Invalid signature"}, status_code=401)
+    try:
+        event = loads(body)
+    except ValueError:
+        CALCOM_WEBHOOKS.inc("unknown", "rejected")
+        return JSONResponse({"error": "Invalid JSON"}, status_code=400)
+    if not isinstance(event, dict):
+        CALCOM_WEBHOOKS.inc("unknown", "rejected")
+        return JSONResponse({"error": "Expected a JSON object"}, status_code=400)
+    return await booking_index.apply_webhook(event)
+
+@app.get("/health/bookings")
+async def bookings_health():
+    return await booking_index.stats()
+
+@app.get("/health/outbox")
+async def outbox_health():
+    return await calcom_outbox.stats()
+
+@app.get("/metrics")
+async def metrics():
+    # Prometheus text format; values are per worker process
+    return Response(registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 @app.get("/")
 async def root():
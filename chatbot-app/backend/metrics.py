@@ -0,0 +1,149 @@
+# Process-local metrics in the Prometheus text exposition format.
+#
+# A deliberately small subset of what prometheus_client offers: labelled
+# counters, histograms and callback gauges, rendered by GET /metrics. Each
+# uvicorn worker keeps its own values, so with --workers N scrape every
+# worker (or run one worker per container) and aggregate in Prometheus.
+
+import bisect
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def format_labels(names: tuple, values: tuple, extra: str = ""):
+    pairs = [f'{name}="{escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_value(value: float):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        # An unlabelled counter is reported (as 0) before its first increment
+        self.values = {} if self.label_names else {(): 0}
+
+    def inc(self, *labels, amount: float = 1):
+        key = tuple(str(label) for label in labels)
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def samples(self):
+        for key, value in sorted(self.values.items()):
+            yield f"{self.name}{format_labels(self.label_names, key)} {format_value(value)}"
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self.series = {}
+
+    def observe(self, value: float, *labels):
+        key = tuple(str(label) for label in labels)
+        series = self.series.get(key)
+        if series is None:
+            series = self.series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect.bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    @contextmanager
+    def time(self, *labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def samples(self):
+        for key, (counts, total, count) in sorted(self.series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = f'le="{format_value(bound)}"'
+                yield f"{self.name}_bucket{format_labels(self.label_names, key, le)} {cumulative}"
+            yield f"{self.name}_sum{format_labels(self.label_names, key)} {format_value(total)}"
+            yield f"{self.name}_count{format_labels(self.label_names, key)} {count}"
+
+
+class CallbackGauge:
+    """Gauge whose value is read from a function at scrape time."""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, read):
+        self.name = name
+        self.help = help
+        self.read = read
+
+    def samples(self):
+        yield f"{self.name} {format_value(self.read())}"
+
+
+registry = Registry()
+
+CHAT_REQUEST_SECONDS = registry.register(Histogram(
+    "livex_chat_request_seconds", "Whole chat request latency", ("endpoint", "outcome")))
+CHAT_ROUNDS = registry.register(Counter(
+    "livex_chat_loop_iterations_total", "Model round-trips made by the tool-calling loop", ("endpoint",)))
+OPENAI_REQUEST_SECONDS = registry.register(Histogram(
+    "livex_openai_request_seconds", "OpenAI chat completion round-trip latency", ("stream",)))
+TOOL_SECONDS = registry.register(Histogram(
+    "livex_tool_seconds", "Tool (function call) latency", ("tool",)))
+MOCK_FALLBACKS = registry.register(Counter(
+    "livex_mock_fallbacks_total", "Tool calls answered from the mock backend instead of Cal.com", ("tool", "reason")))
+UPSTREAM_RESPONSES = registry.register(Counter(
+    "livex_upstream_responses_total", "Upstream responses by status code (error for transport failures)", ("upstream", "status")))
+LOOP_STALL_SECONDS = registry.register(Histogram(
+    "livex_event_loop_stall_seconds", "Event loop stalls longer than the stall threshold", (),
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)))
+OUTBOX_WRITES = registry.register(Counter(
+    "livex_outbox_writes_total", "Queued Cal.com writes by outcome (submitted, deduplicated, sent, retried, failed)",
+    ("op", "outcome")))
+OUTBOX_LAG_SECONDS = registry.register(Histogram(
+    "livex_outbox_lag_seconds", "Time from queueing a Cal.com write to Cal.com accepting it", ("op",)))
+CALCOM_WEBHOOKS = registry.register(Counter(
+    "livex_calcom_webhooks_total", "Cal.com webhook events by trigger and outcome (applied, ignored, rejected)",
+    ("event", "outcome")))
+CALCOM_COALESCED_READS = registry.register(Counter(
+    "livex_calcom_coalesced_reads_total", "Cal.com reads answered by joining an identical read already in flight"))
+OPENAI_SLOT_WAIT_SECONDS = registry.register(Histogram(
+    "livex_openai_slot_wait_seconds", "Time chat requests waited for an OpenAI slot (admitted requests only)"))
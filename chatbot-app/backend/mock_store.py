@@ -0,0 +1,443 @@
+import bisect
+
+from day_bitmap import BookingConflictError, booking_mask, from_bytes, is_free, to_bytes
+from sqlite_db import connect, on_db_thread
+from timestamps import minute_of_day
+
+
+def event_day(start: str):
+    # Events are stored with ISO timestamps, so the day is the date prefix
+    return start[:10]
+
+
+class MemoryEventStore:
+    """In-process booking store for the mock Cal.com backend.
+
+    Bookings are indexed by id (primary key), by attendee email and by day,
+    with each day's bookings kept sorted by start time, so lookups do not
+    scan every booking. A busy-time bitmap per day rejects overlapping
+    bookings with BookingConflictError.
+    """
+
+    def __init__(self):
+        self.events = {}
+        self.next_id = 1
+        # email -> {event id: None}; a dict keeps insertion order and O(1) removal
+        self.by_email = {}
+        # day -> sorted list of (start, event id)
+        self.by_day = {}
+        # day -> busy-time bitmap (see day_bitmap)
+        self.busy = {}
+
+    def _reserve(self, start: str, end: str):
+        day, mask = event_day(start), booking_mask(start, end)
+        busy = self.busy.get(day, 0)
+        if not is_free(busy, mask):
+            raise BookingConflictError(f"{start} overlaps an existing booking")
+        self.busy[day] = busy | mask
+
+    def _release(self, start: str, end: str):
+        day = event_day(start)
+        busy = self.busy.get(day, 0) & ~booking_mask(start, end)
+        if busy:
+            self.busy[day] = busy
+        else:
+            self.busy.pop(day, None)
+
+    def _index(self, event: dict):
+        self.by_email.setdefault(event["email"], {})[event["id"]] = None
+        bisect.insort(self.by_day.setdefault(event_day(event["start"]), []), (event["start"], event["id"]))
+
+    def _unindex(self, event: dict):
+        email_ids = self.by_email.get(event["email"])
+        if email_ids is not None:
+            email_ids.pop(event["id"], None)
+            if not email_ids:
+                del self.by_email[event["email"]]
+        day = event_day(event["start"])
+        day_events = self.by_day.get(day)
+        if day_events is not None:
+            i = bisect.bisect_left(day_events, (event["start"], event["id"]))
+            if i < len(day_events) and day_events[i] == (event["start"], event["id"]):
+                day_events.pop(i)
+            if not day_events:
+                del self.by_day[day]
+
+    async def create(self, email: str, title: str, start: str, end: str):
+        self._reserve(start, end)
+        event = {
+            "id": f"mock_event_{self.next_id}",
+            "email": email,
+            "title": title,
+            "start": start,
+            "end": end,
+            "status": "confirmed"
+        }
+        self.next_id += 1
+        self.events[event["id"]] = event
+        self._index(event)
+        return dict(event)
+
+    async def get(self, event_id: str):
+        event = self.events.get(event_id)
+        return dict(event) if event is not None else None
+
+    async def list_by_email(self, email: str):
+        return [dict(self.events[event_id]) for event_id in self.by_email.get(email, {})]
+
+    async def list_by_day(self, day: str):
+        return [dict(self.events[event_id]) for _, event_id in self.by_day.get(day, [])]
+
+    async def busy_mask(self, day: str):
+        return self.busy.get(day, 0)
+
+    async def delete(self, event_id: str):
+        event = self.events.pop(event_id, None)
+        if event is None:
+            return False
+        self._unindex(event)
+        self._release(event["start"], event["end"])
+        return True
+
+    async def update_time(self, event_id: str, start: str, end: str):
+        event = self.events.get(event_id)
+        if event is None:
+            return None
+        # Release the old time first so a booking can move within its own span
+        self._release(event["start"], event["end"])
+        try:
+            self._reserve(start, end)
+        except BookingConflictError:
+            self._reserve(event["start"], event["end"])
+            raise
+        self._unindex(event)
+        event["start"] = start
+        event["end"] = end
+        self._index(event)
+        return dict(event)
+
+    def close(self):
+        pass
+
+
+class SQLiteEventStore:
+    """Persistent booking store backed by SQLite in WAL mode.
+
+    Same interface as MemoryEventStore. The primary key, an email index and
+    a (day, start) index keep lookups fast at tens of thousands of bookings,
+    and state survives restarts. Queries run on the connection's own thread
+    (see sqlite_db), so waiting for another worker's write lock does not
+    block the event loop.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.db = connect(path)
+        self.db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS mock_events (
+                id TEXT PRIMARY KEY,
+                email TEXT NOT NULL,
+                title TEXT,
+                start TEXT NOT NULL,
+                "end" TEXT NOT NULL,
+                status TEXT NOT NULL,
+                day TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS mock_events_email ON mock_events (email);
+            CREATE INDEX IF NOT EXISTS mock_events_day_start ON mock_events (day, start);
+            CREATE TABLE IF NOT EXISTS mock_counters (
+                name TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS mock_availability (
+                day TEXT PRIMARY KEY,
+                busy BLOB NOT NULL
+            );
+            """
+        )
+        self._backfill_availability()
+
+    def _backfill_availability(self):
+        # Databases created before the availability table get it built once
+        with self.db:
+            self.db.execute("BEGIN IMMEDIATE")
+            if self.db.execute("SELECT 1 FROM mock_availability LIMIT 1").fetchone() is not None:
+                return
+            busy = {}
+            for row in self.db.execute('SELECT day, start, "end" FROM mock_events'):
+                busy[row["day"]] = busy.get(row["day"], 0) | booking_mask(row["start"], row["end"])
+            self.db.executemany(
+                "INSERT INTO mock_availability (day, busy) VALUES (?, ?)",
+                [(day, to_bytes(mask)) for day, mask in busy.items() if mask]
+            )
+
+    def _busy(self, day: str):
+        row = self.db.execute("SELECT busy FROM mock_availability WHERE day = ?", (day,)).fetchone()
+        return from_bytes(row[0]) if row else 0
+
+    def _set_busy(self, day: str, busy: int):
+        if busy:
+            self.db.execute(
+                "INSERT INTO mock_availability (day, busy) VALUES (?, ?) "
+                "ON CONFLICT(day) DO UPDATE SET busy = excluded.busy",
+                (day, to_bytes(busy))
+            )
+        else:
+            self.db.execute("DELETE FROM mock_availability WHERE day = ?", (day,))
+
+    def _reserve(self, start: str, end: str):
+        # Must run inside a write transaction
+        day, mask = event_day(start), booking_mask(start, end)
+        busy = self._busy(day)
+        if not is_free(busy, mask):
+            raise BookingConflictError(f"{start} overlaps an existing booking")
+        self._set_busy(day, busy | mask)
+
+    def _release(self, start: str, end: str):
+        day = event_day(start)
+        self._set_busy(day, self._busy(day) & ~booking_mask(start, end))
+
+    @staticmethod
+    def _row(row):
+        if row is None:
+            return None
+        return {
+            "id": row["id"],
+            "email": row["email"],
+            "title": row["title"],
+            "start": row["start"],
+            "end": row["end"],
+            "status": row["status"]
+        }
+
+    @on_db_thread
+    def create(self, email: str, title: str, start: str, end: str):
+        # The conflict check, the id counter and the insert share one write transaction
+        with self.db:
+            self.db.execute("BEGIN IMMEDIATE")
+            self._reserve(start, end)
+            self.db.execute(
+                "INSERT INTO mock_counters (name, value) VALUES ('event_id', 1) "
+                "ON CONFLICT(name) DO UPDATE SET value = value + 1"
+            )
+            next_id = self.db.execute("SELECT value FROM mock_counters WHERE name = 'event_id'").fetchone()[0]
+            event = {
+                "id": f"mock_event_{next_id}",
+                "email": email,
+                "title": title,
+                "start": start,
+                "end": end,
+                "status": "confirmed"
+            }
+            self.db.execute(
+                'INSERT INTO mock_events (id, email, title, start, "end", status, day) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (event["id"], email, title, start, end, event["status"], event_day(start))
+            )
+        return event
+
+    def _event(self, event_id: str):
+        return self._row(self.db.execute("SELECT * FROM mock_events WHERE id = ?", (event_id,)).fetchone())
+
+    @on_db_thread
+    def get(self, event_id: str):
+        return self._event(event_id)
+
+    @on_db_thread
+    def list_by_email(self, email: str):
+        rows = self.db.execute("SELECT * FROM mock_events WHERE email = ? ORDER BY rowid", (email,))
+        return [self._row(row) for row in rows]
+
+    @on_db_thread
+    def list_by_day(self, day: str):
+        rows = self.db.execute("SELECT * FROM mock_events WHERE day = ? ORDER BY start, id", (day,))
+        return [self._row(row) for row in rows]
+
+    @on_db_thread
+    def busy_mask(self, day: str):
+        return self._busy(day)
+
+    @on_db_thread
+    def delete(self, event_id: str):
+        with self.db:
+            self.db.execute("BEGIN IMMEDIATE")
+            event = self._event(event_id)
+            if event is None:
+                return False
+            self.db.execute("DELETE FROM mock_events WHERE id = ?", (event_id,))
+            self._release(event["start"], event["end"])
+        return True
+
+    @on_db_thread
+    def update_time(self, event_id: str, start: str, end: str):
+        with self.db:
+            self.db.execute("BEGIN IMMEDIATE")
+            event = self._event(event_id)
+            if event is None:
+                return None
+            # Release the old time first so a booking can move within its own span
+            self._release(event["start"], event["end"])
+            self._reserve(start, end)
+            self.db.execute(
+                'UPDATE mock_events SET start = ?, "end" = ?, day = ? WHERE id = ?',
+                (start, end, event_day(start), event_id)
+            )
+        return self._event(event_id)
+
+    def close(self):
+        self.db.close()
+
+
+def start_minutes(start: str):
+    # Minutes since midnight, used to order a day's bookings
+    try:
+        return minute_of_day(start)
+    except ValueError:
+        return 0
+
+
+def hash_to_event(fields: list):
+    # HGETALL replies are flat [field, value, field, value, ...] lists
+    if not fields:
+        return None
+    return dict(zip(fields[::2], fields[1::2]))
+
+
+class EventMoved(Exception):
+    """A booking changed between reading it and locking it; the caller retries."""
+
+
+class RedisEventStore:
+    """Booking store shared through a Redis-protocol server.
+
+    Same interface as MemoryEventStore. Each booking is a hash, with sorted
+    sets as the email index (ordered by creation) and the per-day index
+    (ordered by start time). Ids come from an atomic INCR, so every worker
+    and node allocates unique ids. Each day's busy-time bitmap is a string
+    key updated in WATCH/MULTI/EXEC transactions together with the booking,
+    so concurrent workers cannot book overlapping times.
+    """
+
+    def __init__(self, redis, prefix: str = "mock:"):
+        self.redis = redis
+        self.prefix = prefix
+
+    def _event_key(self, event_id: str):
+        return f"{self.prefix}event:{event_id}"
+
+    def _email_key(self, email: str):
+        return f"{self.prefix}email:{email}"
+
+    def _day_key(self, day: str):
+        return f"{self.prefix}day:{day}"
+
+    def _busy_key(self, day: str):
+        return f"{self.prefix}busy:{day}"
+
+    def _set_busy(self, day: str, busy: int):
+        if busy:
+            return ("SET", self._busy_key(day), busy)
+        return ("DEL", self._busy_key(day))
+
+    async def _load_many(self, event_ids: list):
+        if not event_ids:
+            return []
+        replies = await self.redis.pipeline([("HGETALL", self._event_key(event_id)) for event_id in event_ids])
+        return [event for event in map(hash_to_event, replies) if event is not None]
+
+    async def create(self, email: str, title: str, start: str, end: str):
+        day, mask = event_day(start), booking_mask(start, end)
+        sequence = await self.redis.execute("INCR", f"{self.prefix}counter:event_id")
+        event = {
+            "id": f"mock_event_{sequence}",
+            "email": email,
+            "title": title,
+            "start": start,
+            "end": end,
+            "status": "confirmed"
+        }
+        fields = [item for pair in event.items() for item in pair]
+
+        def build(replies):
+            busy = int(replies[0] or 0)
+            if not is_free(busy, mask):
+                raise BookingConflictError(f"{start} overlaps an existing booking")
+            return [
+                self._set_busy(day, busy | mask),
+                ("HSET", self._event_key(event["id"]), *fields),
+                ("ZADD", self._email_key(email), sequence, event["id"]),
+                ("ZADD", self._day_key(day), start_minutes(start), event["id"]),
+            ], event
+
+        return await self.redis.watch([self._busy_key(day)], [("GET", self._busy_key(day))], build)
+
+    async def get(self, event_id: str):
+        return hash_to_event(await self.redis.execute("HGETALL", self._event_key(event_id)))
+
+    async def list_by_email(self, email: str):
+        return await self._load_many(await self.redis.execute("ZRANGE", self._email_key(email), 0, -1))
+
+    async def list_by_day(self, day: str):
+        return await self._load_many(await self.redis.execute("ZRANGE", self._day_key(day), 0, -1))
+
+    async def busy_mask(self, day: str):
+        return int(await self.redis.execute("GET", self._busy_key(day)) or 0)
+
+    async def _change(self, event_id: str, days: list, build):
+        # Runs build(event, busy by day) in a transaction watching the booking
+        # and the busy bitmaps of `days(event)`, retrying if the booking moves
+        while True:
+            event = await self.get(event_id)
+            if event is None:
+                return None
+            watched_days = list(dict.fromkeys(days(event)))
+            keys = [self._event_key(event_id)] + [self._busy_key(day) for day in watched_days]
+
+            def check(replies):
+                current = hash_to_event(replies[0])
+                if current is None:
+                    return [], None
+                if (current["start"], current["end"]) != (event["start"], event["end"]):
+                    raise EventMoved()
+                busy = {day: int(value or 0) for day, value in zip(watched_days, replies[1:])}
+                return build(current, busy)
+
+            try:
+                return await self.redis.watch(keys, [("HGETALL", keys[0])] + [("GET", key) for key in keys[1:]], check)
+            except EventMoved:
+                continue
+
+    async def delete(self, event_id: str):
+        def build(event, busy):
+            day = event_day(event["start"])
+            return [
+                ("DEL", self._event_key(event_id)),
+                ("ZREM", self._email_key(event["email"]), event_id),
+                ("ZREM", self._day_key(day), event_id),
+                self._set_busy(day, busy[day] & ~booking_mask(event["start"], event["end"])),
+            ], True
+
+        # Only the request whose transaction removed the booking reports success
+        return bool(await self._change(event_id, lambda event: [event_day(event["start"])], build))
+
+    async def update_time(self, event_id: str, start: str, end: str):
+        new_day, new_mask = event_day(start), booking_mask(start, end)
+
+        def build(event, busy):
+            old_day = event_day(event["start"])
+            # Release the old time first so a booking can move within its own span
+            busy[old_day] &= ~booking_mask(event["start"], event["end"])
+            if not is_free(busy[new_day], new_mask):
+                raise BookingConflictError(f"{start} overlaps an existing booking")
+            busy[new_day] |= new_mask
+            updated = {**event, "start": start, "end": end}
+            return [
+                ("HSET", self._event_key(event_id), "start", start, "end", end),
+                ("ZREM", self._day_key(old_day), event_id),
+                ("ZADD", self._day_key(new_day), start_minutes(start), event_id),
+            ] + [self._set_busy(day, value) for day, value in busy.items()], updated
+
+        return await self._change(event_id, lambda event: [event_day(event["start"]), new_day], build)
+
+    def close(self):
+        pass
@@ -0,0 +1,518 @@
+# Write-behind outbox for Cal.com booking writes.
+#
+# book_event, cancel_event and reschedule_event record the write here and
+# answer the user right away with a "pending" acknowledgment; a background
+# worker sends queued writes to Cal.com in batches, retrying transient
+# failures with backoff. Every write carries an idempotency key derived from
+# its content and the chat turn that made it, so a tool call the model
+# repeats within a turn maps to the write already queued (or just sent)
+# instead of booking twice. Writes from different turns are never merged
+# once sent: booking a slot again after cancelling it, or rescheduling back
+# to an earlier time, is a new write.
+#
+# The outbox lives in the state backend: the in-memory store is lost on
+# restart, while the SQLite and Redis stores are durable and shared by every
+# worker, which claim batches under a lease so each write is sent by one
+# worker at a time.
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import sqlite3
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from metrics import OUTBOX_LAG_SECONDS, OUTBOX_WRITES
+from sqlite_db import on_db_thread
+
+logger = logging.getLogger("livex.outbox")
+
+PENDING = "pending"
+SENDING = "sending"
+SENT = "sent"
+FAILED = "failed"
+OPEN_STATUSES = (PENDING, SENDING, FAILED)
+
+# Id of the chat turn being handled, if any; writes are deduplicated within it
+current_turn = ContextVar("current_turn", default=None)
+
+
+class WriteRejected(Exception):
+    """Raised by a sender when the upstream refused the write; it is not retried."""
+
+
+@contextmanager
+def chat_turn():
+    token = current_turn.set(uuid.uuid4().hex)
+    try:
+        yield
+    finally:
+        current_turn.reset(token)
+
+
+def idempotency_key(op: str, payload: dict, turn: str = None):
+    # Same operation with the same arguments in the same turn -> same key
+    canonical = json.dumps({"op": op, "turn": turn, **payload}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()[:16]
+
+
+def request_key(entry: dict):
+    # Idempotency-Key sent to Cal.com: stable across retries of this write, but
+    # new for a later write that reuses its key after it was settled
+    return hashlib.sha256(f"{entry['key']}:{entry['created_at']!r}".encode()).hexdigest()[:16]
+
+
+def new_entry(key: str, op: str, email: str, payload: dict, now: float):
+    return {
+        "key": key,
+        "op": op,
+        "email": email,
+        "payload": payload,
+        "status": PENDING,
+        "attempts": 0,
+        "next_attempt_at": now,
+        "lease_until": None,
+        "result": None,
+        "error": None,
+        "created_at": now,
+        "updated_at": now,
+    }
+
+
+def is_duplicate(existing: dict, now: float, window: float):
+    # A write still queued absorbs a resubmission; a settled one only does
+    # within `window` seconds (0 outside a chat turn) and is otherwise
+    # replaced by the new write
+    return existing["status"] in (PENDING, SENDING) or (window > 0 and existing["created_at"] >= now - window)
+
+
+def is_due(entry: dict, now: float):
+    if entry["status"] == PENDING:
+        return entry["next_attempt_at"] <= now
+    # A write whose sender died is taken over once its lease runs out
+    return entry["status"] == SENDING and entry["lease_until"] <= now
+
+
+def claim_entry(entry: dict, now: float, lease: float):
+    entry["status"] = SENDING
+    entry["lease_until"] = now + lease
+    entry["attempts"] += 1
+    entry["updated_at"] = now
+
+
+class MemoryOutboxStore:
+    """Process-local outbox; queued writes are lost when the process exits."""
+
+    def __init__(self):
+        # key -> entry, in submission order
+        self.entries = {}
+
+    async def add(self, entry: dict, window: float):
+        # Returns the existing entry when `entry` is a duplicate, else stores it and returns None
+        existing = self.entries.get(entry["key"])
+        if existing is not None and is_duplicate(existing, entry["created_at"], window):
+            return dict(existing)
+        self.entries.pop(entry["key"], None)
+        self.entries[entry["key"]] = dict(entry)
+        return None
+
+    async def get(self, key: str):
+        entry = self.entries.get(key)
+        return dict(entry) if entry is not None else None
+
+    async def claim(self, limit: int, now: float, lease: float):
+        claimed = []
+        for entry in self.entries.values():
+            if len(claimed) >= limit:
+                break
+            if is_due(entry, now):
+                claim_entry(entry, now, lease)
+                claimed.append(dict(entry))
+        return claimed
+
+    async def save(self, entry: dict):
+        if entry["key"] in self.entries:
+            self.entries[entry["key"]] = dict(entry)
+
+    async def open_for(self, email: str):
+        return [dict(e) for e in self.entries.values() if e["email"] == email and e["status"] in OPEN_STATUSES]
+
+    async def unsent(self):
+        return [dict(e) for e in self.entries.values() if e["status"] in (PENDING, SENDING)]
+
+    async def queued(self):
+        return sum(1 for e in self.entries.values() if e["status"] in (PENDING, SENDING))
+
+    async def purge(self, before: float):
+        for key in [k for k, e in self.entries.items() if e["status"] in (SENT, FAILED) and e["updated_at"] < before]:
+            del self.entries[key]
+
+
+class SQLiteOutboxStore:
+    """Outbox table in the state database; survives restarts and is shared by workers."""
+
+    COLUMNS = ("key", "op", "email", "payload", "status", "attempts", "next_attempt_at",
+               "lease_until", "result", "error", "created_at", "updated_at")
+
+    def __init__(self, db: sqlite3.Connection):
+        self.db = db
+        self.db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS outbox (
+                key TEXT PRIMARY KEY,
+                op TEXT NOT NULL,
+                email TEXT,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL,
+                next_attempt_at REAL NOT NULL,
+                lease_until REAL,
+                result TEXT,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at);
+            CREATE INDEX IF NOT EXISTS outbox_email ON outbox (email);
+            """
+        )
+
+    def _row(self, row):
+        if row is None:
+            return None
+        entry = dict(row)
+        entry["payload"] = json.loads(entry["payload"])
+        entry["result"] = json.loads(entry["result"]) if entry["result"] else None
+        return entry
+
+    def _values(self, entry: dict):
+        values = dict(entry)
+        values["payload"] = json.dumps(entry["payload"])
+        values["result"] = json.dumps(entry["result"]) if entry["result"] is not None else None
+        return tuple(values[column] for column in self.COLUMNS)
+
+    def _upsert(self, entry: dict):
+        self.db.execute(
+            f"INSERT OR REPLACE INTO outbox ({', '.join(self.COLUMNS)}) VALUES ({', '.join('?' * len(self.COLUMNS))})",
+            self._values(entry)
+        )
+
+    @on_db_thread
+    def add(self, entry: dict, window: float):
+        with self.db:
+            self.db.execute("BEGIN IMMEDIATE")
+            existing = self._row(self.db.execute("SELECT * FROM outbox WHERE key = ?", (entry["key"],)).fetchone())
+            if existing is not None and is_duplicate(existing, entry["created_at"], window):
+                return existing
+            self._upsert(entry)
+        return None
+
+    @on_db_thread
+    def get(self, key: str):
+        return self._row(self.db.execute("SELECT * FROM outbox WHERE key = ?", (key,)).fetchone())
+
+    @on_db_thread
+    def claim(self, limit: int, now: float, lease: float):
+        with self.db:
+            self.db.execute("BEGIN IMMEDIATE")
+            rows = self.db.execute(
+                "SELECT * FROM outbox WHERE (status = ? AND next_attempt_at <= ?) OR (status = ? AND lease_until <= ?) "
+                "ORDER BY next_attempt_at LIMIT ?",
+                (PENDING, now, SENDING, now, limit)
+            ).fetchall()
+            claimed = [self._row(row) for row in rows]
+            for entry in claimed:
+                claim_entry(entry, now, lease)
+                self._upsert(entry)
+        return claimed
+
+    @on_db_thread
+    def save(self, entry: dict):
+        with self.db:
+            self._upsert(entry)
+
+    @on_db_thread
+    def open_for(self, email: str):
+        rows = self.db.execute(
+            f"SELECT * FROM outbox WHERE email = ? AND status IN ({', '.join('?' * len(OPEN_STATUSES))}) ORDER BY created_at",
+            (email, *OPEN_STATUSES)
+        ).fetchall()
+        return [self._row(row) for row in rows]
+
+    @on_db_thread
+    def unsent(self):
+        rows = self.db.execute("SELECT * FROM outbox WHERE status IN (?, ?) ORDER BY created_at", (PENDING, SENDING)).fetchall()
+        return [self._row(row) for row in rows]
+
+    @on_db_thread
+    def queued(self):
+        return self.db.execute("SELECT COUNT(*) FROM outbox WHERE status IN (?, ?)", (PENDING, SENDING)).fetchone()[0]
+
+    @on_db_thread
+    def purge(self, before: float):
+        with self.db:
+            self.db.execute("DELETE FROM outbox WHERE status IN (?, ?) AND updated_at < ?", (SENT, FAILED, before))
+
+
+class RedisOutboxStore:
+    """Outbox on a Redis-protocol server, shared by every worker and node.
+
+    Each write is a JSON string key. A sorted set of queued writes, scored by
+    when they are next due, is what workers claim from; claims are
+    WATCH/MULTI/EXEC transactions on that set, so two workers never claim
+    the same write. A per-email sorted set lists a user's writes and another
+    one orders settled writes for purging.
+    """
+
+    def __init__(self, redis, prefix: str = "outbox:"):
+        self.redis = redis
+        self.prefix = prefix
+
+    def _entry_key(self, key: str):
+        return f"{self.prefix}entry:{key}"
+
+    def _email_key(self, email: str):
+        return f"{self.prefix}email:{email}"
+
+    @property
+    def _due_key(self):
+        return f"{self.prefix}due"
+
+    @property
+    def _settled_key(self):
+        return f"{self.prefix}settled"
+
+    def _write(self, entry: dict):
+        # Commands storing `entry` and placing it in the due or settled set
+        commands = [("SET", self._entry_key(entry["key"]), json.dumps(entry))]
+        if entry["status"] == PENDING:
+            commands.append(("ZADD", self._due_key, entry["next_attempt_at"], entry["key"]))
+            commands.append(("ZREM", self._settled_key, entry["key"]))
+        elif entry["status"] == SENDING:
+            commands.append(("ZADD", self._due_key, entry["lease_until"], entry["key"]))
+        else:
+            commands.append(("ZREM", self._due_key, entry["key"]))
+            commands.append(("ZADD", self._settled_key, entry["updated_at"], entry["key"]))
+        return commands
+
+    async def add(self, entry: dict, window: float):
+        def build(replies):
+            if replies[0] is not None:
+                existing = json.loads(replies[0])
+                if is_duplicate(existing, entry["created_at"], window):
+                    return [], existing
+            commands = self._write(entry)
+            if entry["email"]:
+                commands.append(("ZADD", self._email_key(entry["email"]), entry["created_at"], entry["key"]))
+            return commands, None
+
+        entry_key = self._entry_key(entry["key"])
+        return await self.redis.watch([entry_key], [("GET", entry_key)], build)
+
+    async def get(self, key: str):
+        value = await self.redis.execute("GET", self._entry_key(key))
+        return json.loads(value) if value is not None else None
+
+    async def claim(self, limit: int, now: float, lease: float):
+        keys = (await self.redis.execute("ZRANGEBYSCORE", self._due_key, "-inf", now))[:limit]
+        if not keys:
+            return []
+
+        def build(replies):
+            claimed = []
+            commands = []
+            for value in replies:
+                if value is None:
+                    continue
+                entry = json.loads(value)
+                if is_due(entry, now):
+                    claim_entry(entry, now, lease)
+                    claimed.append(entry)
+                    commands.extend(self._write(entry))
+            return commands, claimed
+
+        # Watching the due set makes a concurrent claim by another worker retry
+        return await self.redis.watch(
+            [self._due_key] + [self._entry_key(key) for key in keys],
+            [("GET", self._entry_key(key)) for key in keys],
+            build
+        )
+
+    async def save(self, entry: dict):
+        await self.redis.transaction(self._write(entry))
+
+    async def open_for(self, email: str):
+        keys = await self.redis.execute("ZRANGE", self._email_key(email), 0, -1)
+        if not keys:
+            return []
+        values = await self.redis.pipeline([("GET", self._entry_key(key)) for key in keys])
+        entries = [json.loads(value) for value in values if isinstance(value, str)]
+        return [entry for entry in entries if entry["status"] in OPEN_STATUSES]
+
+    async def unsent(self):
+        keys = await self.redis.execute("ZRANGE", self._due_key, 0, -1)
+        if not keys:
+            return []
+        values = await self.redis.pipeline([("GET", self._entry_key(key)) for key in keys])
+        entries = [json.loads(value) for value in values if isinstance(value, str)]
+        return [entry for entry in entries if entry["status"] in (PENDING, SENDING)]
+
+    async def queued(self):
+        return await self.redis.execute("ZCARD", self._due_key)
+
+    async def purge(self, before: float):
+        keys = await self.redis.execute("ZRANGEBYSCORE", self._settled_key, "-inf", before)
+        if not keys:
+            return
+        values = await self.redis.pipeline([("GET", self._entry_key(key)) for key in keys])
+        commands = [("ZREM", self._settled_key, *keys), ("DEL", *(self._entry_key(key) for key in keys))]
+        for key, value in zip(keys, values):
+            if isinstance(value, str) and json.loads(value).get("email"):
+                commands.append(("ZREM", self._email_key(json.loads(value)["email"]), key))
+        await self.redis.transaction(commands)
+
+
+class Outbox:
+    """Queues Cal.com writes and delivers them from a background task.
+
+    `send(entry)` performs one write and returns its result (stored on the
+    entry); it raises WriteRejected for a write the upstream refused, and any
+    other exception for a transient failure, which is retried after a full
+    jitter backoff until `max_attempts` sends have been made.
+    """
+
+    def __init__(self, store, send, batch_size: int = 20, poll_interval: float = 1.0, max_attempts: int = 8,
+                 lease: float = 60.0, backoff_base: float = 1.0, backoff_max: float = 300.0,
+                 dedup_window: float = 30.0, retention: float = 86400.0):
+        self.store = store
+        self.send = send
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = max_attempts
+        self.lease = lease
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.dedup_window = dedup_window
+        self.retention = retention
+        self.wakeup = asyncio.Event()
+        self.task = None
+        self.counts = {"submitted": 0, "deduplicated": 0, "sent": 0, "retried": 0, "failed": 0}
+
+    @classmethod
+    def from_env(cls, store, send):
+        return cls(
+            store,
+            send,
+            batch_size=int(os.getenv("OUTBOX_BATCH_SIZE", "20")),
+            poll_interval=float(os.getenv("OUTBOX_POLL_INTERVAL", "1")),
+            max_attempts=int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8")),
+            dedup_window=float(os.getenv("OUTBOX_DEDUP_WINDOW", "30")),
+        )
+
+    async def submit(self, op: str, email: str, payload: dict):
+        """Queues a write; returns (entry, duplicate)."""
+        turn = current_turn.get()
+        entry = new_entry(idempotency_key(op, payload, turn), op, email, payload, time.time())
+        # Only a repeat from the same turn may reuse a write that was already sent
+        existing = await self.store.add(entry, self.dedup_window if turn is not None else 0.0)
+        if existing is not None:
+            self.counts["deduplicated"] += 1
+            OUTBOX_WRITES.inc(op, "deduplicated")
+            return existing, True
+        self.counts["submitted"] += 1
+        OUTBOX_WRITES.inc(op, "submitted")
+        self.wakeup.set()
+        return entry, False
+
+    async def get(self, key: str):
+        return await self.store.get(key)
+
+    async def open_for(self, email: str):
+        # Writes for `email` that are still queued or have failed
+        return await self.store.open_for(email)
+
+    async def unsent(self):
+        # Writes, for every user, that Cal.com has not accepted or refused yet
+        return await self.store.unsent()
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.get_running_loop().create_task(self._run(), name="outbox-worker")
+
+    async def stop(self):
+        # Writes being sent are retried by the next worker once their lease expires
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    def backoff_delay(self, attempt: int):
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    async def _run(self):
+        last_purge = 0.0
+        while True:
+            try:
+                await asyncio.wait_for(self.wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.wakeup.clear()
+            try:
+                await self.drain()
+                if time.time() - last_purge > 60:
+                    last_purge = time.time()
+                    await self.store.purge(last_purge - self.retention)
+            except Exception:
+                logger.exception("Outbox delivery failed")
+
+    async def drain(self):
+        # Sends due writes, one batch at a time, until none are left
+        while True:
+            batch = await self.store.claim(self.batch_size, time.time(), self.lease)
+            if not batch:
+                return
+            await asyncio.gather(*(self._deliver(entry) for entry in batch))
+
+    async def _deliver(self, entry: dict):
+        try:
+            entry["result"] = await self.send(entry)
+            entry["status"] = SENT
+            entry["error"] = None
+            OUTBOX_LAG_SECONDS.observe(time.time() - entry["created_at"], entry["op"])
+            outcome = "sent"
+        except WriteRejected as e:
+            entry["status"] = FAILED
+            entry["error"] = str(e)
+            outcome = "failed"
+        except Exception as e:
+            entry["error"] = str(e) or type(e).__name__
+            if entry["attempts"] >= self.max_attempts:
+                entry["status"] = FAILED
+                outcome = "failed"
+            else:
+                entry["status"] = PENDING
+                entry["next_attempt_at"] = time.time() + self.backoff_delay(entry["attempts"] - 1)
+                outcome = "retried"
+        entry["lease_until"] = None
+        entry["updated_at"] = time.time()
+        await self.store.save(entry)
+
+        self.counts[outcome] += 1
+        OUTBOX_WRITES.inc(entry["op"], outcome)
+        if outcome == "failed":
+            logger.error("Cal.com write failed", extra={"op": entry["op"], "key": entry["key"], "attempts": entry["attempts"], "error": entry["error"]})
+        elif outcome == "retried":
+            logger.warning("Cal.com write will be retried", extra={"op": entry["op"], "key": entry["key"], "attempts": entry["attempts"], "error": entry["error"]})
+        else:
+            logger.info("Cal.com write sent", extra={"op": entry["op"], "key": entry["key"], "attempts": entry["attempts"]})
+
+    async def stats(self):
+        return {"queued": await self.store.queued(), **self.counts}
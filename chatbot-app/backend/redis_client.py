@@ -0,0 +1,178 @@
+import asyncio
+from urllib.parse import urlparse
+
+
+class RedisError(Exception):
+    pass
+
+
+def encode_command(*args):
+    parts = [f"*{len(args)}\r\n".encode()]
+    for arg in args:
+        if isinstance(arg, bytes):
+            data = arg
+        else:
+            data = str(arg).encode()
+        parts.append(f"${len(data)}\r\n".encode())
+        parts.append(data)
+        parts.append(b"\r\n")
+    return b"".join(parts)
+
+
+async def read_reply(reader: asyncio.StreamReader):
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("Redis connection closed")
+    kind, payload = line[:1], line[1:-2]
+    if kind == b"+":
+        return payload.decode()
+    if kind == b"-":
+        return RedisError(payload.decode())
+    if kind == b":":
+        return int(payload)
+    if kind == b"$":
+        length = int(payload)
+        if length == -1:
+            return None
+        data = await reader.readexactly(length + 2)
+        return data[:-2].decode()
+    if kind == b"*":
+        length = int(payload)
+        if length == -1:
+            return None
+        return [await read_reply(reader) for _ in range(length)]
+    raise RedisError(f"Unexpected reply: {line!r}")
+
+
+class RedisClient:
+    """Minimal asyncio client for the Redis protocol (RESP2).
+
+    Supports exactly what the state backend needs: single commands,
+    pipelines, MULTI/EXEC transactions and WATCH-based optimistic
+    transactions over a small connection pool.
+    Works against Redis, Valkey, KeyDB or the local stand-in server in
+    standins/redis_server.py.
+    """
+
+    def __init__(self, url: str = "redis://localhost:6379/0", pool_size: int = 10):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "localhost"
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int(parsed.path.lstrip("/") or 0)
+        self.pool = asyncio.Queue()
+        self.pool_size = pool_size
+        self.opened = 0
+
+    async def _connect(self):
+        reader, writer = await asyncio.open_connection(self.host, self.port)
+        connection = (reader, writer)
+        setup = []
+        if self.password:
+            setup.append(("AUTH", self.password))
+        if self.db:
+            setup.append(("SELECT", self.db))
+        if setup:
+            for reply in await self._send(connection, setup):
+                if isinstance(reply, RedisError):
+                    raise reply
+        return connection
+
+    async def _acquire(self):
+        if self.pool.empty() and self.opened < self.pool_size:
+            self.opened += 1
+            try:
+                return await self._connect()
+            except Exception:
+                self.opened -= 1
+                raise
+        return await self.pool.get()
+
+    def _release(self, connection, healthy: bool = True):
+        if healthy:
+            self.pool.put_nowait(connection)
+        else:
+            self.opened -= 1
+            connection[1].close()
+
+    @staticmethod
+    async def _send(connection, commands):
+        reader, writer = connection
+        writer.write(b"".join(encode_command(*command) for command in commands))
+        await writer.drain()
+        return [await read_reply(reader) for _ in commands]
+
+    async def pipeline(self, commands: list):
+        # Sends all commands in one write and reads the replies in order
+        connection = await self._acquire()
+        try:
+            replies = await self._send(connection, commands)
+        except BaseException:
+            # A cancelled or failed exchange leaves unread replies behind
+            self._release(connection, healthy=False)
+            raise
+        self._release(connection)
+        return replies
+
+    async def execute(self, *command):
+        reply = (await self.pipeline([command]))[0]
+        if isinstance(reply, RedisError):
+            raise reply
+        return reply
+
+    async def transaction(self, commands: list):
+        # MULTI/EXEC: the commands are applied atomically
+        replies = await self.pipeline([("MULTI",)] + commands + [("EXEC",)])
+        for reply in replies:
+            if isinstance(reply, RedisError):
+                raise reply
+        return replies[-1]
+
+    async def watch(self, keys: list, reads: list, build, attempts: int = 50):
+        """Optimistic transaction (WATCH, reads, MULTI/EXEC) on one connection.
+
+        Watches `keys`, runs the `reads` commands and passes their replies to
+        `build`, which returns (commands, result). The commands are applied
+        atomically unless a watched key changed after the WATCH, in which case
+        the reads and `build` are retried. `build` may return no commands to
+        finish without writing, or raise to abort. Returns `result`.
+        """
+        connection = await self._acquire()
+        try:
+            for _ in range(attempts):
+                replies = await self._send(connection, [("WATCH", *keys)] + reads)
+                for reply in replies:
+                    if isinstance(reply, RedisError):
+                        raise reply
+                try:
+                    commands, result = build(replies[1:])
+                except Exception:
+                    await self._send(connection, [("UNWATCH",)])
+                    self._release(connection)
+                    connection = None
+                    raise
+                if not commands:
+                    await self._send(connection, [("UNWATCH",)])
+                    self._release(connection)
+                    connection = None
+                    return result
+                replies = await self._send(connection, [("MULTI",)] + commands + [("EXEC",)])
+                for reply in replies:
+                    if isinstance(reply, RedisError):
+                        raise reply
+                # EXEC replies nil when a watched key was modified since the WATCH
+                if replies[-1] is not None:
+                    self._release(connection)
+                    connection = None
+                    return result
+            raise RedisError(f"Optimistic transaction on {keys} kept conflicting")
+        except BaseException:
+            if connection is not None:
+                self._release(connection, healthy=False)
+            raise
+
+    async def close(self):
+        while not self.pool.empty():
+            _, writer = self.pool.get_nowait()
+            writer.close()
+        self.opened = 0
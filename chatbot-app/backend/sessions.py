@@ -0,0 +1,164 @@
+import json
+import time
+import uuid
+from collections import OrderedDict
+
+from json_codec import dumps, loads
+
+# Rough token estimate (about 4 characters per token plus per-message overhead).
+# Good enough for budgeting; the model's exact tokenizer is not needed here.
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_tokens(message: dict):
+    size = len(message.get("content") or "")
+    if message.get("function_call"):
+        size += len(json.dumps(message["function_call"]))
+    if message.get("tool_calls"):
+        size += len(json.dumps(message["tool_calls"]))
+    return MESSAGE_OVERHEAD_TOKENS + size // CHARS_PER_TOKEN
+
+
+def split_turns(messages: list):
+    # A turn starts at a user message and runs until the next one, so an
+    # assistant function call always stays together with its result
+    turns = []
+    for message in messages:
+        if message.get("role") == "user" or not turns:
+            turns.append([])
+        turns[-1].append(message)
+    return turns
+
+
+def shorten(text: str, limit: int):
+    text = " ".join((text or "").split())
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+
+def summarize_turn(turn: list, limit: int = 160):
+    # Extractive one-line summary: what the user asked and what was answered
+    user = next((m.get("content") for m in turn if m.get("role") == "user"), None)
+    tools = [m.get("name") for m in turn if m.get("role") in ("function", "tool") and m.get("name")]
+    answer = next((m.get("content") for m in reversed(turn) if m.get("role") == "assistant" and m.get("content")), None)
+    parts = []
+    if user:
+        parts.append(f"User: {shorten(user, limit)}")
+    if tools:
+        parts.append(f"Tools used: {', '.join(tools)}")
+    if answer:
+        parts.append(f"Assistant: {shorten(answer, limit)}")
+    return " | ".join(parts)
+
+
+class Session:
+    def __init__(self, conversation_id: str, email: str, messages: list = None, summary: list = None, updated_at: float = None):
+        self.conversation_id = conversation_id
+        self.email = email
+        self.messages = messages or []
+        # One line per summarized (dropped) turn, oldest first
+        self.summary = summary or []
+        self.updated_at = updated_at or time.time()
+
+    def to_dict(self):
+        return {
+            "conversation_id": self.conversation_id,
+            "email": self.email,
+            "messages": self.messages,
+            "summary": self.summary,
+            "updated_at": self.updated_at,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict):
+        return cls(**data)
+
+
+def compact_history(session: Session, token_budget: int, keep_recent_turns: int = 4, collapsed_tool_chars: int = 200):
+    """Keep the stored history of a session within `token_budget` tokens.
+
+    Applied in order until the history fits:
+    1. tool results outside the most recent turns are cut to a short prefix
+    2. the oldest turns are folded into one-line summaries
+    3. the oldest summary lines are dropped
+    The most recent `keep_recent_turns` turns are always kept verbatim.
+    """
+    turns = split_turns(session.messages)
+    recent_start = max(0, len(turns) - keep_recent_turns)
+
+    for turn in turns[:recent_start]:
+        for i, message in enumerate(turn):
+            if message.get("role") in ("function", "tool") and len(message.get("content") or "") > collapsed_tool_chars:
+                turn[i] = {**message, "content": shorten(message["content"], collapsed_tool_chars)}
+
+    def total():
+        return (
+            sum(estimate_tokens(m) for turn in turns for m in turn)
+            + sum(len(line) // CHARS_PER_TOKEN for line in session.summary)
+        )
+
+    while total() > token_budget and len(turns) > keep_recent_turns:
+        session.summary.append(summarize_turn(turns.pop(0)))
+
+    while total() > token_budget and session.summary:
+        session.summary.pop(0)
+
+    session.messages = [message for turn in turns for message in turn]
+    return session
+
+
+class SessionStore:
+    """In-memory conversation sessions with idle expiry and LRU eviction."""
+
+    def __init__(self, ttl: float = 3600.0, max_sessions: int = 10000):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.sessions = OrderedDict()
+
+    def new_session(self, email: str):
+        return Session(uuid.uuid4().hex, email)
+
+    async def get(self, conversation_id: str):
+        session = self.sessions.get(conversation_id)
+        if session is None:
+            return None
+        if session.updated_at + self.ttl < time.time():
+            del self.sessions[conversation_id]
+            return None
+        self.sessions.move_to_end(conversation_id)
+        return session
+
+    async def save(self, session: Session):
+        session.updated_at = time.time()
+        self.sessions[session.conversation_id] = session
+        self.sessions.move_to_end(session.conversation_id)
+        while len(self.sessions) > self.max_sessions:
+            self.sessions.popitem(last=False)
+
+    async def delete(self, conversation_id: str):
+        self.sessions.pop(conversation_id, None)
+
+
+class BackendSessionStore:
+    """Sessions kept in a shared state backend, so any worker can serve any turn.
+
+    Same interface as SessionStore; sessions are stored as JSON with an idle TTL.
+    """
+
+    def __init__(self, backend, ttl: float = 3600.0):
+        self.backend = backend
+        self.ttl = ttl
+
+    def new_session(self, email: str):
+        return Session(uuid.uuid4().hex, email)
+
+    async def get(self, conversation_id: str):
+        data = await self.backend.get(f"session:{conversation_id}")
+        return Session.from_dict(loads(data)) if data is not None else None
+
+    async def save(self, session: Session):
+        session.updated_at = time.time()
+        await self.backend.set(f"session:{session.conversation_id}", dumps(session.to_dict()), ttl=self.ttl)
+
+    async def delete(self, conversation_id: str):
+        await self.backend.delete(f"session:{conversation_id}")
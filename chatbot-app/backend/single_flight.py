@@ -0,0 +1,41 @@
+import asyncio
+
+
+class SingleFlight:
+    """Coalesces concurrent identical calls into one.
+
+    The first caller for a key starts the call; callers arriving while it is
+    still in flight wait on the same task and receive its result (or its
+    exception). The call runs as its own task, so a caller being cancelled
+    does not cancel it for the others. `on_collapse()`, if given, is called
+    for every caller that joins a call already in flight.
+    """
+
+    def __init__(self, on_collapse=None):
+        self.inflight = {}
+        self.on_collapse = on_collapse
+        self.calls = 0
+        self.collapsed = 0
+
+    def _done(self, key, task):
+        if self.inflight.get(key) is task:
+            del self.inflight[key]
+        # Mark the exception as retrieved in case every waiter was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    async def do(self, key, fn):
+        task = self.inflight.get(key)
+        if task is None:
+            self.calls += 1
+            task = asyncio.ensure_future(fn())
+            self.inflight[key] = task
+            task.add_done_callback(lambda t: self._done(key, t))
+        else:
+            self.collapsed += 1
+            if self.on_collapse is not None:
+                self.on_collapse()
+        return await asyncio.shield(task)
+
+    def stats(self):
+        return {"calls": self.calls, "collapsed": self.collapsed, "in_flight": len(self.inflight)}
@@ -0,0 +1,167 @@
+import json
+import time
+from collections import OrderedDict
+
+
+class SlotCache:
+    """In-process TTL cache for available slots, keyed by (event_type_id, date).
+
+    Entries expire after `ttl` seconds and the least recently used entry is
+    evicted once `max_entries` is reached. Writes (book/cancel/reschedule)
+    invalidate the dates they touch so a booked slot is never offered again.
+    """
+
+    def __init__(self, ttl: float = 60.0, max_entries: int = 512, max_tracked_bookings: int = 4096, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_tracked_bookings = max_tracked_bookings
+        self.clock = clock
+        self.entries = OrderedDict()
+        # event id -> (event_type_id, date), so cancel/reschedule can invalidate
+        # only the date a booking was on instead of the whole event type
+        self.booking_dates = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    async def get(self, event_type_id, date: str):
+        key = (event_type_id, date)
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at <= self.clock():
+            del self.entries[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    async def set(self, event_type_id, date: str, value):
+        key = (event_type_id, date)
+        self.entries[key] = (self.clock() + self.ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    async def invalidate(self, event_type_id, date: str = None):
+        # Without a date, drop every cached date for the event type
+        if date is not None:
+            keys = [(event_type_id, date)]
+        else:
+            keys = [key for key in self.entries if key[0] == event_type_id]
+        for key in keys:
+            if self.entries.pop(key, None) is not None:
+                self.invalidations += 1
+
+    async def remember_booking(self, event_id: str, event_type_id, date: str):
+        await self.remember_bookings(event_type_id, {event_id: date})
+
+    async def remember_bookings(self, event_type_id, dates: dict):
+        # `dates` maps event ids to the date each booking is on
+        for event_id, date in dates.items():
+            self.booking_dates[event_id] = (event_type_id, date)
+            self.booking_dates.move_to_end(event_id)
+        while len(self.booking_dates) > self.max_tracked_bookings:
+            self.booking_dates.popitem(last=False)
+
+    async def invalidate_booking(self, event_id: str, event_type_id, new_date: str = None):
+        # Invalidate the date a booking was on (and the date it moves to, if any).
+        # If the original date is unknown, fall back to the whole event type.
+        known = self.booking_dates.pop(event_id, None)
+        if known is None:
+            await self.invalidate(event_type_id)
+        else:
+            await self.invalidate(*known)
+        if new_date is not None:
+            await self.invalidate(event_type_id, new_date)
+            await self.remember_booking(event_id, event_type_id, new_date)
+
+    async def clear(self):
+        self.entries.clear()
+        self.booking_dates.clear()
+
+    def stats(self):
+        return {
+            "size": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+class SharedSlotCache:
+    """Slot cache kept in a shared state backend, for multi-worker deployments.
+
+    Same interface as SlotCache. Entries live in the backend with a TTL, so
+    an invalidation on one worker is seen by all of them. Invalidating a
+    whole event type records a flush time; entries cached before it are
+    treated as misses. Hit/miss counters are per process.
+    """
+
+    def __init__(self, backend, ttl: float = 60.0, booking_ttl: float = 86400.0):
+        self.backend = backend
+        self.ttl = ttl
+        self.booking_ttl = booking_ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    async def get(self, event_type_id, date: str):
+        entry = await self.backend.get(f"slots:{event_type_id}:{date}")
+        if entry is not None:
+            entry = json.loads(entry)
+            flushed_at = await self.backend.get(f"slots:{event_type_id}:flushed")
+            if flushed_at is None or entry["cached_at"] > float(flushed_at):
+                self.hits += 1
+                return entry["value"]
+        self.misses += 1
+        return None
+
+    async def set(self, event_type_id, date: str, value):
+        entry = json.dumps({"cached_at": time.time(), "value": value})
+        await self.backend.set(f"slots:{event_type_id}:{date}", entry, ttl=self.ttl)
+
+    async def invalidate(self, event_type_id, date: str = None):
+        if date is not None:
+            await self.backend.delete(f"slots:{event_type_id}:{date}")
+        else:
+            # Only needs to outlive the entries it invalidates
+            await self.backend.set(f"slots:{event_type_id}:flushed", str(time.time()), ttl=self.ttl)
+        self.invalidations += 1
+
+    async def remember_booking(self, event_id: str, event_type_id, date: str):
+        await self.remember_bookings(event_type_id, {event_id: date})
+
+    async def remember_bookings(self, event_type_id, dates: dict):
+        # One backend write for a whole list of bookings
+        if dates:
+            await self.backend.set_many(
+                {f"slots:booking:{event_id}": json.dumps([event_type_id, date]) for event_id, date in dates.items()},
+                ttl=self.booking_ttl
+            )
+
+    async def invalidate_booking(self, event_id: str, event_type_id, new_date: str = None):
+        known = await self.backend.get(f"slots:booking:{event_id}")
+        if known is None:
+            await self.invalidate(event_type_id)
+        else:
+            await self.invalidate(*json.loads(known))
+        if new_date is not None:
+            await self.invalidate(event_type_id, new_date)
+            await self.remember_booking(event_id, event_type_id, new_date)
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
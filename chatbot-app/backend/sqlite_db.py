@@ -0,0 +1,49 @@
+# SQLite state databases, queried off the event loop.
+#
+# Every worker on a host shares the database file, so a write may wait up to
+# busy_timeout for another worker's write lock. Each connection therefore
+# runs its queries on one dedicated thread: a wait blocks that thread rather
+# than the event loop, and the statements of a transaction are never
+# interleaved with another coroutine's.
+
+import asyncio
+import functools
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Database(sqlite3.Connection):
+    """A connection with its own query thread (see on_db_thread)."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+
+    def close(self):
+        # Lets queued queries finish first
+        self.thread.shutdown(wait=True)
+        super().close()
+
+
+def connect(path: str):
+    # A connection to a state database shared by every worker on the host
+    db = sqlite3.connect(path, factory=Database, isolation_level=None, check_same_thread=False)
+    db.row_factory = sqlite3.Row
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.execute("PRAGMA busy_timeout=5000")
+    return db
+
+
+def on_db_thread(method):
+    """Makes a blocking store method a coroutine run on its `self.db`'s thread.
+
+    A plain sqlite3 connection (no thread of its own) is queried inline.
+    """
+    @functools.wraps(method)
+    async def run(self, *args, **kwargs):
+        thread = getattr(self.db, "thread", None)
+        if thread is None:
+            return method(self, *args, **kwargs)
+        return await asyncio.get_running_loop().run_in_executor(thread, functools.partial(method, self, *args, **kwargs))
+    return run
@@ -0,0 +1,181 @@
+# Local stand-in for the Cal.com v2 API, for load tests without network access.
+#
+# Implements the endpoints main.py calls, in the response shapes it parses:
+#   GET    /v2/slots                       free half-hour slots, 09:00-17:00, per day in range
+#   GET    /v2/bookings?email=&take=&skip= bookings with that attendee (all of them without email), paged
+#   POST   /v2/bookings                    create a booking (a repeated Idempotency-Key returns the first one)
+#   DELETE /v2/bookings/{uid}              cancel a booking
+#   PATCH  /v2/bookings/{uid}/reschedule   move a booking
+# plus GET /_stats and POST /_reset for call counts. Latency and failure
+# rates are configurable. With --webhook-url, every booking change is also
+# sent there as a signed Cal.com booking webhook.
+#
+# Usage (from the backend directory):
+#   python standins/calcom_server.py --port 8101 --latency-ms 120 --failure-rate 0.02
+#   CALCOM_API_KEY=standin CALCOM_API_URL=http://127.0.0.1:8101/v2 uvicorn main:app
+#   python standins/calcom_server.py --webhook-url http://127.0.0.1:8000/webhooks/calcom --webhook-secret s3cret
+
+import argparse
+import asyncio
+import hashlib
+import hmac
+import itertools
+import json
+import os
+import sys
+from datetime import date, datetime, timedelta, timezone
+
+import httpx
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from standins.common import UpstreamBehaviour, add_behaviour_arguments, behaviour_from_args
+
+
+def create_app(behaviour: UpstreamBehaviour = None, webhook_url: str = None, webhook_secret: str = ""):
+    behaviour = behaviour or UpstreamBehaviour()
+    app = FastAPI()
+    bookings = {}
+    # Idempotency-Key -> booking uid, so a resent create returns the first booking
+    idempotency_keys = {}
+    ids = itertools.count(1)
+    webhooks = {"sent": 0, "failed": 0}
+
+    async def deliver(trigger: str, booking: dict):
+        body = json.dumps({
+            "triggerEvent": trigger,
+            "createdAt": datetime.now(timezone.utc).isoformat(),
+            "payload": {**booking, "bookingId": booking["id"]},
+        }).encode()
+        signature = hmac.new(webhook_secret.encode(), body, hashlib.sha256).hexdigest()
+        try:
+            async with httpx.AsyncClient(timeout=10) as client:
+                response = await client.post(
+                    webhook_url, content=body,
+                    headers={"Content-Type": "application/json", "X-Cal-Signature-256": signature},
+                )
+            webhooks["sent" if response.status_code < 400 else "failed"] += 1
+        except httpx.HTTPError:
+            webhooks["failed"] += 1
+
+    def notify(trigger: str, booking: dict):
+        # Sent after the API response, like Cal.com's own webhooks
+        if webhook_url:
+            asyncio.get_running_loop().create_task(deliver(trigger, dict(booking)))
+
+    async def upstream(endpoint: str, handler):
+        await behaviour.delay()
+        if behaviour.should_fail():
+            behaviour.record(endpoint, behaviour.failure_status)
+            return JSONResponse({"status": "error", "message": "Injected failure"}, status_code=behaviour.failure_status)
+        status, body = handler()
+        behaviour.record(endpoint, status)
+        return JSONResponse(body, status_code=status)
+
+    @app.get("/v2/slots")
+    async def slots(startTime: str, endTime: str = None, eventTypeId: int = 1):
+        def handler():
+            first = date.fromisoformat(startTime[:10])
+            last = date.fromisoformat((endTime or startTime)[:10])
+            days = [(first + timedelta(days=i)).isoformat() for i in range(max(0, (last - first).days) + 1)]
+            taken = {b["startTime"][:16] for b in bookings.values()}
+            times = [
+                f"{day}T{hour:02d}:{minute:02d}:00Z"
+                for day in days
+                for hour in range(9, 17)
+                for minute in (0, 30)
+                if f"{day}T{hour:02d}:{minute:02d}" not in taken
+            ]
+            return 200, {"slots": [{"time": time} for time in times]}
+        return await upstream("GET /v2/slots", handler)
+
+    @app.get("/v2/bookings")
+    async def list_bookings(email: str = None, take: int = None, skip: int = 0):
+        def handler():
+            matches = [
+                b for b in bookings.values()
+                if email is None or any(a["email"] == email for a in b["attendees"])
+            ]
+            if take is not None:
+                matches = matches[skip:skip + take]
+            return 200, {"bookings": matches}
+        return await upstream("GET /v2/bookings", handler)
+
+    @app.post("/v2/bookings")
+    async def create_booking(request: Request):
+        body = await request.json()
+        idempotency_key = request.headers.get("Idempotency-Key")
+
+        def handler():
+            if idempotency_key in idempotency_keys and idempotency_keys[idempotency_key] in bookings:
+                return 201, bookings[idempotency_keys[idempotency_key]]
+            booking_id = next(ids)
+            booking = {
+                "id": booking_id,
+                "uid": f"standin-{booking_id}",
+                "title": body.get("title", "Meeting"),
+                "startTime": body.get("start"),
+                "endTime": body.get("end"),
+                "status": "accepted",
+                "attendees": [{"email": body.get("email"), "name": body.get("name")}],
+            }
+            bookings[booking["uid"]] = booking
+            if idempotency_key:
+                idempotency_keys[idempotency_key] = booking["uid"]
+            notify("BOOKING_CREATED", booking)
+            return 201, booking
+        return await upstream("POST /v2/bookings", handler)
+
+    @app.delete("/v2/bookings/{uid}")
+    async def cancel_booking(uid: str):
+        def handler():
+            booking = bookings.pop(uid, None)
+            if booking is None:
+                return 404, {"status": "error", "message": "Booking not found"}
+            notify("BOOKING_CANCELLED", {**booking, "status": "cancelled"})
+            return 200, {"status": "success"}
+        return await upstream("DELETE /v2/bookings/{uid}", handler)
+
+    @app.patch("/v2/bookings/{uid}/reschedule")
+    async def reschedule_booking(uid: str, request: Request):
+        body = await request.json()
+
+        def handler():
+            booking = bookings.get(uid)
+            if booking is None:
+                return 404, {"status": "error", "message": "Booking not found"}
+            booking["startTime"] = body.get("start")
+            booking["endTime"] = body.get("end")
+            notify("BOOKING_RESCHEDULED", booking)
+            return 200, booking
+        return await upstream("PATCH /v2/bookings/{uid}/reschedule", handler)
+
+    @app.get("/_stats")
+    async def stats():
+        return {**behaviour.stats(), "bookings": len(bookings), "webhooks": webhooks}
+
+    @app.post("/_reset")
+    async def reset():
+        behaviour.reset()
+        bookings.clear()
+        return {"status": "ok"}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8101)
+    add_behaviour_arguments(parser, default_latency_ms=120)
+    parser.add_argument("--webhook-url", help="send booking webhooks here (e.g. http://127.0.0.1:8000/webhooks/calcom)")
+    parser.add_argument("--webhook-secret", default="", help="CALCOM_WEBHOOK_SECRET of the app receiving the webhooks")
+    args = parser.parse_args()
+    app = create_app(behaviour_from_args(args), args.webhook_url, args.webhook_secret)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
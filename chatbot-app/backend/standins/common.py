@@ -0,0 +1,48 @@
+import asyncio
+import random
+from collections import Counter
+
+
+class UpstreamBehaviour:
+    """Latency and failure injection shared by the stand-in servers."""
+
+    def __init__(self, latency_ms: float = 0, jitter_ms: float = 0, failure_rate: float = 0, failure_status: int = 503, seed: int = None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        self.random = random.Random(seed)
+        self.calls = Counter()
+        self.statuses = Counter()
+
+    async def delay(self):
+        latency = self.latency_ms + self.random.uniform(-self.jitter_ms, self.jitter_ms)
+        if latency > 0:
+            await asyncio.sleep(latency / 1000)
+
+    def should_fail(self):
+        return self.failure_rate > 0 and self.random.random() < self.failure_rate
+
+    def record(self, endpoint: str, status: int):
+        self.calls[endpoint] += 1
+        self.statuses[str(status)] += 1
+
+    def stats(self):
+        return {"calls": dict(self.calls), "statuses": dict(self.statuses), "total": sum(self.calls.values())}
+
+    def reset(self):
+        self.calls.clear()
+        self.statuses.clear()
+
+
+def add_behaviour_arguments(parser, default_latency_ms: float):
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--latency-ms", type=float, default=default_latency_ms)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--failure-rate", type=float, default=0, help="fraction of requests answered with --failure-status")
+    parser.add_argument("--failure-status", type=int, default=503)
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def behaviour_from_args(args):
+    return UpstreamBehaviour(args.latency_ms, args.jitter_ms, args.failure_rate, args.failure_status, args.seed)
@@ -0,0 +1,146 @@
+# Local stand-in for the OpenAI chat-completions API with scripted tool calls.
+#
+# A user message of the form
+#   [script] get_available_slots {"date": "2025-03-03"}; list_events {"email": "a@b.c"}
+# makes the "model" request those tool calls: all at once when
+# parallel_tool_calls is enabled, otherwise one per round-trip. Once every
+# scripted call has a result it answers with plain text. Any other user
+# message gets an immediate text answer. Both regular and streaming
+# (stream=true) responses are supported; GET /_stats and POST /_reset
+# expose call counts. Latency and failure rates are configurable.
+#
+# Usage (from the backend directory):
+#   python standins/openai_server.py --port 8102 --latency-ms 400 --token-ms 15
+#   OPENAI_API_KEY=standin OPENAI_BASE_URL=http://127.0.0.1:8102/v1 uvicorn main:app
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from standins.common import UpstreamBehaviour, add_behaviour_arguments, behaviour_from_args
+
+SCRIPT_PREFIX = "[script]"
+
+
+def parse_script(content: str):
+    # "[script] name {json}; name {json}" -> [(name, arguments json), ...]
+    calls = []
+    for part in content[len(SCRIPT_PREFIX):].split(";"):
+        part = part.strip()
+        if not part:
+            continue
+        name, _, arguments = part.partition(" ")
+        calls.append((name, arguments.strip() or "{}"))
+    return calls
+
+
+def next_turn(messages: list, parallel: bool):
+    # Returns (tool calls to request, final text)
+    last_user = max((i for i, m in enumerate(messages) if m.get("role") == "user"), default=None)
+    if last_user is None:
+        return [], "Hello from the stand-in model."
+    content = messages[last_user].get("content") or ""
+    answered = sum(1 for m in messages[last_user:] if m.get("role") in ("tool", "function"))
+    if not content.startswith(SCRIPT_PREFIX):
+        return [], f"Stand-in reply to: {content[:80]}"
+    script = parse_script(content)
+    pending = script[answered:]
+    if not pending:
+        return [], f"Done. Used {len(script)} tool result(s)."
+    if not parallel:
+        pending = pending[:1]
+    return [
+        {"id": f"call_{answered + i}", "type": "function", "function": {"name": name, "arguments": arguments}}
+        for i, (name, arguments) in enumerate(pending)
+    ], None
+
+
+def create_app(behaviour: UpstreamBehaviour = None, token_ms: float = 0):
+    behaviour = behaviour or UpstreamBehaviour()
+    app = FastAPI()
+    requested = {"tool_calls": 0}
+
+    def envelope(obj: str, choice: dict, model: str):
+        return {"id": "chatcmpl-standin", "object": obj, "created": int(time.time()), "model": model, "choices": [choice]}
+
+    async def stream_events(tool_calls, text, model):
+        if tool_calls:
+            for i, call in enumerate(tool_calls):
+                delta = {"role": "assistant", "tool_calls": [{"index": i, **call}]}
+                yield f"data: {json.dumps(envelope('chat.completion.chunk', {'index': 0, 'delta': delta, 'finish_reason': None}, model))}\n\n"
+            finish = "tool_calls"
+        else:
+            for i, word in enumerate(text.split(" ")):
+                if token_ms:
+                    await asyncio.sleep(token_ms / 1000)
+                delta = {"content": word if i == 0 else f" {word}"}
+                if i == 0:
+                    delta["role"] = "assistant"
+                yield f"data: {json.dumps(envelope('chat.completion.chunk', {'index': 0, 'delta': delta, 'finish_reason': None}, model))}\n\n"
+            finish = "stop"
+        yield f"data: {json.dumps(envelope('chat.completion.chunk', {'index': 0, 'delta': {}, 'finish_reason': finish}, model))}\n\n"
+        yield "data: [DONE]\n\n"
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        await behaviour.delay()
+        if behaviour.should_fail():
+            behaviour.record("POST /v1/chat/completions", behaviour.failure_status)
+            return JSONResponse(
+                {"error": {"message": "Injected failure", "type": "server_error"}},
+                status_code=behaviour.failure_status,
+                headers={"Retry-After": "1"},
+            )
+        behaviour.record("POST /v1/chat/completions", 200)
+
+        model = body.get("model", "standin")
+        tool_calls, text = next_turn(body.get("messages", []), body.get("parallel_tool_calls", True) is not False)
+        requested["tool_calls"] += len(tool_calls)
+
+        if body.get("stream"):
+            return StreamingResponse(stream_events(tool_calls, text, model), media_type="text/event-stream")
+
+        message = {"role": "assistant", "content": text}
+        if tool_calls:
+            message["tool_calls"] = tool_calls
+        choice = {"index": 0, "message": message, "finish_reason": "tool_calls" if tool_calls else "stop"}
+        prompt_tokens = len(json.dumps(body.get("messages", []))) // 4
+        return {
+            **envelope("chat.completion", choice, model),
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": 10, "total_tokens": prompt_tokens + 10},
+        }
+
+    @app.get("/_stats")
+    async def stats():
+        return {**behaviour.stats(), "tool_calls_requested": requested["tool_calls"]}
+
+    @app.post("/_reset")
+    async def reset():
+        behaviour.reset()
+        requested["tool_calls"] = 0
+        return {"status": "ok"}
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8102)
+    parser.add_argument("--token-ms", type=float, default=0, help="delay between streamed tokens")
+    add_behaviour_arguments(parser, default_latency_ms=400)
+    args = parser.parse_args()
+    uvicorn.run(create_app(behaviour_from_args(args), args.token_ms), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
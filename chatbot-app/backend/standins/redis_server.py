@@ -0,0 +1,276 @@
+# Local stand-in for a Redis server, for development and tests without Redis.
+#
+# Speaks RESP2 and implements the subset of commands the state backend uses
+# (strings with expiry, counters, hashes, sorted sets, MULTI/EXEC, WATCH).
+# Commands run one at a time on a single event loop, so INCR and MULTI/EXEC
+# are atomic exactly as they are on a real server. Data is kept in memory only.
+#
+# Usage (from the backend directory):
+#   python standins/redis_server.py --port 6390
+#   STATE_BACKEND=redis://127.0.0.1:6390/0 uvicorn main:app --workers 4
+
+import argparse
+import asyncio
+import copy
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from redis_client import read_reply
+
+
+class CommandError(Exception):
+    pass
+
+
+def encode(value):
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, bool):
+        value = int(value)
+    if isinstance(value, int):
+        return f":{value}\r\n".encode()
+    if isinstance(value, CommandError):
+        return f"-ERR {value}\r\n".encode()
+    if isinstance(value, list):
+        return f"*{len(value)}\r\n".encode() + b"".join(encode(item) for item in value)
+    if isinstance(value, SimpleString):
+        return f"+{value}\r\n".encode()
+    data = str(value).encode()
+    return f"${len(data)}\r\n".encode() + data + b"\r\n"
+
+
+class SimpleString(str):
+    pass
+
+
+OK = SimpleString("OK")
+QUEUED = SimpleString("QUEUED")
+
+
+class Store:
+    def __init__(self):
+        self.data = {}
+        self.expires = {}
+
+    def _live(self, key):
+        expires_at = self.expires.get(key)
+        if expires_at is not None and expires_at <= time.time():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return self.data.get(key)
+
+    def _typed(self, key, kind, create=False):
+        value = self._live(key)
+        if value is None:
+            if not create:
+                return None
+            value = kind()
+            self.data[key] = value
+        elif not isinstance(value, kind):
+            raise CommandError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return value
+
+    def execute(self, name, args):
+        handler = getattr(self, f"cmd_{name.lower()}", None)
+        if handler is None:
+            raise CommandError(f"unknown command '{name}'")
+        return handler(*args)
+
+    def cmd_ping(self, *args):
+        return args[0] if args else SimpleString("PONG")
+
+    def cmd_auth(self, *args):
+        return OK
+
+    def cmd_select(self, db):
+        return OK
+
+    def cmd_flushdb(self):
+        self.data.clear()
+        self.expires.clear()
+        return OK
+
+    def cmd_get(self, key):
+        return self._typed(key, str)
+
+    def cmd_set(self, key, value, *options):
+        options = [option.upper() for option in options]
+        ttl = None
+        if "PX" in options:
+            ttl = int(options[options.index("PX") + 1]) / 1000
+        elif "EX" in options:
+            ttl = int(options[options.index("EX") + 1])
+        if "NX" in options and self._live(key) is not None:
+            return None
+        self.data[key] = value
+        self.expires.pop(key, None)
+        if ttl is not None:
+            self.expires[key] = time.time() + ttl
+        return OK
+
+    def cmd_del(self, *keys):
+        removed = 0
+        for key in keys:
+            if self._live(key) is not None:
+                del self.data[key]
+                self.expires.pop(key, None)
+                removed += 1
+        return removed
+
+    def cmd_exists(self, *keys):
+        return sum(1 for key in keys if self._live(key) is not None)
+
+    def cmd_pexpire(self, key, milliseconds):
+        if self._live(key) is None:
+            return 0
+        self.expires[key] = time.time() + int(milliseconds) / 1000
+        return 1
+
+    def cmd_incrby(self, key, amount):
+        value = int(self._typed(key, str) or 0) + int(amount)
+        self.data[key] = str(value)
+        return value
+
+    def cmd_incr(self, key):
+        return self.cmd_incrby(key, 1)
+
+    def cmd_decr(self, key):
+        return self.cmd_incrby(key, -1)
+
+    def cmd_hset(self, key, *pairs):
+        values = self._typed(key, dict, create=True)
+        added = 0
+        for field, value in zip(pairs[::2], pairs[1::2]):
+            added += field not in values
+            values[field] = value
+        return added
+
+    def cmd_hget(self, key, field):
+        return (self._typed(key, dict) or {}).get(field)
+
+    def cmd_hgetall(self, key):
+        values = self._typed(key, dict) or {}
+        return [item for pair in values.items() for item in pair]
+
+    def cmd_hdel(self, key, *fields):
+        values = self._typed(key, dict) or {}
+        return sum(1 for field in fields if values.pop(field, None) is not None)
+
+    def cmd_zadd(self, key, *pairs):
+        members = self._typed(key, ZSet, create=True)
+        added = 0
+        for score, member in zip(pairs[::2], pairs[1::2]):
+            added += member not in members
+            members[member] = float(score)
+        return added
+
+    def cmd_zrem(self, key, *members):
+        values = self._typed(key, ZSet) or ZSet()
+        removed = sum(1 for member in members if values.pop(member, None) is not None)
+        if key in self.data and not values:
+            del self.data[key]
+        return removed
+
+    def cmd_zcard(self, key):
+        return len(self._typed(key, ZSet) or ())
+
+    def cmd_zrange(self, key, start, stop):
+        ordered = sorted((self._typed(key, ZSet) or ZSet()).items(), key=lambda item: (item[1], item[0]))
+        start, stop = int(start), int(stop)
+        if stop < 0:
+            stop += len(ordered)
+        return [member for member, _ in ordered[start:stop + 1]]
+
+    def cmd_zrangebyscore(self, key, low, high):
+        low = float("-inf") if low == "-inf" else float(low)
+        high = float("inf") if high == "+inf" else float(high)
+        ordered = sorted((self._typed(key, ZSet) or ZSet()).items(), key=lambda item: (item[1], item[0]))
+        return [member for member, score in ordered if low <= score <= high]
+
+
+class ZSet(dict):
+    pass
+
+
+def snapshot(store, keys):
+    # WATCH compares values at EXEC time; enough for a stand-in, although a
+    # key changed and changed back is not detected as it would be by Redis
+    return {key: copy.deepcopy(store._live(key)) for key in keys}
+
+
+async def serve_client(store, reader, writer):
+    queued = None
+    watched = {}
+    try:
+        while True:
+            command = await read_reply(reader)
+            name, args = command[0].upper(), command[1:]
+            if name == "WATCH" and queued is None:
+                watched.update(snapshot(store, args))
+                reply = OK
+            elif name == "UNWATCH":
+                watched = {}
+                reply = OK
+            elif name == "MULTI":
+                queued = []
+                reply = OK
+            elif name == "DISCARD":
+                queued = None
+                watched = {}
+                reply = OK
+            elif name == "EXEC":
+                if queued is None:
+                    reply = CommandError("EXEC without MULTI")
+                elif watched and snapshot(store, watched) != watched:
+                    # A watched key changed: abort with a nil reply
+                    reply = None
+                    queued = None
+                    watched = {}
+                else:
+                    # No await between commands, so the transaction is atomic
+                    reply = []
+                    for queued_name, queued_args in queued:
+                        try:
+                            reply.append(store.execute(queued_name, queued_args))
+                        except (CommandError, TypeError, ValueError) as e:
+                            reply.append(CommandError(str(e)))
+                    queued = None
+                    watched = {}
+            elif queued is not None:
+                queued.append((name, args))
+                reply = QUEUED
+            else:
+                try:
+                    reply = store.execute(name, args)
+                except (CommandError, TypeError, ValueError) as e:
+                    reply = CommandError(str(e))
+            writer.write(encode(reply))
+            await writer.drain()
+    except (ConnectionError, asyncio.IncompleteReadError):
+        pass
+    finally:
+        writer.close()
+
+
+async def start_server(host: str = "127.0.0.1", port: int = 6379):
+    store = Store()
+    return await asyncio.start_server(lambda r, w: serve_client(store, r, w), host, port)
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6379)
+    args = parser.parse_args()
+
+    server = await start_server(args.host, args.port)
+    print(f"Redis stand-in listening on {args.host}:{args.port}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,132 @@
+import time
+
+from booking_index import MemoryBookingStore, RedisBookingStore, SQLiteBookingStore
+from mock_store import MemoryEventStore, SQLiteEventStore, RedisEventStore
+from outbox import MemoryOutboxStore, RedisOutboxStore, SQLiteOutboxStore
+from redis_client import RedisClient
+from sqlite_db import on_db_thread
+
+
+class MemoryStateBackend:
+    """Process-local state. Fast, but only correct with a single worker.
+
+    The slot cache and sessions use their own in-process stores
+    (SlotCache, SessionStore), so there is no key/value API here.
+    """
+
+    shared = False
+
+    def __init__(self):
+        self.events = MemoryEventStore()
+        self.outbox = MemoryOutboxStore()
+        self.bookings = MemoryBookingStore()
+
+    async def close(self):
+        pass
+
+
+class SQLiteStateBackend:
+    """State in one SQLite file (WAL mode), shared by every worker on a host.
+
+    Key/value entries (the shared slot cache and sessions) carry an expiry
+    timestamp and are purged lazily.
+    """
+
+    shared = True
+
+    def __init__(self, path: str):
+        self.events = SQLiteEventStore(path)
+        self.db = self.events.db
+        self.outbox = SQLiteOutboxStore(self.db)
+        self.bookings = SQLiteBookingStore(self.db)
+        self.db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS state_values (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL
+            );
+            """
+        )
+
+    @on_db_thread
+    def get(self, key: str):
+        row = self.db.execute("SELECT value, expires_at FROM state_values WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        if row["expires_at"] is not None and row["expires_at"] <= time.time():
+            with self.db:
+                self.db.execute("DELETE FROM state_values WHERE key = ? AND expires_at <= ?", (key, time.time()))
+            return None
+        return row["value"]
+
+    @on_db_thread
+    def set(self, key: str, value: str, ttl: float = None):
+        with self.db:
+            self.db.execute(
+                "INSERT INTO state_values (key, value, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at",
+                (key, value, time.time() + ttl if ttl else None)
+            )
+
+    @on_db_thread
+    def set_many(self, values: dict, ttl: float = None):
+        # One write transaction for all of them
+        expires_at = time.time() + ttl if ttl else None
+        with self.db:
+            self.db.executemany(
+                "INSERT INTO state_values (key, value, expires_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at",
+                [(key, value, expires_at) for key, value in values.items()]
+            )
+
+    @on_db_thread
+    def delete(self, key: str):
+        with self.db:
+            self.db.execute("DELETE FROM state_values WHERE key = ?", (key,))
+
+    async def close(self):
+        self.events.close()
+
+
+class RedisStateBackend:
+    """State on a Redis-protocol server, shared by every worker and node."""
+
+    shared = True
+
+    def __init__(self, url: str, prefix: str = "livex:"):
+        self.redis = RedisClient(url)
+        self.prefix = prefix
+        self.events = RedisEventStore(self.redis, prefix=f"{prefix}mock:")
+        self.outbox = RedisOutboxStore(self.redis, prefix=f"{prefix}outbox:")
+        self.bookings = RedisBookingStore(self.redis, prefix=f"{prefix}bookings:")
+
+    async def get(self, key: str):
+        return await self.redis.execute("GET", f"{self.prefix}{key}")
+
+    async def set(self, key: str, value: str, ttl: float = None):
+        if ttl:
+            await self.redis.execute("SET", f"{self.prefix}{key}", value, "PX", int(ttl * 1000))
+        else:
+            await self.redis.execute("SET", f"{self.prefix}{key}", value)
+
+    async def set_many(self, values: dict, ttl: float = None):
+        expiry = ("PX", int(ttl * 1000)) if ttl else ()
+        await self.redis.pipeline([("SET", f"{self.prefix}{key}", value, *expiry) for key, value in values.items()])
+
+    async def delete(self, key: str):
+        await self.redis.execute("DEL", f"{self.prefix}{key}")
+
+    async def close(self):
+        await self.redis.close()
+
+
+def create_state_backend(url: str = None):
+    # "memory" (default), "sqlite:///path/to/state.db" or "redis://host:port/db"
+    if not url or url == "memory":
+        return MemoryStateBackend()
+    if url.startswith("sqlite:///"):
+        return SQLiteStateBackend(url[len("sqlite:///"):])
+    if url.startswith("redis://"):
+        return RedisStateBackend(url)
+    raise ValueError(f"Unsupported STATE_BACKEND: {url}")
@@ -0,0 +1,73 @@
+# Admission control: per-email token buckets, and OpenAI slot waits, which
+# must reach the metrics and not only /health/admission.
+#
+# Usage (from the backend directory):
+#   python -m pytest -q tests
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from admission import AdmissionRejected, ConcurrencyLimiter, TokenBucketLimiter
+from metrics import Histogram
+
+
+def test_each_admitted_wait_is_reported():
+    waits = Histogram("slot_wait_seconds", "test")
+
+    async def scenario():
+        limiter = ConcurrencyLimiter(max_concurrent=1, max_queue=4, queue_timeout=5, on_wait=waits.observe)
+
+        async def hold():
+            async with limiter.slot():
+                await asyncio.sleep(0.05)
+
+        await asyncio.gather(hold(), hold())
+
+    asyncio.run(scenario())
+    counts, total, count = waits.series[()]
+    assert count == 2
+    # The second caller waited for the first to finish
+    assert total >= 0.04
+
+
+def test_timed_out_wait_is_rejected_and_not_reported():
+    waits = []
+
+    async def scenario():
+        limiter = ConcurrencyLimiter(max_concurrent=1, max_queue=4, queue_timeout=0.01, on_wait=waits.append)
+        async with limiter.slot():
+            async with limiter.slot():
+                pass
+
+    with pytest.raises(AdmissionRejected):
+        asyncio.run(scenario())
+    assert len(waits) == 1
+
+
+def test_token_bucket_allows_a_burst_then_refills():
+    now = [0.0]
+    limiter = TokenBucketLimiter(rate=1, burst=2, clock=lambda: now[0])
+    limiter.acquire("a@example.com")
+    limiter.acquire("a@example.com")
+    with pytest.raises(AdmissionRejected) as rejected:
+        limiter.acquire("a@example.com")
+    assert rejected.value.retry_after_header() == "1"
+    # Other emails have their own bucket
+    limiter.acquire("b@example.com")
+    now[0] = 1.0
+    limiter.acquire("a@example.com")
+    assert limiter.stats() == {"keys": 2, "allowed": 4, "rejected": 1}
+
+
+def test_token_bucket_forgets_least_recent_keys():
+    limiter = TokenBucketLimiter(rate=1, burst=1, max_keys=2, clock=lambda: 0.0)
+    for email in ("a", "b", "c"):
+        limiter.acquire(email)
+    # "a" was evicted, so it starts again with a full bucket
+    limiter.acquire("a")
+    assert list(limiter.buckets) == ["c", "a"]
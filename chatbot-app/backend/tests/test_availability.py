@@ -0,0 +1,29 @@
+# Free windows must lie inside the free slots they were found in.
+#
+# Usage (from the backend directory):
+#   python -m pytest -q tests
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from availability import find_free_windows, slot_intervals
+
+DAY = "2025-03-03"
+
+
+def slot(start: str, end: str = None):
+    return {"start": f"{DAY}T{start}:00Z", "end": f"{DAY}T{end or start}:00Z"}
+
+
+def test_slot_ends_are_kept():
+    assert slot_intervals([slot("09:00", "09:30"), slot("10:30", "11:00")]) == [(DAY, 540, 570), (DAY, 630, 660)]
+
+
+def test_slots_without_end_times_last_the_slot_length():
+    # Free starts every 90 minutes are 30-minute slots, not 90-minute ones
+    slots = [slot("09:00"), slot("10:30"), slot("12:00")]
+    assert slot_intervals(slots) == [(DAY, 540, 570), (DAY, 630, 660), (DAY, 720, 750)]
+    assert find_free_windows([DAY], slot_intervals(slots), [], 60) == []
+    assert slot_intervals(slots, slot_minutes=60)[0] == (DAY, 540, 600)
@@ -0,0 +1,93 @@
+# Concurrent mock bookings of one slot must produce exactly one booking, on
+# every state backend (including two SQLite connections, as two workers).
+#
+# Usage (from the backend directory):
+#   python -m pytest -q tests
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from day_bitmap import BookingConflictError
+from mock_store import SQLiteEventStore
+from standins.redis_server import start_server
+from state_backend import create_state_backend
+
+DAY = "2025-03-03"
+
+
+async def book_concurrently(stores, count=20, start="10:00", end="11:00"):
+    # `count` bookings of the same time, spread over `stores`; returns (booked, conflicts)
+    results = await asyncio.gather(
+        *(stores[i % len(stores)].create(f"user{i}@example.com", "Sync", f"{DAY}T{start}:00Z", f"{DAY}T{end}:00Z")
+          for i in range(count)),
+        return_exceptions=True
+    )
+    unexpected = [r for r in results if isinstance(r, Exception) and not isinstance(r, BookingConflictError)]
+    assert not unexpected
+    return [r for r in results if isinstance(r, dict)], sum(isinstance(r, BookingConflictError) for r in results)
+
+
+def run_on_backend(kind, tmp_path, scenario):
+    # Runs scenario(stores) against one backend's event store(s)
+    async def run():
+        if kind == "memory":
+            return await scenario([create_state_backend("memory").events])
+        if kind == "sqlite":
+            path = str(tmp_path / "state.db")
+            workers = [create_state_backend(f"sqlite:///{path}"), SQLiteEventStore(path)]
+            try:
+                return await scenario([workers[0].events, workers[1]])
+            finally:
+                await workers[0].close()
+                workers[1].close()
+        server = await start_server(port=0)
+        backend = create_state_backend(f"redis://127.0.0.1:{server.sockets[0].getsockname()[1]}/0")
+        try:
+            return await scenario([backend.events])
+        finally:
+            await backend.close()
+            server.close()
+            await server.wait_closed()
+
+    return asyncio.run(run())
+
+
+@pytest.mark.parametrize("kind", ["memory", "sqlite", "redis"])
+def test_one_of_twenty_concurrent_bookings_wins(kind, tmp_path):
+    async def scenario(stores):
+        booked, conflicts = await book_concurrently(stores)
+        return booked, conflicts, await stores[0].list_by_day(DAY)
+
+    booked, conflicts, on_day = run_on_backend(kind, tmp_path, scenario)
+    assert len(booked) == 1 and conflicts == 19
+    assert [event["id"] for event in on_day] == [booked[0]["id"]]
+
+
+@pytest.mark.parametrize("kind", ["memory", "sqlite", "redis"])
+def test_overlapping_bookings_conflict_and_adjacent_ones_do_not(kind, tmp_path):
+    async def scenario(stores):
+        store = stores[0]
+        await store.create("a@example.com", "Sync", f"{DAY}T10:00:00Z", f"{DAY}T11:00:00Z")
+        with pytest.raises(BookingConflictError):
+            await store.create("b@example.com", "Sync", f"{DAY}T10:30:00Z", f"{DAY}T11:30:00Z")
+        await store.create("c@example.com", "Sync", f"{DAY}T11:00:00Z", f"{DAY}T12:00:00Z")
+        return sorted(event["email"] for event in await store.list_by_day(DAY))
+
+    assert run_on_backend(kind, tmp_path, scenario) == ["a@example.com", "c@example.com"]
+
+
+@pytest.mark.parametrize("kind", ["memory", "sqlite", "redis"])
+def test_cancelled_slot_can_be_booked_again(kind, tmp_path):
+    async def scenario(stores):
+        store = stores[0]
+        first = await store.create("a@example.com", "Sync", f"{DAY}T10:00:00Z", f"{DAY}T11:00:00Z")
+        assert await store.delete(first["id"])
+        booked, conflicts = await book_concurrently(stores, count=5)
+        return len(booked), conflicts
+
+    assert run_on_backend(kind, tmp_path, scenario) == (1, 4)
@@ -0,0 +1,64 @@
+# Coalesced Cal.com reads must not share one caller's request deadline.
+#
+# Usage (from the backend directory):
+#   python -m pytest -q tests
+
+import asyncio
+import os
+import sys
+
+import httpx
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from calcom_client import CalcomClient
+from circuit_breaker import CircuitBreaker
+from deadline import DeadlineExceeded, request_deadline
+from metrics import CALCOM_COALESCED_READS, registry
+
+
+async def slow_slots(request):
+    await asyncio.sleep(0.5)
+    return httpx.Response(200, json={"slots": []})
+
+
+async def get_slots(client, deadline: float):
+    with request_deadline(deadline):
+        return await client.get("/slots", params={"startTime": "2025-03-03T00:00:00Z"})
+
+
+def test_waiter_keeps_its_own_deadline_when_joining_a_shorter_one():
+    async def scenario():
+        breaker = CircuitBreaker("calcom")
+        client = CalcomClient("test", base_url="http://calcom.test", transport=httpx.MockTransport(slow_slots),
+                              breaker=breaker)
+        try:
+            short = asyncio.create_task(get_slots(client, 0.2))
+            await asyncio.sleep(0)
+            long = asyncio.create_task(get_slots(client, 30))
+            results = await asyncio.gather(short, long, return_exceptions=True)
+        finally:
+            await client.aclose()
+        return results, client.single_flight.stats(), breaker.snapshot()
+
+    coalesced_before = CALCOM_COALESCED_READS.values[()]
+    (short, long), single_flight, breaker = asyncio.run(scenario())
+    assert isinstance(short, DeadlineExceeded)
+    assert long.status_code == 200
+    assert single_flight["calls"] == 1 and single_flight["collapsed"] == 1
+    assert breaker["consecutive_failures"] == 0
+    assert CALCOM_COALESCED_READS.values[()] == coalesced_before + 1
+    assert "livex_calcom_coalesced_reads_total " in registry.render()
+
+
+def test_lone_caller_is_still_bounded_by_its_deadline():
+    async def scenario():
+        client = CalcomClient("test", base_url="http://calcom.test", transport=httpx.MockTransport(slow_slots))
+        try:
+            await get_slots(client, 0.1)
+        finally:
+            await client.aclose()
+
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(scenario())
@@ -0,0 +1,103 @@
+# Circuit breaker state changes: closed -> open -> half-open -> closed/open.
+#
+# Usage (from the backend directory):
+#   python -m pytest -q tests
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def breaker(clock, **options):
+    return CircuitBreaker("calcom", failure_threshold=3, recovery_time=30, clock=clock, **options)
+
+
+def fail(circuit, times=1):
+    for _ in range(times):
+        circuit.before_request()
+        circuit.record_failure()
+
+
+def test_opens_after_consecutive_failures_and_fails_fast():
+    circuit = breaker(Clock())
+    fail(circuit, 2)
+    assert circuit.state == CLOSED
+    fail(circuit)
+    assert circuit.state == OPEN
+    with pytest.raises(CircuitOpenError):
+        circuit.before_request()
+    assert circuit.rejected == 1
+
+
+def test_a_success_resets_the_consecutive_failures():
+    circuit = breaker(Clock())
+    fail(circuit, 2)
+    circuit.before_request()
+    circuit.record_success()
+    fail(circuit, 2)
+    assert circuit.state == CLOSED
+
+
+def test_opens_on_error_rate_once_enough_requests_were_seen():
+    circuit = breaker(Clock(), error_rate_threshold=0.5, min_requests=10)
+    for _ in range(5):
+        circuit.before_request()
+        circuit.record_success()
+        fail(circuit)
+    assert circuit.state == OPEN
+    assert "error rate" in circuit.transitions[-1]["reason"]
+
+
+def test_successful_probe_closes_the_circuit():
+    clock = Clock()
+    circuit = breaker(clock)
+    fail(circuit, 3)
+    clock.now = 30
+    circuit.before_request()
+    assert circuit.state == HALF_OPEN
+    # Only one probe at a time
+    with pytest.raises(CircuitOpenError):
+        circuit.before_request()
+    circuit.record_success()
+    assert circuit.state == CLOSED
+    assert circuit.consecutive_failures == 0
+    assert [t["to"] for t in circuit.transitions] == [OPEN, HALF_OPEN, CLOSED]
+
+
+def test_failed_probe_reopens_for_another_recovery_time():
+    clock = Clock()
+    circuit = breaker(clock)
+    fail(circuit, 3)
+    clock.now = 30
+    fail(circuit)
+    assert circuit.state == OPEN
+    clock.now = 59
+    with pytest.raises(CircuitOpenError):
+        circuit.before_request()
+    clock.now = 60
+    circuit.before_request()
+    assert circuit.state == HALF_OPEN
+
+
+def test_cancelled_probe_frees_its_slot():
+    clock = Clock()
+    circuit = breaker(clock)
+    fail(circuit, 3)
+    clock.now = 30
+    circuit.before_request()
+    circuit.record_cancelled()
+    circuit.before_request()
+    assert circuit.state == HALF_OPEN
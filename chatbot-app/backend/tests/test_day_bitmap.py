@@ -0,0 +1,54 @@
+# Busy-time bitmap cells: 15-minute cells, rounded outwards, 96 per day.
+#
+# Usage (from the backend directory):
+#   python -m pytest -q tests
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from day_bitmap import CELLS_PER_DAY, booking_mask, free_starts, from_bytes, is_free, span_mask, to_bytes
+
+
+def cells(mask: int):
+    return [cell for cell in range(CELLS_PER_DAY) if mask >> cell & 1]
+
+
+def test_span_covers_the_cells_it_touches():
+    assert cells(span_mask(600, 660)) == [40, 41, 42, 43]
+    # Partial cells at either end are busy too
+    assert cells(span_mask(605, 650)) == [40, 41, 42, 43]
+    assert span_mask(600, 600) == 0
+
+
+def test_span_is_clamped_to_the_day():
+    assert cells(span_mask(-30, 15)) == [0]
+    assert cells(span_mask(1425, 1500)) == [95]
+
+
+def test_booking_mask_runs_to_midnight_when_it_ends_the_next_day():
+    assert cells(booking_mask("2025-03-03T23:30:00Z", "2025-03-04T00:30:00Z")) == [94, 95]
+    assert booking_mask("2025-03-03T10:00:00Z", "2025-03-03T11:00:00Z") == span_mask(600, 660)
+
+
+def test_adjacent_bookings_do_not_overlap():
+    busy = span_mask(600, 660)
+    assert is_free(busy, span_mask(660, 720))
+    assert is_free(busy, span_mask(540, 600))
+    assert not is_free(busy, span_mask(645, 705))
+
+
+def test_free_starts_skip_busy_cells():
+    busy = span_mask(600, 660)
+    starts = free_starts(busy, duration=60)
+    assert 540 in starts and 660 in starts
+    assert not {570, 600, 630} & set(starts)
+    assert starts[-1] == 16 * 60
+
+
+def test_bytes_round_trip():
+    busy = span_mask(0, 15) | span_mask(1425, 1440) | span_mask(600, 660)
+    assert len(to_bytes(busy)) == CELLS_PER_DAY // 8
+    assert from_bytes(to_bytes(busy)) == busy
+    assert from_bytes(b"") == 0
@@ -0,0 +1,115 @@
+# Regression tests for outbox deduplication: a write that was already sent
+# must not absorb a later, identical write from another chat turn.
+#
+# Usage (from the backend directory):
+#   python -m pytest -q tests
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from outbox import Outbox, current_turn, request_key
+from state_backend import create_state_backend
+
+BOOKING = {"email": "a@example.com", "title": "Sync", "start": "2025-03-03T10:00:00Z", "end": "2025-03-03T11:00:00Z"}
+CANCEL = {"event_id": "uid-1", "booking_id": "uid-1"}
+
+
+def reschedule(hour: int):
+    return {"event_id": "uid-1", "booking_id": "uid-1",
+            "start": f"2025-03-03T{hour}:00:00Z", "end": f"2025-03-03T{hour + 1}:00:00Z"}
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    url = "memory" if request.param == "memory" else f"sqlite:///{tmp_path / 'state.db'}"
+    return create_state_backend(url).outbox
+
+
+def deliver(store, writes, drain=True):
+    # Submits each (turn id or None, op, payload), draining the outbox after
+    # each one; returns whether each was a duplicate and what reached Cal.com
+    async def scenario():
+        sent = []
+
+        async def send(entry):
+            sent.append((entry["op"], entry["payload"], request_key(entry)))
+            return {"id": "uid-1"}
+
+        outbox = Outbox(store, send)
+        duplicates = []
+        for turn, op, payload in writes:
+            token = current_turn.set(turn)
+            try:
+                _, duplicate = await outbox.submit(op, "a@example.com", payload)
+            finally:
+                current_turn.reset(token)
+            duplicates.append(duplicate)
+            if drain:
+                await outbox.drain()
+        await outbox.drain()
+        return duplicates, sent
+
+    return asyncio.run(scenario())
+
+
+def test_reschedule_back_to_an_earlier_time_is_sent(store):
+    duplicates, sent = deliver(store, [
+        ("t1", "reschedule", reschedule(10)),
+        ("t2", "reschedule", reschedule(11)),
+        ("t3", "reschedule", reschedule(10)),
+    ])
+    assert duplicates == [False, False, False]
+    assert [payload["start"][11:16] for _, payload, _ in sent] == ["10:00", "11:00", "10:00"]
+
+
+def test_booking_a_cancelled_slot_again_is_a_new_booking(store):
+    duplicates, sent = deliver(store, [
+        ("t1", "book", BOOKING),
+        ("t2", "cancel", CANCEL),
+        ("t3", "book", BOOKING),
+    ])
+    assert duplicates == [False, False, False]
+    assert [op for op, _, _ in sent] == ["book", "cancel", "book"]
+    # Cal.com answers a reused Idempotency-Key with the first (cancelled) booking
+    assert sent[0][2] != sent[2][2]
+
+
+def test_sent_writes_outside_a_turn_are_not_merged(store):
+    duplicates, sent = deliver(store, [(None, "reschedule", reschedule(10))] * 2)
+    assert duplicates == [False, False]
+    assert len({key for _, _, key in sent}) == 2
+
+
+def test_queued_write_absorbs_a_repeat(store):
+    duplicates, sent = deliver(store, [("t1", "book", BOOKING), ("t1", "book", BOOKING),
+                                       (None, "cancel", CANCEL), (None, "cancel", CANCEL)], drain=False)
+    assert duplicates == [False, True, False, True]
+    assert [op for op, _, _ in sent] == ["book", "cancel"]
+
+
+def test_repeat_in_the_same_turn_is_deduplicated_after_sending(store):
+    duplicates, sent = deliver(store, [("t1", "book", BOOKING), ("t1", "book", BOOKING)])
+    assert duplicates == [False, True]
+    assert len(sent) == 1
+
+
+def test_unsent_lists_writes_until_cal_com_answers(store):
+    async def scenario():
+        async def send(entry):
+            return {"id": "uid-1"}
+
+        outbox = Outbox(store, send)
+        await outbox.submit("book", "a@example.com", BOOKING)
+        await outbox.submit("cancel", None, CANCEL)
+        queued = [entry["op"] for entry in await outbox.unsent()]
+        await outbox.drain()
+        return queued, await outbox.unsent()
+
+    queued, after = asyncio.run(scenario())
+    assert queued == ["book", "cancel"]
+    assert after == []
@@ -0,0 +1,30 @@
+# Compact tool results must mean the same as the plain ones.
+#
+# Usage (from the backend directory):
+#   python -m pytest -q tests
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from tool_encoding import compact_slots
+
+
+def slot(start: str, end: str = None):
+    return {"start": f"2025-03-03T{start}:00Z", "end": f"2025-03-03T{end or start}:00Z", "available": True}
+
+
+def test_slots_without_end_times_are_not_stretched_over_busy_time():
+    encoded = compact_slots([slot("09:00"), slot("16:00")])
+    assert encoded == {"free": {"2025-03-03": ["09:00-09:30", "16:00-16:30"]}, "slot_minutes": 30}
+
+
+def test_adjacent_slots_are_merged():
+    encoded = compact_slots([slot("09:00", "09:30"), slot("09:30", "10:00"), slot("11:00", "11:30")])
+    assert encoded["free"] == {"2025-03-03": ["09:00-10:00", "11:00-11:30"]}
+
+
+def test_slot_length_is_configurable():
+    encoded = compact_slots([slot("09:00"), slot("10:00")], slot_minutes=60)
+    assert encoded == {"free": {"2025-03-03": ["09:00-11:00"]}, "slot_minutes": 60}
@@ -0,0 +1,25 @@
+# Helpers for the ISO timestamps slots and bookings use
+# ("2025-03-03T09:30:00Z"): the day is the date prefix, and the time of day
+# is read straight from the string without parsing a datetime.
+
+from datetime import datetime, timedelta
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def minute_of_day(timestamp: str):
+    # "2025-03-03T09:30:00Z" -> 570; times past midnight ("24:30") are clamped
+    return min(MINUTES_PER_DAY, int(timestamp[11:13]) * 60 + int(timestamp[14:16]))
+
+
+def clock(total_minutes: int):
+    # 570 -> "09:30"; the end of the day is "24:00"
+    if total_minutes >= MINUTES_PER_DAY:
+        return "24:00"
+    return f"{total_minutes // 60:02d}:{total_minutes % 60:02d}"
+
+
+def add_minutes(timestamp: str, minutes: int):
+    # "2025-03-03T23:45:00Z" + 30 -> "2025-03-04T00:15:00Z", keeping the UTC offset
+    moved = datetime.fromisoformat(timestamp.replace("Z", "+00:00")) + timedelta(minutes=minutes)
+    return moved.isoformat().replace("+00:00", "Z")
@@ -0,0 +1,88 @@
+from json_codec import dumps
+from timestamps import MINUTES_PER_DAY, clock, minute_of_day
+
+# Booking statuses that go without saying; anything else is kept
+DEFAULT_STATUSES = {"confirmed", "accepted"}
+
+
+def compact_slots(slots: list, slot_minutes: int = 30):
+    """Collapses available slots into free ranges per day.
+
+    16 half-hour slot dicts for a day become {"2025-03-03": ["09:00-17:00"]}.
+    Only touching or overlapping slots are merged. A slot without an end
+    time (start == end) lasts `slot_minutes`; its length is never guessed
+    from the gaps between free slots, which would report busy time as free.
+    """
+    starts_by_day = {}
+    for slot in slots:
+        if slot.get("available") is False or not slot.get("start"):
+            continue
+        day = slot["start"][:10]
+        start = minute_of_day(slot["start"])
+        end = slot.get("end") or ""
+        if end[:10] == day:
+            end = minute_of_day(end)
+        else:
+            # Ends at midnight or later; without an end it is `slot_minutes` long
+            end = MINUTES_PER_DAY if end > slot["start"] else start
+        starts_by_day.setdefault(day, []).append((start, end))
+
+    free = {}
+    lengths = set()
+    for day, spans in sorted(starts_by_day.items()):
+        spans.sort()
+        ranges = []
+        for start, end in spans:
+            if end <= start:
+                end = min(MINUTES_PER_DAY, start + slot_minutes)
+            lengths.add(end - start)
+            if ranges and start <= ranges[-1][1]:
+                ranges[-1][1] = max(ranges[-1][1], end)
+            else:
+                ranges.append([start, end])
+        free[day] = [f"{clock(start)}-{clock(end)}" for start, end in ranges]
+
+    encoded = {"free": free}
+    if len(lengths) == 1:
+        encoded["slot_minutes"] = lengths.pop()
+    return encoded
+
+
+def compact_booking(booking: dict):
+    # Drops the attendee email (always the current user) and default statuses
+    encoded = {"id": booking.get("id"), "title": booking.get("title")}
+    start, end = booking.get("start") or "", booking.get("end") or ""
+    if start:
+        when = f"{start[:10]} {start[11:16]}"
+        if end:
+            when += f"-{end[11:16]}" if end[:10] == start[:10] else f" - {end[:10]} {end[11:16]}"
+        encoded["when"] = when
+    if booking.get("status") and booking["status"] not in DEFAULT_STATUSES:
+        encoded["status"] = booking["status"]
+    return encoded
+
+
+def encode_tool_result(result, max_items: int = 20):
+    """Token-efficient JSON for a tool result sent back to the model.
+
+    Tool results are re-sent on every later round-trip of a conversation, so
+    slot lists are collapsed into ranges, constant booking fields are dropped,
+    long lists are capped with a count of what was left out, and the JSON has
+    no whitespace.
+    """
+    if isinstance(result, dict):
+        encoded = dict(result)
+        if isinstance(result.get("slots"), list):
+            del encoded["slots"]
+            encoded.update(compact_slots(result["slots"]))
+        if isinstance(result.get("bookings"), list):
+            bookings = result["bookings"]
+            encoded["bookings"] = [compact_booking(b) for b in bookings[:max_items]]
+            if len(bookings) > max_items:
+                encoded["more"] = f"{len(bookings) - max_items} more not shown"
+        if isinstance(result.get("windows"), list):
+            encoded["windows"] = [f"{w['date']} {w['start']}-{w['end']}" for w in result["windows"]]
+        if isinstance(result.get("booking"), dict):
+            encoded["booking"] = compact_booking(result["booking"])
+        result = encoded
+    return dumps(result)
@@ -0,0 +1,93 @@
+# Tools the model can call, declared once on the functions themselves.
+#
+# @registry.tool(description, param=description, ...) reads the function's
+# signature and type hints at import time and builds both the OpenAI
+# function schema and a pydantic model for its arguments. A call then
+# parses and validates the model's JSON argument string in one pass
+# (pydantic-core, no intermediate dict) and invokes the function with
+# typed keyword arguments.
+
+import inspect
+import typing
+
+from pydantic import ValidationError, create_model
+
+JSON_SCHEMA_TYPES = {str: "string", int: "integer", float: "number", bool: "boolean"}
+
+
+class ToolArgumentError(ValueError):
+    """Raised when the model's arguments for a tool do not match its signature."""
+
+
+def describe_errors(error: ValidationError):
+    # "date: Field required; duration_minutes: Input should be a valid integer"
+    return "; ".join(
+        f"{'.'.join(str(part) for part in item['loc']) or 'arguments'}: {item['msg']}"
+        for item in error.errors(include_url=False)
+    )
+
+
+class Tool:
+    def __init__(self, function, description: str, parameters: dict):
+        self.function = function
+        self.name = function.__name__
+        signature = inspect.signature(function)
+        hints = typing.get_type_hints(function)
+
+        properties = {}
+        required = []
+        fields = {}
+        for name, parameter in signature.parameters.items():
+            if name not in parameters:
+                raise TypeError(f"Tool {self.name}: parameter '{name}' has no description")
+            annotation = hints.get(name, str)
+            properties[name] = {"type": JSON_SCHEMA_TYPES[annotation], "description": parameters[name]}
+            if parameter.default is inspect.Parameter.empty:
+                required.append(name)
+                fields[name] = (annotation, ...)
+            elif parameter.default is None:
+                fields[name] = (typing.Optional[annotation], None)
+            else:
+                fields[name] = (annotation, parameter.default)
+
+        self.schema = {
+            "name": self.name,
+            "description": description,
+            "parameters": {"type": "object", "properties": properties, "required": required},
+        }
+        # Validates (and coerces, e.g. "60" -> 60) the arguments; unknown keys are ignored
+        self.arguments = create_model(f"{self.name}_arguments", **fields)
+
+    def parse(self, arguments):
+        # `arguments` is the JSON object string from the model's tool call
+        try:
+            return self.arguments.model_validate_json(arguments or "{}")
+        except ValidationError as e:
+            raise ToolArgumentError(describe_errors(e)) from None
+
+    async def call(self, arguments):
+        # A validated model's __dict__ holds exactly its declared fields
+        return await self.function(**self.parse(arguments).__dict__)
+
+
+class ToolRegistry:
+    def __init__(self):
+        self.tools = {}
+
+    def tool(self, description: str, **parameters):
+        """Registers an async function as a tool; keyword arguments describe its parameters."""
+        def register(function):
+            tool = Tool(function, description, parameters)
+            self.tools[tool.name] = tool
+            return function
+        return register
+
+    def __contains__(self, name):
+        return name in self.tools
+
+    def get(self, name: str):
+        return self.tools.get(name)
+
+    def schemas(self):
+        # OpenAI function schemas, in registration order
+        return [tool.schema for tool in self.tools.values()]
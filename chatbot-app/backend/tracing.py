@@ -0,0 +1,220 @@
+# Opt-in per-request tracing, exported as Chrome trace-event JSON.
+#
+# A request is traced when it asks for it with an "X-Trace: 1" header or is
+# picked by the sampling rate. While a trace is active, span() records how
+# long each block took on which task; without one, span() costs a single
+# ContextVar lookup. Finished traces are written to the trace directory and
+# open in chrome://tracing or https://ui.perfetto.dev.
+#
+# LoopStallMonitor watches the event loop itself: when a callback blocks the
+# loop for longer than the threshold, it logs a warning, counts it in
+# /metrics and adds the stall to every trace that was active at the time.
+
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from metrics import LOOP_STALL_SECONDS
+
+logger = logging.getLogger("livex.tracing")
+
+# The trace of the request being handled, if it is traced. Like the request
+# deadline, it is copied into tasks started by the request.
+current_trace = ContextVar("current_trace", default=None)
+# Traces still being recorded, so loop stalls can be added to them
+active_traces = set()
+
+PROCESS_ID = os.getpid()
+# Thread id used for event loop stalls in the trace viewer
+LOOP_THREAD_ID = 0
+
+
+class Trace:
+    def __init__(self, name: str):
+        self.trace_id = uuid.uuid4().hex
+        self.name = name
+        self.origin = time.perf_counter()
+        self.started_at = time.time()
+        self.events = [self._thread_name(LOOP_THREAD_ID, "event loop")]
+        # asyncio task -> trace viewer thread id, so concurrent tool calls get their own rows
+        self.threads = {}
+
+    def now(self):
+        # Microseconds since the trace started
+        return (time.perf_counter() - self.origin) * 1e6
+
+    def _thread_name(self, tid: int, name: str):
+        return {"name": "thread_name", "ph": "M", "pid": PROCESS_ID, "tid": tid, "args": {"name": name}}
+
+    def thread_id(self):
+        task = asyncio.current_task()
+        tid = self.threads.get(task)
+        if tid is None:
+            tid = self.threads[task] = len(self.threads) + 1
+            self.events.append(self._thread_name(tid, task.get_name() if task else "main"))
+        return tid
+
+    def add(self, name: str, category: str, start: float, duration: float, tid: int, args: dict = None):
+        event = {"name": name, "cat": category, "ph": "X", "ts": round(start, 1), "dur": round(duration, 1),
+                 "pid": PROCESS_ID, "tid": tid}
+        if args:
+            event["args"] = args
+        self.events.append(event)
+
+    def export(self):
+        return {
+            "traceEvents": self.events,
+            "displayTimeUnit": "ms",
+            "otherData": {"trace_id": self.trace_id, "name": self.name, "started_at": self.started_at},
+        }
+
+
+@contextmanager
+def span(name: str, category: str = "app", **args):
+    """Records the enclosed block as a span of the current trace, if any."""
+    trace = current_trace.get()
+    if trace is None:
+        yield
+        return
+    tid = trace.thread_id()
+    start = trace.now()
+    try:
+        yield
+    except BaseException as e:
+        args["error"] = type(e).__name__
+        raise
+    finally:
+        trace.add(name, category, start, trace.now() - start, tid, args)
+
+
+class Tracer:
+    """Decides which requests are traced and writes finished traces to disk."""
+
+    def __init__(self, directory: str = "traces", sample_rate: float = 0.0, allow_header: bool = True):
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.allow_header = allow_header
+        self.written = 0
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            directory=os.getenv("TRACE_DIR", "traces"),
+            sample_rate=float(os.getenv("TRACE_SAMPLE_RATE", "0")),
+            allow_header=os.getenv("TRACE_HEADER", "true").lower() != "false",
+        )
+
+    def wanted(self, header: str = None):
+        if self.allow_header and header and header.strip().lower() in ("1", "true", "yes"):
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    @contextmanager
+    def trace(self, name: str):
+        # Records spans into a new Trace; the file is written off the event loop
+        trace = Trace(name)
+        token = current_trace.set(trace)
+        active_traces.add(trace)
+        try:
+            with span(name, "request"):
+                yield trace
+        finally:
+            current_trace.reset(token)
+            active_traces.discard(trace)
+            asyncio.get_running_loop().run_in_executor(None, self.write, trace)
+
+    def path(self, trace: Trace):
+        return os.path.join(self.directory, f"{trace.trace_id}.json")
+
+    def write(self, trace: Trace):
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self.path(trace), "w") as f:
+                json.dump(trace.export(), f)
+            self.written += 1
+        except OSError:
+            logger.exception("Could not write trace", extra={"trace_id": trace.trace_id})
+
+
+class TracingMiddleware:
+    """ASGI middleware tracing requests to `paths` that ask for it or are sampled.
+
+    Wraps the whole response, including a streamed body, and returns the
+    trace id in an X-Trace-Id response header.
+    """
+
+    def __init__(self, app, tracer: Tracer, paths: tuple):
+        self.app = app
+        self.tracer = tracer
+        self.paths = set(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] not in self.paths:
+            return await self.app(scope, receive, send)
+        header = dict(scope["headers"]).get(b"x-trace", b"").decode("latin-1")
+        if not self.tracer.wanted(header):
+            return await self.app(scope, receive, send)
+
+        with self.tracer.trace(f"{scope['method']} {scope['path']}") as trace:
+            async def send_with_trace_id(message):
+                if message["type"] == "http.response.start":
+                    message["headers"] = list(message.get("headers", [])) + [(b"x-trace-id", trace.trace_id.encode())]
+                await send(message)
+
+            await self.app(scope, receive, send_with_trace_id)
+
+
+class LoopStallMonitor:
+    """Reports event loop stalls longer than `threshold` seconds.
+
+    A task sleeps for `interval` seconds at a time; when it wakes up late, the
+    loop was busy running something else (typically blocking I/O or CPU work
+    in a coroutine) for the extra time.
+    """
+
+    def __init__(self, threshold: float = 0.1, interval: float = None):
+        self.threshold = threshold
+        self.interval = interval if interval is not None else threshold / 2
+        self.stalls = 0
+        self.worst = 0.0
+        self.task = None
+
+    def start(self):
+        if self.threshold > 0 and self.task is None:
+            self.task = asyncio.get_running_loop().create_task(self._watch(), name="loop-stall-monitor")
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def _watch(self):
+        while True:
+            started = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            lag = time.perf_counter() - started - self.interval
+            if lag >= self.threshold:
+                self.record(lag)
+
+    def record(self, lag: float):
+        self.stalls += 1
+        self.worst = max(self.worst, lag)
+        LOOP_STALL_SECONDS.observe(lag)
+        logger.warning("Event loop stalled", extra={"stall_ms": round(lag * 1000, 1), "traced_requests": len(active_traces)})
+        for trace in list(active_traces):
+            end = trace.now()
+            trace.add("event loop stall", "loop", max(0.0, end - lag * 1e6), lag * 1e6, LOOP_THREAD_ID,
+                      {"stall_ms": round(lag * 1000, 1)})
+
+    def stats(self):
+        return {"threshold_ms": self.threshold * 1000, "stalls": self.stalls, "worst_ms": round(self.worst * 1000, 1)}
@@ -0,0 +1,106 @@
+# Startup warmup, run in the background once the app accepts connections.
+#
+# A new worker would otherwise pay for its first OpenAI and Cal.com TCP/TLS
+# handshakes, and for importing the openai package, on its first user's
+# request. Warmup does that work up front: each step (import modules, open
+# pooled upstream connections, optionally prefetch availability) runs
+# concurrently, and GET /health/ready answers 503 until they have finished
+# (or timed out), so a load balancer only routes traffic to warm workers.
+# Liveness is unaffected: the app serves requests during warmup.
+
+import asyncio
+import logging
+import os
+import time
+
+logger = logging.getLogger("livex.warmup")
+
+
+async def open_connections(http, url: str, count: int):
+    """Opens `count` keep-alive connections to `url` in an httpx client's pool.
+
+    Any response, whatever its status, means the handshakes are done and the
+    connection goes back to the pool for the next request to reuse.
+    """
+    responses = await asyncio.gather(*(http.request("HEAD", url) for _ in range(count)))
+    return [response.status_code for response in responses]
+
+
+class Warmup:
+    """Runs named async warmup steps concurrently and reports when they are done."""
+
+    def __init__(self, steps: dict, timeout: float = 10.0, enabled: bool = True):
+        self.steps = steps
+        self.timeout = timeout
+        self.enabled = enabled
+        self.results = {}
+        self.duration = None
+        self.finished = False
+        self.task = None
+
+    @classmethod
+    def from_env(cls, steps: dict):
+        return cls(
+            steps,
+            timeout=float(os.getenv("WARMUP_TIMEOUT", "10")),
+            enabled=os.getenv("WARMUP", "true").lower() != "false",
+        )
+
+    def start(self):
+        self.results = {name: {"status": "pending" if self.enabled else "skipped"} for name in self.steps}
+        self.duration = None
+        self.finished = not self.enabled
+        if self.enabled and self.task is None:
+            self.task = asyncio.get_running_loop().create_task(self._run(), name="warmup")
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def _run(self):
+        started = time.perf_counter()
+        tasks = [asyncio.create_task(self._step(name, step), name=f"warmup {name}") for name, step in self.steps.items()]
+        try:
+            await asyncio.wait(tasks, timeout=self.timeout)
+        finally:
+            # Steps still running after the timeout (or at shutdown) are cancelled
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.duration = time.perf_counter() - started
+            # Failed or slow steps do not keep the worker out of rotation; the
+            # first requests just pay for what warmup could not do
+            self.finished = True
+        logger.info("Warmup finished", extra={"duration_ms": round(self.duration * 1000, 1), "steps": self.results})
+
+    async def _step(self, name: str, step):
+        started = time.perf_counter()
+        result = self.results[name]
+        result["status"] = "running"
+        try:
+            detail = await step()
+        except asyncio.CancelledError:
+            result["status"] = "timeout"
+            raise
+        except Exception as e:
+            result["status"] = "error"
+            result["error"] = f"{type(e).__name__}: {e}"
+            logger.warning("Warmup step failed", extra={"step": name, "error": result["error"]})
+        else:
+            result["status"] = "skipped" if detail is None else "done"
+            if detail is not None:
+                result["detail"] = detail
+        finally:
+            result["ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+    def stats(self):
+        return {
+            "ready": self.finished,
+            "duration_ms": round(self.duration * 1000, 1) if self.duration is not None else None,
+            "steps": self.results,
+        }
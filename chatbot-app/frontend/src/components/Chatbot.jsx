@@ -1,5 +1,4 @@
 import React, { useState, useEffect, useRef } from 'react';
-import axios from 'axios';
 import './Chatbot.css';
 
 const Chatbot = () => {
@@ -10,6 +9,8 @@ const Chatbot = () => {
     const [emailSubmitted, setEmailSubmitted] = useState(false);
     const [timer, setTimer] = useState(0);
     const [isLoading, setIsLoading] = useState(false);
+    const [toolStatus, setToolStatus] = useState('');
+    const [conversationId, setConversationId] = useState(null);
     const messageViewRef = useRef(null);
 
     // Timer effect
@@ -28,6 +29,30 @@ const Chatbot = () => {
         }
     }, [messages]);
 
+    // Parses a Server-Sent Events stream from /chat/stream and calls onEvent for each event
+    const readEventStream = async (response, onEvent) => {
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        while (true) {
+            const { done, value } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const rawEvent = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+                let event = 'message';
+                let data = '';
+                for (const line of rawEvent.split('\n')) {
+                    if (line.startsWith('event: ')) event = line.slice(7);
+                    else if (line.startsWith('data: ')) data += line.slice(6);
+                }
+                if (data) onEvent(event, JSON.parse(data));
+            }
+        }
+    };
+
     const sendMessage = async () => {
         if (!input.trim() || !email) return;
         
@@ -36,13 +61,50 @@ const Chatbot = () => {
         setInput('');
         setIsLoading(true);
         
+        let streamed = '';
+        const showAssistant = (content) => {
+            setMessages(prev => {
+                const last = prev[prev.length - 1];
+                if (last && last.role === 'assistant' && last.streaming) {
+                    return [...prev.slice(0, -1), { ...last, content }];
+                }
+                return [...prev, { role: 'assistant', content, streaming: true }];
+            });
+        };
+        
         try {
-            const response = await axios.post('http://localhost:8000/chat', {
-                email,
-                messages: [...messages, userMessage]
+            const response = await fetch('http://localhost:8000/chat/stream', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                // History is kept server-side; only the new message is sent
+                body: JSON.stringify({
+                    email,
+                    conversation_id: conversationId,
+                    message: userMessage.content
+                })
+            });
+            if (response.status === 429) {
+                // Over the rate limit: show the server's "try again" message
+                const data = await response.json();
+                showAssistant(data.response);
+                return;
+            }
+            if (!response.ok) throw new Error(`HTTP ${response.status}`);
+            
+            await readEventStream(response, (event, data) => {
+                if (event === 'token') {
+                    streamed += data.content;
+                    showAssistant(streamed);
+                } else if (event === 'tool') {
+                    setToolStatus(data.status === 'calling' ? `Calling ${data.name}…` : '');
+                } else if (event === 'done' || event === 'error' || event === 'rejected') {
+                    showAssistant(data.response);
+                    if (data.conversation_id) setConversationId(data.conversation_id);
+                }
             });
             
-            setMessages(prev => [...prev, { role: 'assistant', content: response.data.response }]);
+            // Mark the streamed message as final
+            setMessages(prev => prev.map(msg => msg.streaming ? { role: msg.role, content: msg.content } : msg));
         } catch (error) {
             console.error('Error sending message:', error);
             setMessages(prev => [...prev, { 
@@ -51,6 +113,7 @@ const Chatbot = () => {
             }]);
         } finally {
             setIsLoading(false);
+            setToolStatus('');
         }
     };
 
@@ -74,6 +137,7 @@ const Chatbot = () => {
 
     const resetChat = () => {
         setMessages([]);
+        setConversationId(null);
         setTimer(0);
     };
 
@@ -81,6 +145,7 @@ const Chatbot = () => {
         setIsOpen(false);
         setTimer(0);
         setEmailSubmitted(false);
+        setConversationId(null);
     };
 
     return (
@@ -137,13 +202,14 @@ const Chatbot = () => {
                                         </div>
                                     ))
                                 )}
-                                {isLoading && (
+                                {isLoading && !messages[messages.length - 1]?.streaming && (
                                     <div className="message assistant loading">
                                         <div className="typing-indicator">
                                             <span></span>
                                             <span></span>
                                             <span></span>
                                         </div>
+                                        {toolStatus && <div className="tool-status">{toolStatus}</div>}
                                     </div>
                                 )}
                             </div>